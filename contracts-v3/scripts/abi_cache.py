@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import pickle
+
+from brownie import Contract
+
+# Caches parsed ABIs as pickles named by the hash of the file they were read from, so scripts that
+# load the same ABI files on every start skip json parsing. An index of file path, mtime and size
+# to content hash lets other processes find the entry without hashing the file again, any change
+# to the file changes its hash and it is parsed again. Contract wrappers are reused within a
+# process. Set ABI_CACHE=0 to disable.
+#
+#   abi = load_abi("abi/Notional.json")
+#   notional = get_contract("Notional", address, abi)
+
+CACHE_DIR = os.path.join("build", "abi-cache")
+INDEX_FILE = "index.json"
+
+_index = None
+_abis = {}
+_contracts = {}
+
+
+def is_enabled():
+    return os.environ.get("ABI_CACHE", "1") != "0"
+
+
+def _write_atomic(path, data, mode):
+    # Concurrent processes each write their own file and rename it into place
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmpPath = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmpPath, mode) as f:
+        if mode == "wb":
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            json.dump(data, f)
+    os.replace(tmpPath, path)
+
+
+def _load_index(cacheDir):
+    global _index
+    if _index is None or _index[0] != cacheDir:
+        try:
+            with open(os.path.join(cacheDir, INDEX_FILE), "r") as f:
+                _index = (cacheDir, json.load(f))
+        except (OSError, ValueError):
+            _index = (cacheDir, {})
+    return _index[1]
+
+
+def get_content_hash(path, cacheDir=CACHE_DIR):
+    index = _load_index(cacheDir)
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        return entry[2]
+
+    with open(path, "rb") as f:
+        contentHash = hashlib.sha256(f.read()).hexdigest()
+    index[key] = [stat.st_mtime_ns, stat.st_size, contentHash]
+    _write_atomic(os.path.join(cacheDir, INDEX_FILE), index, "w")
+    return contentHash
+
+
+def load_abi(path, key=None, cacheDir=CACHE_DIR):
+    # key selects a field of the file, e.g. "abi" for hardhat artifacts
+    if not is_enabled():
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if key is None else data[key]
+
+    contentHash = get_content_hash(path, cacheDir)
+    cacheKey = (contentHash, key)
+    if cacheKey in _abis:
+        return _abis[cacheKey]
+
+    cachePath = os.path.join(cacheDir, "{}-{}.pickle".format(contentHash[:32], key or "json"))
+    try:
+        with open(cachePath, "rb") as f:
+            abi = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        with open(path, "r") as f:
+            data = json.load(f)
+        abi = data if key is None else data[key]
+        _write_atomic(cachePath, abi, "wb")
+
+    _abis[cacheKey] = abi
+    return abi
+
+
+def get_contract(name, address, abi, owner=None):
+    # The abi is held by the entry so its id is not reused while the entry exists
+    ownerKey = None if owner is None else owner.address
+    cacheKey = (name, str(address).lower(), id(abi), ownerKey)
+    if is_enabled() and cacheKey in _contracts:
+        return _contracts[cacheKey][1]
+
+    contract = Contract.from_abi(name, address, abi, owner=owner)
+    _contracts[cacheKey] = (abi, contract)
+    return contract
+
+
+def write_abi(path, abi):
+    # Only rewrites the file when the abi has changed, so cache entries for it stay valid
+    data = json.dumps(abi, sort_keys=True, indent=4)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            if f.read() == data:
+                return False
+
+    with open(path, "w") as f:
+        f.write(data)
+    return True
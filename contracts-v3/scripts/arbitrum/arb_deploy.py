@@ -1,7 +1,6 @@
 from brownie import ZERO_ADDRESS, Contract, accounts, UnderlyingHoldingsOracle, ChainlinkAdapter, EmptyProxy, nProxy, UpgradeableBeacon, nTokenERC20Proxy, PrimeCashProxy, PrimeDebtProxy, interface
 from brownie.network import Chain
 from scripts.arbitrum.arb_config import ListedOrder, ListedTokens
-from scripts.common import TokenType
 from scripts.deployment import deployNotionalContracts
 from tests.helpers import get_balance_action
 
@@ -100,73 +99,16 @@ def _list_currency(symbol, notional, deployer, pCashOracle, ethOracle, fundingAc
         # Donate the initial balance
         erc20.transfer(notional, erc20.balanceOf(fundingAccount) / 10, {"from": fundingAccount})
 
-    txn = notional.listCurrency(
-        (
-            token['address'],
-            False,
-            TokenType["UnderlyingToken"] if symbol != "ETH" else TokenType["Ether"],
-            token['decimals'],
-            0,
-        ),
-        (
-            ethOracle,
-            18,
-            False,
-            token["buffer"],
-            token["haircut"],
-            token["liquidationDiscount"],
-        ),
-        _to_interest_rate_curve(token['primeCashCurve']),
-        pCashOracle,
-        True,  # allowDebt
-        token['primeRateOracleTimeWindow5Min'],
-        token['name'],
-        symbol,
-        {"from": deployer}
-    )
-    currencyId = txn.events["ListCurrency"]["newCurrencyId"]
-
-    notional.enableCashGroup(
-        currencyId,
-        (
-            token["maxMarketIndex"],
-            token["rateOracleTimeWindow"],
-            token["maxDiscountFactor"],
-            token["reserveFeeShare"],
-            token["debtBuffer"],
-            token["fCashHaircut"],
-            token["minOracleRate"],
-            token["liquidationfCashDiscount"],
-            token["liquidationDebtBuffer"],
-            token["maxOracleRate"]
-        ),
-        token['name'],
-        symbol,
-        {"from": deployer}
-    )
-
-    notional.updateInterestRateCurve(
-        currencyId,
-        [1, 2],
-        [_to_interest_rate_curve(c) for c in token['fCashCurves']],
-        {"from": deployer}
-    )
-
-    notional.updateDepositParameters(currencyId, token['depositShare'], token['leverageThreshold'], {"from": deployer})
-
-    notional.updateInitializationParameters(currencyId, [0, 0], token['proportion'], {"from": deployer})
-
-    notional.updateTokenCollateralParameters(
-        currencyId,
-        token["residualPurchaseIncentive"],
-        token["pvHaircutPercentage"],
-        token["residualPurchaseTimeBufferHours"],
-        token["cashWithholdingBuffer10BPS"],
-        token["liquidationHaircutPercentage"],
-        {"from": deployer}
-    )
+    # Imported here, the batcher depends on this module
+    from scripts.initializers.governance_batcher import get_listing_calls, simulate_plan
 
-    notional.setMaxUnderlyingSupply(currencyId, token['maxUnderlyingSupply'], {"from": deployer})
+    # Oracles deployed for this listing replace the ones in the config
+    token = token | {
+        "ethOracle": getattr(ethOracle, "address", ethOracle),
+        "pCashOracle": pCashOracle.address,
+    }
+    currencyId = notional.getMaxCurrencyId() + 1
+    simulate_plan(get_listing_calls(notional, symbol, currencyId, token), deployer)
 
 def initialize_markets(notional, fundingAccount):
     actions = []
@@ -1,7 +1,7 @@
-import json
 import re
-from brownie import Contract
+from collections.abc import MutableMapping
 from brownie.convert.datatypes import HexString
+from scripts.abi_cache import get_contract, load_abi
 
 TokenType = {
     "UnderlyingToken": 0,
@@ -26,15 +26,47 @@ CurrencySymbol = {
     4: "WBTC"
 }
 
+class LazyDict(MutableMapping):
+    # Values are built by their factory on first access and memoized, keys are known up front
+    def __init__(self, values=None, factories=None):
+        self._values = dict(values or {})
+        self._factories = dict(factories or {})
+
+    def setLazy(self, key, factory):
+        self._values.pop(key, None)
+        self._factories[key] = factory
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._factories:
+                raise KeyError(key)
+            self._values[key] = self._factories.pop(key)()
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._factories.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._values.pop(key, None)
+        self._factories.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._values or key in self._factories
+
+    def __iter__(self):
+        return iter(list(self._values.keys()) + list(self._factories.keys()))
+
+    def __len__(self):
+        return len(self._values) + len(self._factories)
+
 def loadContractFromABI(name, address, path):
-    with open(path, "r") as f:
-        abi = json.load(f)
-    return Contract.from_abi(name, address, abi)
+    return get_contract(name, address, load_abi(path))
 
 def loadContractFromArtifact(name, address, path):
-    with open(path, "r") as a:
-        artifact = json.load(a)
-    return Contract.from_abi(name, address, artifact["abi"])
+    return get_contract(name, address, load_abi(path, "abi"))
 
 def getDependencies(bytecode):
     deps = set()
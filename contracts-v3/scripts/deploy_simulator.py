@@ -0,0 +1,242 @@
+import json
+import math
+
+from brownie import accounts, network
+from brownie.network.state import TxHistory
+from scripts.deployers.notional_deployer import BEACONS, NotionalDeployer
+
+# Runs a full V3 deployment plan against a local fork and reports the gas used by every step.
+# The plan covers:
+#   - library, action, router, beacon and callback deployments (in scheduler waves)
+#   - the router upgrade and beacon upgrades
+#   - optionally, Arbitrum currency listings
+# The report includes the critical path through the plan and the total cost at a given gas
+# price. Usage:
+#
+#   brownie run scripts/deploy_simulator.py main arbitrum-one 0.1 ETH,USDC --network arbitrum-fork
+#
+# Nothing is written to v3.<network>.json, the report is written to deploy_plan.<network>.json.
+# Steps that revert are recorded with their error and every step that depends on them is skipped.
+
+history = TxHistory()
+
+# Deployments.BeaconType
+BEACON_TYPES = {"nTokenERC20Proxy": 0, "PrimeCashProxy": 1, "PrimeDebtProxy": 2}
+FORK_NETWORKS = ["mainnet-fork", "arbitrum-fork", "hardhat-fork", "development"]
+DEFAULT_GAS_PRICE_GWEI = 30
+# Arbitrum listings are funded from this account in scripts/arbitrum/arb_deploy.py
+FUNDING_ACCOUNT = "0x7d7935EDd4b6cDB5f34B0E1cCEAF85a3C4A11254"
+
+
+class SimulatedNotionalDeployer(NotionalDeployer):
+    def verify(self, contract, deployed, args=[]):
+        pass
+
+
+class DeploySimulator:
+    def __init__(self, networkName, deployer, fresh=True) -> None:
+        with open("v3.{}.json".format(networkName), "r") as f:
+            config = json.load(f)
+        if fresh:
+            # Deploy every contract instead of only the ones missing from the config
+            for group in ["libs", "actions", "routers", "beacons", "callbacks"]:
+                config.pop(group, None)
+
+        self.networkName = networkName
+        self.deployer = deployer
+        self.notional = SimulatedNotionalDeployer(
+            networkName, deployer, False, config=config, persist=False
+        )
+        self.steps = {}
+
+    def _addStep(self, name, deps, txs, error=None):
+        self.steps[name] = {"deps": list(deps), "txs": txs, "error": error}
+
+    def _skipped(self, deps):
+        return any(d in self.steps and self.steps[d]["error"] is not None for d in deps)
+
+    def runStep(self, name, deps, fn):
+        # Records every transaction sent by fn as part of the step
+        if self._skipped(deps):
+            self._addStep(name, deps, [], "skipped")
+            return None
+
+        start = len(history)
+        error = None
+        result = None
+        try:
+            result = fn()
+        except Exception as e:
+            error = str(e)
+            print("Step {} failed: {}".format(name, error))
+
+        txs = [
+            {
+                "label": "{}.{}".format(tx.contract_name, tx.fn_name) if tx.fn_name else "transfer",
+                "gasUsed": tx.gas_used,
+            }
+            for tx in history[start:]
+        ]
+        self._addStep(name, deps, txs, error)
+        return result
+
+    def deployContracts(self):
+        scheduler = self.notional.getScheduler()
+        deps = {node.name: node.deps for node in scheduler.nodes.values()}
+        try:
+            scheduler.run()
+        except Exception as e:
+            print("Deployment failed: {}".format(e))
+
+        for (name, nodeDeps) in deps.items():
+            if name in scheduler.gasUsed:
+                txs = [{"label": "{}.constructor".format(name), "gasUsed": scheduler.gasUsed[name]}]
+                self._addStep(name, nodeDeps, txs)
+            else:
+                self._addStep(name, nodeDeps, [], "not deployed")
+
+        return scheduler
+
+    def upgrade(self, owner):
+        proxy = self.notional.proxy
+        routers = self.notional.routers
+        if proxy.getImplementation() != routers["Router"]:
+            self.runStep(
+                "upgradeRouter",
+                ["Router"],
+                lambda: proxy.upgradeTo(routers["Router"], {"from": owner}),
+            )
+
+        for beacon in BEACONS:
+            name = beacon._name
+            self.runStep(
+                "upgradeBeacon.{}".format(name),
+                [name, "upgradeRouter"],
+                lambda: proxy.upgradeBeacon(
+                    BEACON_TYPES[name], self.notional.beacons[name], {"from": owner}
+                ),
+            )
+
+    def listCurrencies(self, symbols, owner, fundingAccount):
+        # Currency ids are assigned in listing order so each listing depends on the previous one
+        from scripts.arbitrum.arb_deploy import list_currency
+
+        previous = ["upgradeRouter"]
+        for symbol in symbols:
+            name = "listCurrency.{}".format(symbol)
+            self.runStep(
+                name,
+                previous,
+                lambda: list_currency(symbol, self.notional.proxy, owner, fundingAccount),
+            )
+            previous = [name]
+
+    def getCriticalPath(self):
+        # Longest chain of dependent steps weighted by gas, every step needs at least one block
+        memo = {}
+
+        def longest(name):
+            if name not in memo:
+                step = self.steps[name]
+                gas = sum(tx["gasUsed"] for tx in step["txs"])
+                best = max(
+                    [longest(d) for d in step["deps"] if d in self.steps],
+                    key=lambda p: (len(p[0]), p[1]),
+                    default=([], 0),
+                )
+                memo[name] = (best[0] + [name], best[1] + gas)
+            return memo[name]
+
+        return max(
+            [longest(name) for name in self.steps],
+            key=lambda p: (len(p[0]), p[1]),
+            default=([], 0),
+        )
+
+    def getReport(self, gasPriceGwei, blockGasLimit):
+        txs = [tx for step in self.steps.values() for tx in step["txs"]]
+        totalGas = sum(tx["gasUsed"] for tx in txs)
+        maxTxGas = max([tx["gasUsed"] for tx in txs], default=0)
+        (path, pathGas) = self.getCriticalPath()
+
+        return {
+            "network": self.networkName,
+            "gasPriceGwei": gasPriceGwei,
+            "blockGasLimit": blockGasLimit,
+            "steps": self.steps,
+            "failed": [name for (name, step) in self.steps.items() if step["error"] is not None],
+            "transactions": len(txs),
+            "totalGas": totalGas,
+            "totalCostETH": totalGas * gasPriceGwei / 1e9,
+            "maxTxGas": maxTxGas,
+            "criticalPath": path,
+            "criticalPathGas": pathGas,
+            # Dependent steps cannot share a block and the total gas must fit the block limit
+            "minBlocks": max(len(path), math.ceil(totalGas / blockGasLimit)),
+        }
+
+
+def print_report(report):
+    print("{:<40} {:>12} {:>8}".format("Step", "Gas", "Txs"))
+    for (name, step) in report["steps"].items():
+        gas = sum(tx["gasUsed"] for tx in step["txs"])
+        status = "" if step["error"] is None else " ({})".format(step["error"][:40])
+        print("{:<40} {:>12} {:>8}{}".format(name, gas, len(step["txs"]), status))
+
+    print(
+        "\nTotal gas {} over {} transactions, {:.4f} ETH at {} gwei".format(
+            report["totalGas"],
+            report["transactions"],
+            report["totalCostETH"],
+            report["gasPriceGwei"],
+        )
+    )
+    print(
+        "Critical path of {} steps ({} gas), at least {} blocks".format(
+            len(report["criticalPath"]), report["criticalPathGas"], report["minBlocks"]
+        )
+    )
+    print("Largest transaction {} gas".format(report["maxTxGas"]))
+
+
+def simulate(
+    networkName,
+    deployer,
+    owner=None,
+    symbols=(),
+    fundingAccount=None,
+    gasPriceGwei=DEFAULT_GAS_PRICE_GWEI,
+    fresh=True,
+):
+    from brownie.network import web3
+
+    if network.show_active() not in FORK_NETWORKS:
+        raise Exception("Simulations must run on a local fork")
+
+    simulator = DeploySimulator(networkName, deployer, fresh)
+    simulator.deployContracts()
+    if simulator.notional.notional is not None:
+        if owner is None:
+            owner = accounts.at(simulator.notional.proxy.owner(), force=True)
+        simulator.upgrade(owner)
+        if len(symbols) > 0:
+            simulator.listCurrencies(symbols, owner, fundingAccount)
+
+    blockGasLimit = web3.eth.get_block("latest")["gasLimit"]
+    report = simulator.getReport(gasPriceGwei, blockGasLimit)
+    with open("deploy_plan.{}.json".format(networkName), "w") as f:
+        json.dump(report, f, sort_keys=True, indent=4)
+    print_report(report)
+    return report
+
+
+def main(networkName="arbitrum-one", gasPriceGwei=DEFAULT_GAS_PRICE_GWEI, symbols=""):
+    symbols = [s for s in symbols.split(",") if s != ""]
+    fundingAccount = accounts.at(FUNDING_ACCOUNT, force=True) if len(symbols) > 0 else None
+    simulate(
+        networkName,
+        accounts[0],
+        symbols=symbols,
+        fundingAccount=fundingAccount,
+        gasPriceGwei=float(gasPriceGwei),
+    )
@@ -1,9 +1,14 @@
 from brownie import accounts, network
+from scripts.deploy_simulator import simulate
 from scripts.deployers.notional_deployer import NotionalDeployer
 
 
-def deployNotional(deployer, networkName, dryRun):
+def deployNotional(deployer, networkName, dryRun, parallel=True):
     notional = NotionalDeployer(networkName, deployer, dryRun)
+    if parallel:
+        notional.deployAll()
+        return
+
     notional.deployLibs()
     notional.deployActions()
     notional.deployPauseRouter()
@@ -18,6 +23,11 @@ def main(dryRun=True):
         networkName = "mainnet"
     elif networkName in ["arbitrum-fork", "arbitrum-current"]:
         networkName = "arbitrum-one"
+    if dryRun == "SIMULATE":
+        # Runs the whole plan on the active fork and reports gas and cost
+        simulate(networkName, accounts[0])
+        return
+
     deployer = accounts.load(networkName.upper() + "_DEPLOYER")
     print("Deployer Address: ", deployer.address)
 
@@ -1,10 +1,56 @@
 import json
 import os
-from brownie import Contract, network, project, convert
+from brownie import Contract, network, project
 from scripts.common import getDependencies
+from scripts.deployers.lib_validator import diff_links, fetch_lib_info, format_diff, has_lib_info
+from scripts.deployers.manifest import write_json_atomic
+
+def verify_lib_links(c, name, deps, libAddresses):
+    if not has_lib_info(c):
+        raise Exception("Cannot verify libs, getLibInfo() not found on {}".format(name))
+
+    expected = {name: dict(zip(deps, libAddresses))}
+    mismatches = diff_links(expected, fetch_lib_info({name: c}, useMulticall=False))
+    if len(mismatches) > 0:
+        raise Exception("Library links do not match:\n{}".format(format_diff(mismatches)))
+
+# Deployers that checkpoint a manifest defer library deployments to map.json until the next
+# checkpoint (flush_lib_map), every other deployment is written to map.json immediately
+_pendingLibs = {}
+
+def update_lib_map(name, address, defer=False):
+    _pendingLibs[name] = address
+    if not defer:
+        flush_lib_map()
+
+def flush_lib_map():
+    if len(_pendingLibs) == 0:
+        return
+
+    map = None
+    with open("build/deployments/map.json", "r") as f:
+        map = json.load(f)
+    contracts = map.get(str(network.chain.id))
+    if contracts is None:
+        # Brownie only keeps deployment records for persistent networks, not for forks
+        _pendingLibs.clear()
+        return
+
+    for (name, address) in _pendingLibs.items():
+        if name in contracts:
+            deployments = contracts[name]
+            for d in deployments:
+                f = "build/deployments/{}/{}.json".format(network.chain.id, d)
+                if d != address and os.path.exists(f):
+                    os.remove(f)
+            contracts[name] = [address]
+    write_json_atomic("build/deployments/map.json", map)
+    _pendingLibs.clear()
 
 class ContractDeployer:
-    def __init__(self, deployer, context=None, libs=None) -> None:
+    def __init__(
+        self, deployer, context=None, libs=None, onDeployed=None, deferLibMap=False
+    ) -> None:
         self.project = project.ContractsV3Project
         self.deployer = deployer
         self.context = context
@@ -13,6 +59,10 @@ class ContractDeployer:
         self.libs = libs
         if self.libs == None:
             self.libs = {}
+        # Called with (name, address, isLib) after every new deployment
+        self.onDeployed = onDeployed
+        # Set when the caller flushes the library map at its own checkpoints
+        self.deferLibMap = deferLibMap
 
     def deploy(self, contract, args=None, name="", verify=False, isLib=False):
         c = None
@@ -48,43 +98,15 @@ class ContractDeployer:
                 self.libs[name] = c.address
             else:
                 self.context[name] = c.address
+            if self.onDeployed is not None:
+                self.onDeployed(name, c.address, isLib)
 
             # Verify libs
             if not isLib and len(libs) > 0:
-                addr = []
-                if hasattr(c, "getLibInfo") and callable(getattr(c, "getLibInfo")):
-                    info = c.getLibInfo()
-                    if type(info) is convert.datatypes.ReturnValue:
-                        addr = list(info)
-                    elif type(info) is convert.datatypes.EthAddress:
-                        addr.append(info)
-                else:
-                    raise Exception("Cannot verify libs, getLibInfo() not found on {}".format(name))
-                
-                if len(addr) != len(libs):
-                    raise Exception("getLibInfo(): incorrect length")
-                for i, item in enumerate(libs):
-                    if item.address not in addr[i]:
-                        raise Exception("Library {} mismatch! expected = {}, actual = {}".format(
-                            deps[i], 
-                            item.address, 
-                            addr[i]
-                        ))
+                verify_lib_links(c, name, deps, [l.address for l in libs])
 
         # Make sure there is only 1 copy in map.json (for libraries)
         if isLib:
-            map = None
-            with open("build/deployments/map.json", "r") as f:
-                map = json.load(f)
-            contracts = map[str(network.chain.id)]
-            if name in contracts:
-                deployments = contracts[name]
-                for d in deployments:
-                    f = "build/deployments/{}/{}.json".format(network.chain.id, d)
-                    if d != c.address and os.path.exists(f):
-                        os.remove(f)
-                contracts[name] = [c.address]
-            with open("build/deployments/map.json", "w") as f:
-                json.dump(map, f, sort_keys=True, indent=4)        
+            update_lib_map(name, c.address, self.deferLibMap)
 
         return c
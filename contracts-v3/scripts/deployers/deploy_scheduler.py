@@ -0,0 +1,256 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import project
+from brownie.network import web3
+from web3.exceptions import TransactionNotFound
+from scripts.common import getDependencies, loadContractFromArtifact
+from scripts.deployers.contract_deployer import update_lib_map
+from scripts.deployers.lib_validator import validate_lib_links
+
+# Deploys a dependency graph of contracts in waves. Every contract whose dependencies are resolved
+# is broadcast with a pre-assigned nonce without waiting for its receipt, then the whole wave is
+# confirmed in parallel. Libraries linked into a contract's bytecode are added to the graph
+# automatically. Usage:
+#
+#   scheduler = DeployScheduler(deployer, resolved=existingAddresses, onDeployed=record)
+#   scheduler.add("Views", Views, "actions")
+#   scheduler.add("Router", Router, "routers", deps=["Views"], args=lambda a: [a["Views"]])
+#   scheduler.run()
+#
+# Contract arguments are either a list or a function of the resolved addresses. A contract may
+# also be a path to a hardhat artifact, in which case it is deployed from the artifact bytecode.
+# Failed deployments are retried in the next wave with a fresh nonce, their dependents wait. A
+# deployment whose receipt timed out is only broadcast again once its nonce has been used by
+# another transaction, until then the next wave waits for the original transaction. Deployments
+# that run out of retries are raised together once the rest of their wave is confirmed, recorded
+# and checkpointed.
+# Once every wave is confirmed the library links of all deployed contracts are validated in a
+# single multicall.
+
+MAX_RETRIES = 2
+MAX_WORKERS = 8
+RECEIPT_TIMEOUT = 300
+
+
+class DeployNode:
+    def __init__(self, name, contract, group, deps, args) -> None:
+        self.name = name
+        self.contract = contract
+        self.group = group
+        self.deps = deps
+        self.args = args
+        self.attempts = 0
+        # Last broadcast transaction and its nonce
+        self.tx = None
+        self.nonce = None
+
+    def isArtifact(self):
+        return isinstance(self.contract, str)
+
+    def getArgs(self, addresses):
+        if self.args is None:
+            return []
+        if callable(self.args):
+            return self.args(addresses)
+        return self.args
+
+
+class DeployScheduler:
+    def __init__(
+        self,
+        deployer,
+        resolved=None,
+        onDeployed=None,
+        onWave=None,
+        maxRetries=MAX_RETRIES,
+        maxWorkers=MAX_WORKERS,
+        deferLibMap=False,
+    ) -> None:
+        self.project = project.ContractsV3Project
+        self.deployer = deployer
+        # Addresses of every contract that is already deployed, keyed by name
+        self.addresses = {} if resolved is None else dict(resolved)
+        self.onDeployed = onDeployed
+        self.onWave = onWave
+        self.maxRetries = maxRetries
+        self.maxWorkers = maxWorkers
+        # Set when onWave flushes the library map at each checkpoint
+        self.deferLibMap = deferLibMap
+        self.nodes = {}
+        # Gas used by each deployment, keyed by name
+        self.gasUsed = {}
+        # Containers and deployments of contracts that link libraries, validated after the run
+        self.linkedContainers = {}
+        self.linkedContracts = {}
+
+    def add(self, name, contract, group, deps=None, args=None):
+        if name in self.addresses or name in self.nodes:
+            return
+
+        deps = [] if deps is None else list(deps)
+        if not isinstance(contract, str):
+            # Linked libraries must be deployed before the contract
+            for lib in getDependencies(contract.bytecode):
+                self.add(lib, self.project.dict()[lib], "libs")
+                deps.append(lib)
+
+        self.nodes[name] = DeployNode(name, contract, group, deps, args)
+
+    def _linkedLibs(self, node):
+        if node.isArtifact():
+            return []
+        return getDependencies(node.contract.bytecode)
+
+    def getWaves(self):
+        # Groups the pending nodes into waves, each wave only depends on earlier waves
+        resolved = set(self.addresses.keys())
+        pending = dict(self.nodes)
+        waves = []
+        while len(pending) > 0:
+            ready = [n for n in pending.values() if all(d in resolved for d in n.deps)]
+            if len(ready) == 0:
+                raise Exception(
+                    "Unresolved dependencies: {}".format(
+                        {n.name: [d for d in n.deps if d not in resolved] for n in pending.values()}
+                    )
+                )
+            waves.append(ready)
+            for n in ready:
+                resolved.add(n.name)
+                del pending[n.name]
+
+        return waves
+
+    def _registerLib(self, name):
+        # Brownie links libraries to the last deployment in the project container, libraries
+        # loaded from the manifest have to be added to it before they are linked
+        container = self.project.dict()[name]
+        if len(container) == 0 or container[-1].address != self.addresses[name]:
+            container.at(self.addresses[name])
+
+    def _broadcast(self, node, nonce):
+        args = node.getArgs(self.addresses)
+        txParams = {"from": self.deployer, "nonce": nonce, "required_confs": 0}
+        if node.isArtifact():
+            with open(node.contract, "r") as a:
+                artifact = json.load(a)
+            createdContract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+            data = createdContract.constructor(*args).buildTransaction(
+                {"from": self.deployer.address, "nonce": nonce}
+            )["data"]
+            return self.deployer.transfer(data=data, nonce=nonce, required_confs=0)
+
+        for lib in self._linkedLibs(node):
+            self._registerLib(lib)
+        # A pending deployment returns its transaction receipt instead of the contract
+        return node.contract.deploy(*args, txParams, publish_source=False)
+
+    def _pendingTx(self, node):
+        # Returns the previous transaction of the node if it may still deploy the contract
+        if node.tx is None:
+            return None
+        try:
+            receipt = web3.eth.get_transaction_receipt(node.tx.txid)
+        except TransactionNotFound:
+            receipt = None
+
+        if receipt is not None:
+            return node.tx if receipt.status == 1 else None
+        if web3.eth.get_transaction_count(self.deployer.address) > node.nonce:
+            # The nonce was used by another transaction so the original can never be mined
+            return None
+        return node.tx
+
+    def _confirm(self, node, tx):
+        receipt = web3.eth.wait_for_transaction_receipt(tx.txid, timeout=RECEIPT_TIMEOUT)
+        if receipt.status != 1:
+            raise Exception("{} deployment reverted in {}".format(node.name, tx.txid))
+        self.gasUsed[node.name] = receipt.gasUsed
+
+        if node.isArtifact():
+            return loadContractFromArtifact(node.name, receipt.contractAddress, node.contract)
+
+        return node.contract.at(receipt.contractAddress)
+
+    def _failed(self, node, error):
+        # Returns true once the node has no retries left
+        node.attempts += 1
+        print("Deployment of {} failed ({}): {}".format(node.name, node.attempts, error))
+        return node.attempts > self.maxRetries
+
+    def _runWave(self, wave):
+        # Nonces are assigned from the pending count so a failed broadcast never leaves a gap
+        nonce = web3.eth.get_transaction_count(self.deployer.address, "pending")
+        broadcast = []
+        # Nodes out of retries, only raised once the rest of the wave is confirmed and recorded
+        exhausted = []
+        for node in wave:
+            pendingTx = self._pendingTx(node)
+            if pendingTx is not None:
+                print("Waiting for {} in {}".format(node.name, pendingTx.txid))
+                broadcast.append((node, pendingTx))
+                continue
+
+            print("Deploying {} with nonce {}".format(node.name, nonce))
+            try:
+                node.tx = self._broadcast(node, nonce)
+                node.nonce = nonce
+                broadcast.append((node, node.tx))
+                nonce += 1
+            except Exception as e:
+                if self._failed(node, e):
+                    exhausted.append((node, e))
+                nonce = web3.eth.get_transaction_count(self.deployer.address, "pending")
+
+        def confirm(item):
+            (node, tx) = item
+            try:
+                return (node, self._confirm(node, tx), None)
+            except Exception as e:
+                return (node, None, e)
+
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            results = list(executor.map(confirm, broadcast))
+
+        for (node, deployed, error) in results:
+            if error is not None:
+                if self._failed(node, error):
+                    exhausted.append((node, error))
+                continue
+
+            print("Deployed {} at {}".format(node.name, deployed.address))
+            self.addresses[node.name] = deployed.address
+            del self.nodes[node.name]
+            if node.group == "libs":
+                update_lib_map(node.name, deployed.address, self.deferLibMap)
+            elif len(self._linkedLibs(node)) > 0:
+                self.linkedContainers[node.name] = node.contract
+                self.linkedContracts[node.name] = deployed
+            if self.onDeployed is not None:
+                self.onDeployed(node, deployed)
+
+        # Checkpoint the manifest once per wave so a failed run can be resumed
+        if self.onWave is not None:
+            self.onWave()
+
+        if len(exhausted) > 0:
+            raise Exception(
+                "Deployments failed after {} attempts: {}".format(
+                    self.maxRetries + 1,
+                    "; ".join("{}: {}".format(n.name, e) for (n, e) in exhausted),
+                )
+            )
+
+    def run(self, dryRun=False):
+        waves = self.getWaves()
+        if dryRun:
+            for (i, wave) in enumerate(waves):
+                print("Wave {}: will deploy {}".format(i, ", ".join(n.name for n in wave)))
+            return self.addresses
+
+        while len(self.nodes) > 0:
+            self._runWave(self.getWaves()[0])
+
+        validate_lib_links(self.linkedContainers, self.linkedContracts, self.addresses)
+        return self.addresses
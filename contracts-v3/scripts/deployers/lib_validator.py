@@ -0,0 +1,111 @@
+from brownie import multicall
+from brownie.network import web3
+from scripts.common import getDependencies
+
+# Checks that deployed contracts are linked to the expected library deployments. The expected
+# link graph comes from the link markers in each contract's bytecode, getLibInfo() returns the
+# linked addresses in the same (sorted) order. Every getLibInfo() call is sent in one multicall
+# and the result is reported as a diff against the expected graph:
+#
+#   validate_lib_links({"Views": Views}, {"Views": views}, libAddresses)
+#
+# where the first argument holds the contract containers the expected links are read from and
+# libAddresses maps library names (e.g. FreeCollateralExternal) to their deployments.
+
+# Multicall3 is deployed at this address on most chains and is compatible with the Multicall2
+# interface used by brownie
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+
+def get_multicall_address():
+    # Development networks without Multicall3 fall back to brownie's own deployment
+    return MULTICALL3 if len(web3.eth.get_code(MULTICALL3)) > 0 else None
+
+
+def has_lib_info(contract):
+    return any(i.get("name") == "getLibInfo" for i in contract.abi)
+
+
+def get_expected_links(containers, libAddresses):
+    # Returns {name: {lib: address}} for every contract that links a library
+    expected = {}
+    for (name, container) in containers.items():
+        deps = getDependencies(container.bytecode)
+        if len(deps) > 0:
+            expected[name] = {lib: libAddresses.get(lib) for lib in deps}
+    return expected
+
+
+def _to_addresses(info):
+    # A single library is returned as an address rather than a tuple
+    return [str(info)] if isinstance(info, str) else [str(a) for a in info]
+
+
+def fetch_lib_info(contracts, useMulticall=True):
+    # Returns {name: [linked addresses]} for every contract, None when getLibInfo does not exist
+    results = {name: None for name in contracts.keys()}
+    linked = {name: c for (name, c) in contracts.items() if has_lib_info(c)}
+    if useMulticall and len(linked) > 1:
+        with multicall(address=get_multicall_address()):
+            pending = {name: c.getLibInfo() for (name, c) in linked.items()}
+    else:
+        pending = {name: c.getLibInfo() for (name, c) in linked.items()}
+
+    for (name, info) in pending.items():
+        results[name] = _to_addresses(info)
+    return results
+
+
+def diff_links(expected, actual):
+    # Returns (contract, lib, expected, actual) for every link that does not match, lib is None
+    # for addresses returned beyond the expected libraries
+    mismatches = []
+    for (name, libs) in expected.items():
+        linked = actual.get(name)
+        if linked is None:
+            mismatches.append((name, None, list(libs.values()), None))
+            continue
+
+        for (i, (lib, address)) in enumerate(libs.items()):
+            actualAddress = linked[i] if i < len(linked) else None
+            if address is None or actualAddress is None or address.lower() != actualAddress.lower():
+                mismatches.append((name, lib, address, actualAddress))
+        for extra in linked[len(libs) :]:
+            mismatches.append((name, None, None, extra))
+
+    return mismatches
+
+
+def format_diff(mismatches):
+    lines = []
+    contract = None
+    for (name, lib, expected, actual) in mismatches:
+        if name != contract:
+            lines.append("  {}".format(name))
+            contract = name
+        if lib is None and actual is None:
+            lines.append("-   getLibInfo() {}".format(expected))
+            lines.append("+   getLibInfo() not found")
+            continue
+
+        label = lib if lib is not None else "unexpected library"
+        if expected is not None:
+            lines.append("-   {} {}".format(label, expected))
+        lines.append("+   {} {}".format(label, actual if actual is not None else "not linked"))
+
+    return "\n".join(lines)
+
+
+def validate_lib_links(containers, contracts, libAddresses, useMulticall=True):
+    # contracts maps names to deployed brownie contracts, raises with the diff on any mismatch
+    expected = get_expected_links(containers, libAddresses)
+    if len(expected) == 0:
+        return []
+
+    actual = fetch_lib_info({name: contracts[name] for name in expected.keys()}, useMulticall)
+    mismatches = diff_links(expected, actual)
+    if len(mismatches) > 0:
+        raise Exception("Library links do not match:\n{}".format(format_diff(mismatches)))
+
+    print("Validated library links of {}".format(", ".join(expected.keys())))
+    return mismatches
@@ -1,5 +1,3 @@
-import json
-
 from brownie import (
     Contract,
     accounts, 
@@ -11,7 +9,8 @@ from brownie import (
     UpgradeableBeacon,
     BeaconProxy
 )
-from scripts.deployers.contract_deployer import ContractDeployer
+from scripts.deployers.contract_deployer import ContractDeployer, flush_lib_map
+from scripts.deployers.manifest import DeploymentManifest
 from scripts.common import isProduction
 
 LiquidationConfig = {
@@ -34,22 +33,27 @@ class LiqDeployer:
 
     def _load(self):
         print("Loading liquidator config")
-        if self.persist:
-            with open("v2.{}.json".format(self.network), "r") as f:
-                self.config = json.load(f)
-        if "liquidation" in self.config:
-            self.liquidation = self.config["liquidation"]
+        self.manifest = DeploymentManifest(
+            "v2.{}.json".format(self.network), None if self.persist else self.config, self.persist
+        )
+        self.config = self.manifest.data
+        self.liquidation = self.manifest.section("liquidation")
+
+    def _record(self, path, value):
+        # Journals the update, it is written to the config at the next checkpoint
+        self.manifest.set(["liquidation"] + path, value)
+
+    def _remove(self, path):
+        self.manifest.delete(["liquidation"] + path)
 
     def _save(self):
         print("Saving liquidator config")
-        self.config["liquidation"] = self.liquidation
-        if self.persist:
-            with open("v2.{}.json".format(self.network), "w") as f:
-                json.dump(self.config, f, sort_keys=True, indent=4)
+        flush_lib_map()
+        self.manifest.flush()
 
     def deployFlashLender(self):
         if isProduction(self.network):
-            self.liquidation["lender"] = LiquidationConfig[self.network]["lender"]
+            self._record(["lender"], LiquidationConfig[self.network]["lender"])
             return
 
         if "lender" in self.liquidation:
@@ -61,14 +65,14 @@ class LiqDeployer:
             self.config["tokens"]["WETH"]["address"], 
             self.deployer.address
         ])
-        self.liquidation["lender"] = contract.address
+        self._record(["lender"], contract.address)
         # Re-deploy dependent contracts
-        self.liquidation.pop("flash", None)
+        self._remove(["flash"])
         self._save()
 
     def deployExchange(self):
         if isProduction(self.network):
-            self.liquidation["exchange"] = LiquidationConfig[self.network]["exchange"]
+            self._record(["exchange"], LiquidationConfig[self.network]["exchange"])
             return
 
         if "exchange" in self.liquidation:
@@ -80,10 +84,10 @@ class LiqDeployer:
             self.config["tokens"]["WETH"]["address"], 
             self.deployer.address
         ])
-        self.liquidation["exchange"] = contract.address
+        self._record(["exchange"], contract.address)
         # Re-deploy dependent contracts
-        self.liquidation.pop("flash", None)
-        self.liquidation.pop("manual", None)
+        self._remove(["flash"])
+        self._remove(["manual"])
         self._save()
 
     def deployFlashLiquidator(self):
@@ -105,7 +109,7 @@ class LiqDeployer:
             self.deployer.address,
             self.liquidation["exchange"],
         ])
-        self.liquidation["flash"] = contract.address
+        self._record(["flash"], contract.address)
         self._save()
 
     def _deployManualLiquidatorImpl(self, manual):
@@ -121,8 +125,7 @@ class LiqDeployer:
             self.liquidation["exchange"],
             self.config["note"],
         ])
-        manual["impl"] = contract.address
-        self._save()
+        self._record(["manual", "impl"], contract.address)
 
     def _deployManualBeacon(self, manual):
         if "beacon" in manual:
@@ -131,8 +134,7 @@ class LiqDeployer:
 
         deployer = ContractDeployer(self.deployer)
         contract = deployer.deploy(UpgradeableBeacon, [manual["impl"]])
-        manual["beacon"] = contract.address
-        self._save()
+        self._record(["manual", "beacon"], contract.address)
 
     def _deployManualLiquidator(self, manual, currencyId):
         proxies = {}
@@ -149,8 +151,7 @@ class LiqDeployer:
         liquidator = Contract.from_abi("manualLiquidator", manual["impl"], abi=NotionalV2ManualLiquidator.abi)
         initData = liquidator.initialize.encode_input(currencyId)
         contract = deployer.deploy(BeaconProxy, [manual["beacon"], initData])
-        proxies[str(currencyId)] = contract.address
-        self._save()
+        self._record(["manual", "proxies", str(currencyId)], contract.address)
 
     def deployManualLiquidator(self, currencyId):
         manual = {}
@@ -162,4 +163,5 @@ class LiqDeployer:
         self._deployManualLiquidatorImpl(manual)
         self._deployManualBeacon(manual)
         self._deployManualLiquidator(manual, currencyId)
+        self._save()
 
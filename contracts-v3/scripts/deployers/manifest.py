@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+
+# Holds a deployment config (v3.<network>.json, v2.<network>.json) in memory. Every update is
+# appended to a journal next to the config file as it happens, the config itself is only
+# rewritten at checkpoints (flush). If a deployment crashes between checkpoints the journal is
+# replayed over the last flushed config on the next load, so no deployed address is lost and the
+# config file is never left half written.
+#
+#   manifest = DeploymentManifest("v3.mainnet.json")
+#   manifest.set(["libs", "TradingAction"], address)
+#   manifest.flush()
+
+
+def write_json_atomic(path, data):
+    # Writes to a temporary file in the same directory and renames it over the target
+    directory = os.path.dirname(os.path.abspath(path))
+    (fd, tmpPath) = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, sort_keys=True, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+
+class DeploymentManifest:
+    def __init__(self, path, data=None, persist=True) -> None:
+        self.path = path
+        self.journalPath = "{}.journal".format(path)
+        self.persist = persist
+        self.dirty = False
+        if data is None:
+            with open(path, "r") as f:
+                data = json.load(f)
+        self.data = data
+
+        if self.persist and os.path.exists(self.journalPath):
+            self._replay()
+
+    def _replay(self):
+        replayed = 0
+        with open(self.journalPath, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last entry can be partially written during a crash
+                    break
+                if entry["op"] == "set":
+                    self._set(entry["path"], entry["value"])
+                else:
+                    self._delete(entry["path"])
+                replayed += 1
+
+        print("Replayed {} updates from {}".format(replayed, self.journalPath))
+        self.dirty = replayed > 0
+
+    def _parent(self, path):
+        node = self.data
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        return node
+
+    def _set(self, path, value):
+        self._parent(path)[path[-1]] = value
+
+    def _delete(self, path):
+        self._parent(path).pop(path[-1], None)
+
+    def _append(self, entry):
+        self.dirty = True
+        if not self.persist:
+            return
+
+        with open(self.journalPath, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get(self, path, default=None):
+        node = self.data
+        for key in path:
+            if not isinstance(node, dict) or key not in node:
+                return default
+            node = node[key]
+        return node
+
+    def section(self, key):
+        # Returns the top level dict for key, updates through set() are visible in it
+        return self.data.setdefault(key, {})
+
+    def set(self, path, value):
+        self._set(path, value)
+        self._append({"op": "set", "path": path, "value": value})
+
+    def delete(self, path):
+        self._delete(path)
+        self._append({"op": "delete", "path": path})
+
+    def flush(self):
+        if not self.dirty:
+            return
+
+        if self.persist:
+            write_json_atomic(self.path, self.data)
+            # The config now contains every journaled update
+            if os.path.exists(self.journalPath):
+                os.remove(self.journalPath)
+        self.dirty = False
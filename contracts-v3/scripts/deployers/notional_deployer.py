@@ -1,4 +1,3 @@
-import json
 import subprocess
 
 from brownie import (
@@ -34,9 +33,67 @@ from brownie import (
 )
 from brownie.network import web3
 from scripts.common import loadContractFromABI
-from scripts.deployers.contract_deployer import ContractDeployer
+from scripts.deployers.contract_deployer import ContractDeployer, flush_lib_map
+from scripts.deployers.deploy_scheduler import DeployScheduler
+from scripts.deployers.manifest import DeploymentManifest
 from scripts.deployment import deployArtifact
 
+GOVERNANCE_ARTIFACT = (
+    "./artifacts/contracts/external/actions/GovernanceAction.sol/GovernanceAction.json"
+)
+LIBRARIES = [
+    SettleAssetsExternal,
+    FreeCollateralExternal,
+    TradingAction,
+    nTokenMintAction,
+    nTokenRedeemAction,
+    MigrateIncentives,
+]
+ACTIONS = [
+    GovernanceAction,
+    Views,
+    InitializeMarketsAction,
+    nTokenAction,
+    BatchAction,
+    AccountAction,
+    ERC1155Action,
+    LiquidateCurrencyAction,
+    CalculationViews,
+    LiquidatefCashAction,
+    TreasuryAction,
+    VaultAction,
+    VaultAccountAction,
+    VaultLiquidationAction,
+    VaultAccountHealth,
+]
+ACTION_ARGS = {"TreasuryAction": [ZERO_ADDRESS]}
+# Constructor argument order of the routers
+PAUSE_ROUTER_ACTIONS = [
+    "Views",
+    "LiquidateCurrencyAction",
+    "LiquidatefCashAction",
+    "CalculationViews",
+    "VaultAccountHealth",
+]
+ROUTER_ACTIONS = [
+    "GovernanceAction",
+    "Views",
+    "InitializeMarketsAction",
+    "nTokenAction",
+    "BatchAction",
+    "AccountAction",
+    "ERC1155Action",
+    "LiquidateCurrencyAction",
+    "LiquidatefCashAction",
+    "TreasuryAction",
+    "CalculationViews",
+    "VaultAccountAction",
+    "VaultAction",
+    "VaultLiquidationAction",
+    "VaultAccountHealth",
+]
+BEACONS = [nTokenERC20Proxy, PrimeCashProxy, PrimeDebtProxy]
+
 
 class NotionalDeployer:
     def __init__(self, network, deployer, dryRun, config=None, persist=True) -> None:
@@ -49,6 +106,8 @@ class NotionalDeployer:
         self.libs = {}
         self.actions = {}
         self.routers = {}
+        self.beacons = {}
+        self.callbacks = {}
         self.notional = None
         self.deployer = deployer
         self.dryRun = dryRun
@@ -65,36 +124,37 @@ class NotionalDeployer:
             print(output)
 
     def _load(self):
-        if self.config is None:
-            with open("v3.{}.json".format(self.network), "r") as f:
-                self.config = json.load(f)
-        if "libs" in self.config:
-            self.libs = self.config["libs"]
-        if "actions" in self.config:
-            self.actions = self.config["actions"]
-        if "routers" in self.config:
-            self.routers = self.config["routers"]
-        if "beacons" in self.config:
-            self.beacons = self.config["beacons"]
-        if "callbacks" in self.config:
-            self.callbacks = self.config["callbacks"]
+        self.manifest = DeploymentManifest(
+            "v3.{}.json".format(self.network), self.config, self.persist
+        )
+        self.config = self.manifest.data
+        self.libs = self.manifest.section("libs")
+        self.actions = self.manifest.section("actions")
+        self.routers = self.manifest.section("routers")
+        self.beacons = self.manifest.section("beacons")
+        self.callbacks = self.manifest.section("callbacks")
         if "notional" in self.config:
             self.notional = self.config["notional"]
             self.proxy = loadContractFromABI(
                 "NotionalProxy", self.config["notional"], "abi/Notional.json"
             )
 
+    def _record(self, group, name, address):
+        # Journals the address, it is written to the config at the next checkpoint
+        self.manifest.set([group, name], address)
+
     def _save(self):
-        self.config["libs"] = self.libs
-        self.config["actions"] = self.actions
-        self.config["routers"] = self.routers
-        self.config["beacons"] = self.beacons
-        self.config["callbacks"] = self.callbacks
-        if self.notional is not None:
-            self.config["notional"] = self.notional
-        if self.persist:
-            with open("v3.{}.json".format(self.network), "w") as f:
-                json.dump(self.config, f, sort_keys=True, indent=4)
+        flush_lib_map()
+        self.manifest.flush()
+
+    def _getContractDeployer(self, group):
+        return ContractDeployer(
+            self.deployer,
+            {} if group == "libs" else self._groups()[group],
+            self.libs,
+            lambda name, address, isLib: self._record("libs" if isLib else group, name, address),
+            deferLibMap=True,
+        )
 
     def _deployLib(self, deployer, contract):
         if contract._name in self.libs:
@@ -107,18 +167,13 @@ class NotionalDeployer:
             print("Will deploy library {}".format(contract._name))
         else:
             deployed = deployer.deploy(contract, [], "", True, True)
-            self.libs[contract._name] = deployed.address
-            self._save()
             self.verify(contract, deployed)
 
     def deployLibs(self):
-        deployer = ContractDeployer(self.deployer, {}, self.libs)
-        self._deployLib(deployer, SettleAssetsExternal)
-        self._deployLib(deployer, FreeCollateralExternal)
-        self._deployLib(deployer, TradingAction)
-        self._deployLib(deployer, nTokenMintAction)
-        self._deployLib(deployer, nTokenRedeemAction)
-        self._deployLib(deployer, MigrateIncentives)
+        deployer = self._getContractDeployer("libs")
+        for lib in LIBRARIES:
+            self._deployLib(deployer, lib)
+        self._save()
 
     def _deployAction(self, deployer, contract, args=None):
         if contract._name in self.actions:
@@ -133,39 +188,33 @@ class NotionalDeployer:
             # by the hardhat deployment here.
             if contract._name == "GovernanceAction":
                 deployed = deployArtifact(
-                    "./artifacts/contracts/external/actions/GovernanceAction.sol/GovernanceAction.json",
+                    GOVERNANCE_ARTIFACT,
                     [],
                     deployer.deployer,
                     "Governance"
                 )
+                self._record("actions", contract._name, deployed.address)
             else:
                 deployed = deployer.deploy(contract, args, "", True)
 
-            self.actions[contract._name] = deployed.address
-            self._save()
             self.verify(contract, deployed, [] if args is None else args)
 
     def deployAction(self, action, args=None):
-        deployer = ContractDeployer(self.deployer, self.actions, self.libs)
+        deployer = self._getContractDeployer("actions")
         self._deployAction(deployer, action, args)
+        self._save()
 
     def deployActions(self):
-        deployer = ContractDeployer(self.deployer, self.actions, self.libs)
-        self._deployAction(deployer, GovernanceAction)
-        self._deployAction(deployer, Views)
-        self._deployAction(deployer, InitializeMarketsAction)
-        self._deployAction(deployer, nTokenAction)
-        self._deployAction(deployer, BatchAction)
-        self._deployAction(deployer, AccountAction)
-        self._deployAction(deployer, ERC1155Action)
-        self._deployAction(deployer, LiquidateCurrencyAction)
-        self._deployAction(deployer, CalculationViews)
-        self._deployAction(deployer, LiquidatefCashAction)
-        self._deployAction(deployer, TreasuryAction, [ZERO_ADDRESS])
-        self._deployAction(deployer, VaultAction)
-        self._deployAction(deployer, VaultAccountAction)
-        self._deployAction(deployer, VaultLiquidationAction)
-        self._deployAction(deployer, VaultAccountHealth)
+        deployer = self._getContractDeployer("actions")
+        for action in ACTIONS:
+            self._deployAction(deployer, action, ACTION_ARGS.get(action._name))
+        self._save()
+
+    def _getPauseRouterArgs(self, addresses):
+        return [addresses[name] for name in PAUSE_ROUTER_ACTIONS]
+
+    def _getRouterArgs(self, addresses):
+        return [tuple(addresses[name] for name in ROUTER_ACTIONS)]
 
     def _deployRouter(self, deployer, contract, args=[]):
         if contract._name in self.routers:
@@ -192,49 +241,25 @@ class NotionalDeployer:
             print("Deployed {} with args:".format(contract._name))
             print(printArgs)
 
-            self.routers[contract._name] = deployed.address
-            self._save()
             self.verify(contract, deployed, args)
 
     def deployPauseRouter(self):
-        deployer = ContractDeployer(self.deployer, self.routers)
+        deployer = self._getContractDeployer("routers")
         self._deployRouter(
             deployer,
             PauseRouter,
-            [
-                self.actions["Views"],
-                self.actions["LiquidateCurrencyAction"],
-                self.actions["LiquidatefCashAction"],
-                self.actions["CalculationViews"],
-                self.actions["VaultAccountHealth"],
-            ],
+            self._getPauseRouterArgs(self.actions),
         )
+        self._save()
 
     def deployRouter(self):
-        deployer = ContractDeployer(self.deployer, self.routers)
+        deployer = self._getContractDeployer("routers")
         self._deployRouter(
             deployer,
             Router,
-            [
-                (
-                    self.actions["GovernanceAction"],
-                    self.actions["Views"],
-                    self.actions["InitializeMarketsAction"],
-                    self.actions["nTokenAction"],
-                    self.actions["BatchAction"],
-                    self.actions["AccountAction"],
-                    self.actions["ERC1155Action"],
-                    self.actions["LiquidateCurrencyAction"],
-                    self.actions["LiquidatefCashAction"],
-                    self.actions["TreasuryAction"],
-                    self.actions["CalculationViews"],
-                    self.actions["VaultAccountAction"],
-                    self.actions["VaultAction"],
-                    self.actions["VaultLiquidationAction"],
-                    self.actions["VaultAccountHealth"],
-                )
-            ],
+            self._getRouterArgs(self.actions),
         )
+        self._save()
 
     def _deployBeaconImplementation(self, deployer, contract):
         args = [self.notional]
@@ -248,15 +273,13 @@ class NotionalDeployer:
             deployed = deployer.deploy(contract, args, "", True)
             print("Deployed beacon implementation {} with args:".format(contract._name))
 
-            self.beacons[contract._name] = deployed.address
-            self._save()
             self.verify(contract, deployed, args)
 
     def deployBeaconImplementation(self):
-        deployer = ContractDeployer(self.deployer, self.beacons)
-        self._deployBeaconImplementation(deployer, nTokenERC20Proxy)
-        self._deployBeaconImplementation(deployer, PrimeCashProxy)
-        self._deployBeaconImplementation(deployer, PrimeDebtProxy)
+        deployer = self._getContractDeployer("beacons")
+        for beacon in BEACONS:
+            self._deployBeaconImplementation(deployer, beacon)
+        self._save()
 
     def _deployCallback(self, deployer, contract, args):
         if contract._name in self.callbacks:
@@ -269,13 +292,73 @@ class NotionalDeployer:
             deployed = deployer.deploy(contract, args, "", True)
             print("Deployed callback {} with args:".format(contract._name))
 
-            self.callbacks[contract._name] = deployed.address
-            self._save()
             self.verify(contract, deployed, args)
 
     def deployAuthorizedCallbacks(self):
-        deployer = ContractDeployer(self.deployer, self.callbacks)
+        deployer = self._getContractDeployer("callbacks")
         self._deployCallback(deployer, LeveragedNTokenAdapter, [self.notional])
+        self._save()
+
+    def _groups(self):
+        return {
+            "libs": self.libs,
+            "actions": self.actions,
+            "routers": self.routers,
+            "beacons": self.beacons,
+            "callbacks": self.callbacks,
+        }
+
+    def _recordDeployment(self, scheduler, node, deployed):
+        self._record(node.group, node.name, deployed.address)
+        contract = GovernanceAction if node.isArtifact() else node.contract
+        self.verify(contract, deployed, node.getArgs(scheduler.addresses))
+
+    def getScheduler(self):
+        # Builds the deployment graph: libraries -> actions -> routers -> beacons and callbacks,
+        # contracts already in the manifest are treated as resolved
+        resolved = {}
+        for group in self._groups().values():
+            resolved.update(group)
+
+        scheduler = DeployScheduler(
+            self.deployer, resolved=resolved, onWave=self._save, deferLibMap=True
+        )
+        scheduler.onDeployed = lambda node, deployed: self._recordDeployment(
+            scheduler, node, deployed
+        )
+        for lib in LIBRARIES:
+            scheduler.add(lib._name, lib, "libs")
+        for action in ACTIONS:
+            contract = GOVERNANCE_ARTIFACT if action._name == "GovernanceAction" else action
+            scheduler.add(action._name, contract, "actions", args=ACTION_ARGS.get(action._name))
+
+        scheduler.add(
+            "PauseRouter",
+            PauseRouter,
+            "routers",
+            deps=PAUSE_ROUTER_ACTIONS,
+            args=self._getPauseRouterArgs,
+        )
+        scheduler.add("Router", Router, "routers", deps=ROUTER_ACTIONS, args=self._getRouterArgs)
+
+        if self.notional is None:
+            print("Notional proxy is not deployed, skipping beacons and callbacks")
+        else:
+            for beacon in BEACONS:
+                scheduler.add(beacon._name, beacon, "beacons", args=[self.notional])
+            scheduler.add(
+                LeveragedNTokenAdapter._name,
+                LeveragedNTokenAdapter,
+                "callbacks",
+                args=[self.notional],
+            )
+
+        return scheduler
+
+    def deployAll(self):
+        # Deploys every missing library, action, router and beacon implementation in waves of
+        # concurrent transactions instead of one contract at a time
+        self.getScheduler().run(self.dryRun)
 
     def upgradeProxy(self, oldRouter):
         print("Upgrading router from {} to {}".format(oldRouter, self.routers["Router"]))
@@ -300,4 +383,5 @@ class NotionalDeployer:
         )
         contract = deployer.deploy(nProxy, [self.routers["Router"], initializeData], "", True)
         self.notional = contract.address
+        self.manifest.set(["notional"], self.notional)
         self._save()
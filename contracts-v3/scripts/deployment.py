@@ -56,6 +56,7 @@ from scripts.config import (
     PrimeCashCurve,
     TokenConfig,
 )
+from scripts.common import LazyDict
 from tests.constants import ZERO_ADDRESS
 
 chain = Chain()
@@ -254,6 +255,14 @@ def deployArtifact(path, constructorArgs, deployer, name):
     return Contract.from_abi(name, tx_receipt.contract_address, abi=artifact["abi"], owner=deployer)
 
 
+def loadArtifact(path, address, deployer, name):
+    # Loads a contract deployed by deployArtifact without sending a transaction
+    with open(path, "r") as a:
+        artifact = json.load(a)
+
+    return Contract.from_abi(name, address, abi=artifact["abi"], owner=deployer)
+
+
 class TestEnvironment:
     def __init__(self, deployer, withGovernance=False, multisig=None):
         self.deployer = deployer
@@ -273,11 +282,13 @@ class TestEnvironment:
         self.ethOracle = {"ETH": zeroAddress}
         self.cToken = {}
         self.cTokenAggregator = {}
-        self.nToken = {}
+        # Proxy wrappers are built when a test first uses them
+        self.nToken = LazyDict()
         self.router = {}
-        self.pCash = {}
-        self.pDebt = {}
-        self.proxies = {}
+        self.pCash = LazyDict()
+        self.pDebt = LazyDict()
+        self._proxies = {}
+        self._proxyCurrencies = set()
         self.primeCashOracle = {}
         self.multisig = multisig
         self.primeCashScalars = {"ETH": 50, "DAI": 49, "USDC": 48, "WBTC": 47}
@@ -496,39 +507,158 @@ class TestEnvironment:
 
         self.currencyId[symbol] = currencyId
         self.symbol[currencyId] = symbol
-        nTokenAddress = self.notional.nTokenAddress(currencyId)
-        self.nToken[currencyId] = Contract.from_abi(
-            "nToken", nTokenAddress, abi=nTokenERC20Proxy.abi, owner=self.deployer
+        self.nToken.setLazy(
+            currencyId,
+            lambda: Contract.from_abi(
+                "nToken",
+                self.notional.nTokenAddress(currencyId),
+                abi=nTokenERC20Proxy.abi,
+                owner=self.deployer,
+            ),
         )
-
-        pCashAddress = self.notional.pCashAddress(currencyId)
-        self.pCash[currencyId] = Contract.from_abi(
-            "pCash", pCashAddress, abi=PrimeCashProxy.abi, owner=self.deployer
+        self.pCash.setLazy(
+            currencyId,
+            lambda: Contract.from_abi(
+                "pCash",
+                self.notional.pCashAddress(currencyId),
+                abi=PrimeCashProxy.abi,
+                owner=self.deployer,
+            ),
         )
-
-        pDebtAddress = self.notional.pDebtAddress(currencyId)
-        self.pDebt[currencyId] = Contract.from_abi(
-            "pDebt", pDebtAddress, abi=PrimeDebtProxy.abi, owner=self.deployer
+        self.pDebt.setLazy(
+            currencyId,
+            lambda: Contract.from_abi(
+                "pDebt",
+                self.notional.pDebtAddress(currencyId),
+                abi=PrimeDebtProxy.abi,
+                owner=self.deployer,
+            ),
         )
 
-        self.proxies[nTokenAddress] = { 
-            'assetType': 'nToken',
-            'currencyId': currencyId,
-            'underlying': symbol,
-            'symbol': self.nToken[currencyId].symbol()
+    @property
+    def proxies(self):
+        # Entries for newly enabled currencies are added on access, symbols are only fetched
+        # when they are read
+        for currencyId in sorted(set(self.symbol.keys()) - self._proxyCurrencies):
+            for (assetType, contracts) in [
+                ("nToken", self.nToken),
+                ("pCash", self.pCash),
+                ("pDebt", self.pDebt),
+            ]:
+                contract = contracts[currencyId]
+                self._proxies[contract.address] = LazyDict(
+                    {
+                        "assetType": assetType,
+                        "currencyId": currencyId,
+                        "underlying": self.symbol[currencyId],
+                    },
+                    {"symbol": contract.symbol},
+                )
+            self._proxyCurrencies.add(currencyId)
+
+        return self._proxies
+
+    def toManifest(self):
+        # Addresses and metadata required to rebuild this object against a node that has had its
+        # state restored, see fromManifest
+        def addresses(contracts):
+            # ETH token and oracle entries are the zero address rather than contracts
+            return {str(k): v.address for (k, v) in contracts.items() if hasattr(v, "address")}
+
+        return {
+            "proxyAdmin": self.proxyAdmin.address,
+            "compPriceOracle": self.compPriceOracle.address,
+            "comptroller": self.comptroller.address,
+            "currencyId": self.currencyId,
+            "token": addresses(self.token),
+            "ethOracle": addresses(self.ethOracle),
+            "cToken": addresses(self.cToken),
+            "cTokenAggregator": addresses(self.cTokenAggregator),
+            "nToken": addresses(self.nToken),
+            "pCash": addresses(self.pCash),
+            "pDebt": addresses(self.pDebt),
+            "primeCashOracle": addresses(self.primeCashOracle),
+            "proxies": {k: dict(v) for (k, v) in self.proxies.items()},
+            "primeCashScalars": self.primeCashScalars,
+            "multisig": None if self.multisig is None else self.multisig.address,
+            "WETH": self.WETH.address,
+            "COMP": self.COMP.address,
+            "noteERC20Proxy": self.noteERC20Proxy.address,
+            "governor": self.governor.address if hasattr(self, "governor") else None,
+            "pauseRouter": self.pauseRouter.address,
+            "router": self.router.address,
+            "proxy": self.proxy.address,
+            "startTime": self.startTime,
         }
-        self.proxies[pCashAddress] = { 
-            'assetType': 'pCash',
-            'currencyId': currencyId,
-            'underlying': symbol,
-            'symbol': self.pCash[currencyId].symbol()
+
+    @classmethod
+    def fromManifest(cls, manifest, deployer):
+        env = cls.__new__(cls)
+        env.deployer = deployer
+        env.proxyAdmin = nProxyAdmin.at(manifest["proxyAdmin"])
+        env.compPriceOracle = loadArtifact(
+            "scripts/artifacts/nPriceOracle.json",
+            manifest["compPriceOracle"],
+            deployer,
+            "nPriceOracle",
+        )
+        env.comptroller = loadArtifact(
+            "scripts/artifacts/nComptroller.json", manifest["comptroller"], deployer, "nComptroller"
+        )
+        env.currencyId = manifest["currencyId"]
+        env.symbol = {currencyId: symbol for (symbol, currencyId) in env.currencyId.items()}
+        env.token = {"ETH": zeroAddress}
+        env.token.update({k: MockERC20.at(v) for (k, v) in manifest["token"].items()})
+        env.ethOracle = {"ETH": zeroAddress}
+        env.ethOracle.update({k: MockAggregator.at(v) for (k, v) in manifest["ethOracle"].items()})
+        env.cToken = {
+            k: loadArtifact("scripts/artifacts/nCEther.json", v, deployer, "cETH")
+            if k == "ETH"
+            else loadArtifact("scripts/artifacts/nCErc20.json", v, deployer, "cErc20")
+            for (k, v) in manifest["cToken"].items()
         }
-        self.proxies[pDebtAddress] = { 
-            'assetType': 'pDebt',
-            'currencyId': currencyId,
-            'underlying': symbol,
-            'symbol': self.pDebt[currencyId].symbol()
+        env.cTokenAggregator = {
+            k: cTokenV2Aggregator.at(v) for (k, v) in manifest["cTokenAggregator"].items()
         }
+        def proxies(name, abi):
+            return LazyDict(
+                factories={
+                    int(k): lambda v=v: Contract.from_abi(name, v, abi=abi, owner=deployer)
+                    for (k, v) in manifest[name].items()
+                }
+            )
+
+        env.nToken = proxies("nToken", nTokenERC20Proxy.abi)
+        env.pCash = proxies("pCash", PrimeCashProxy.abi)
+        env.pDebt = proxies("pDebt", PrimeDebtProxy.abi)
+        env.primeCashOracle = {
+            k: CompoundV2HoldingsOracle.at(v) for (k, v) in manifest["primeCashOracle"].items()
+        }
+        env._proxies = manifest["proxies"]
+        env._proxyCurrencies = set(env.symbol.keys())
+        env.primeCashScalars = manifest["primeCashScalars"]
+        env.multisig = None if manifest["multisig"] is None else accounts.at(manifest["multisig"])
+        env.vaults = []
+        env.WETH = MockWETH.at(manifest["WETH"])
+        env.COMP = MockERC20.at(manifest["COMP"])
+        env.noteERC20Proxy = nProxy.at(manifest["noteERC20Proxy"])
+        env.noteERC20 = Contract.from_abi(
+            "NoteERC20", manifest["noteERC20Proxy"], abi=NoteERC20.abi
+        )
+        if manifest["governor"] is not None:
+            env.governor = GovernorAlpha.at(manifest["governor"])
+        env.pauseRouter = PauseRouter.at(manifest["pauseRouter"])
+        env.router = Router.at(manifest["router"])
+        env.proxy = nProxy.at(manifest["proxy"])
+        env.notional = Contract.from_abi(
+            "Notional",
+            manifest["proxy"],
+            abi=ContractsV3Project._build.get("NotionalProxy")["abi"],
+            owner=deployer,
+        )
+        env.startTime = manifest["startTime"]
+
+        return env
 
     def approxPrimeCash(self, symbol, underlying, abs=150, rel=None):
         currencyId = self.currencyId[symbol]
@@ -1,7 +1,9 @@
 import hashlib
 import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from brownie import (
@@ -20,14 +22,57 @@ from brownie import (
     Views,
     nTokenAction,
 )
+from brownie.network import web3
+from scripts.deployers.lib_validator import validate_lib_links
 
-ETHERSCAN_TOKEN = os.environ["ARBISCAN_TOKEN"]
+# Compares the verified explorer source of every deployed router, action and library against the
+# local build. Explorer responses are fetched concurrently under a rate limit and cached on disk by
+# address and deployed code hash, so a re-run only fetches contracts that have changed. Hashes of
+# the local build artifacts are cached by file mtime. Usage:
+#
+#   brownie run scripts/download_sources.py --network arbitrum-one
+
+ETHERSCAN_TOKEN = os.environ.get("ARBISCAN_TOKEN")
 ROUTER = "0x762F2e0743bce7bb55C622504D88D471B230A84a"
 
 ETHERSCAN_API = (
     # "https://api.etherscan.io/api?module=contract&action=getsourcecode&address={}&apikey={}"
     "https://api.arbiscan.io/api?module=contract&action=getsourcecode&address={}&apikey={}"
 )
+# Actions that link libraries, keyed by their name in get_contracts
+ACTION_CONTAINERS = {
+    "Views": Views,
+    "InitializeMarket": InitializeMarketsAction,
+    "nTokenActions": nTokenAction,
+    "BatchAction": BatchAction,
+    "AccountAction": AccountAction,
+    "ERC1155": ERC1155Action,
+    "LiquidateCurrency": LiquidateCurrencyAction,
+    "LiquidatefCash": LiquidatefCashAction,
+    "CalculationViews": CalculationViews,
+    "VaultAccountAction": VaultAccountAction,
+    "VaultAction": VaultAction,
+    "VaultLiquidationAction": VaultLiquidationAction,
+}
+# Library contract names and their names in get_contracts
+LIBRARY_NAMES = {
+    "FreeCollateralExternal": "FreeCollateral",
+    "MigrateIncentives": "MigrateIncentives",
+    "SettleAssetsExternal": "SettleAssets",
+    "TradingAction": "TradingAction",
+    "nTokenMintAction": "nTokenMint",
+    "nTokenRedeemAction": "nTokenRedeem",
+}
+# The free explorer API tier allows five calls per second
+REQUESTS_PER_SECOND = 5
+MAX_WORKERS = 8
+MAX_RETRIES = 3
+# Seconds before a stalled explorer request is abandoned and retried
+REQUEST_TIMEOUT = 30
+
+CACHE_DIR = os.path.join("build", "source-cache")
+RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, "responses")
+BUILD_HASHES_FILE = os.path.join(CACHE_DIR, "build_hashes.json")
 
 
 def get_contracts(router):
@@ -63,17 +108,101 @@ def get_contracts(router):
     return contracts
 
 
-def get_contract_hashes(address, name, existing_hashes):
-    resp = requests.get(ETHERSCAN_API.format(address, ETHERSCAN_TOKEN)).json()
-    full_output = {}
-    hashes = {}
+class TokenBucket:
+    def __init__(self, rate, capacity=None) -> None:
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.tokens = self.capacity
+        self.updatedAt = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updatedAt) * self.rate)
+                self.updatedAt = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_code_hash(address):
+    return web3.keccak(web3.eth.get_code(address)).hex()
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmpPath = "{}.{}.tmp".format(path, threading.get_ident())
+    with open(tmpPath, "w") as f:
+        json.dump(data, f)
+    os.replace(tmpPath, path)
+
+
+def fetch_source(
+    address,
+    codeHash,
+    limiter,
+    apiUrl=ETHERSCAN_API,
+    token=ETHERSCAN_TOKEN,
+    cacheDir=RESPONSE_CACHE_DIR,
+    timeout=REQUEST_TIMEOUT,
+):
+    # The verified source cannot change without the deployed code changing
+    cachePath = os.path.join(cacheDir, "{}-{}.json".format(address.lower(), codeHash))
+    if os.path.exists(cachePath):
+        with open(cachePath, "r") as f:
+            return json.load(f)
+
+    for _ in range(MAX_RETRIES):
+        limiter.acquire()
+        try:
+            resp = requests.get(apiUrl.format(address, token), timeout=timeout).json()
+        except requests.RequestException as e:
+            # Network errors are retried like rate limited responses
+            print("Explorer request for {} failed: {}".format(address, e))
+            continue
+
+        if resp["status"] == "1":
+            _write_json(cachePath, resp)
+            return resp
+        print("Explorer request for {} failed: {}".format(address, resp["result"]))
+
+    raise Exception("Could not fetch source for {}".format(address))
+
+
+def fetch_sources(
+    contracts,
+    getCodeHash=get_code_hash,
+    apiUrl=ETHERSCAN_API,
+    token=ETHERSCAN_TOKEN,
+    cacheDir=RESPONSE_CACHE_DIR,
+    rate=REQUESTS_PER_SECOND,
+    maxWorkers=MAX_WORKERS,
+    timeout=REQUEST_TIMEOUT,
+):
+    limiter = TokenBucket(rate)
+
+    def fetch(item):
+        (name, address) = item
+        codeHash = getCodeHash(address)
+        return (name, fetch_source(address, codeHash, limiter, apiUrl, token, cacheDir, timeout))
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        return dict(executor.map(fetch, contracts.items()))
+
+
+def get_contract_hashes(resp, name, existing_hashes):
     print("Analyzing {}...".format(name))
+    hashes = {}
+    results = {}
     for r in resp["result"]:
         source_code = json.loads(r["SourceCode"][1:-1])
 
         for (c, source) in source_code["sources"].items():
             encoded = source["content"].replace("\r", "")
-            source_code["sources"][c]["content"] = encoded
             hash_output = hashlib.sha1(encoded.encode("utf8")).hexdigest()
             hashes[c] = hash_output
 
@@ -82,38 +211,58 @@ def get_contract_hashes(address, name, existing_hashes):
                 or c.startswith("@openzeppelin")
                 or c == "contracts/global/Types.sol"
             ):
-                pass
+                results[c] = "ignored"
             elif c not in existing_hashes:
                 print("😔 {} not found".format(c))
+                results[c] = "not found"
             elif existing_hashes[c] == hash_output:
-                pass
-                # print("✅ {} matches".format(c))
+                results[c] = "match"
             else:
-                print("💀 {} mismatch".format(c, name, address))
+                print("💀 {} mismatch".format(c))
+                results[c] = "mismatch"
+
+    return (hashes, results)
 
-        full_output[r["ContractName"]] = {
-            "SourceCode": source_code,
-            "ConstructorArguments": r["ConstructorArguments"],
-        }
 
+def build_existing_hashes(buildDir="./build", cachePath=BUILD_HASHES_FILE):
+    # Artifacts are only re-parsed when their mtime or size has changed since the last run
+    cache = {}
+    if cachePath is not None and os.path.exists(cachePath):
+        with open(cachePath, "r") as f:
+            cache = json.load(f)
 
-def build_existing_hashes():
+    skipped = [
+        os.path.join(buildDir, d)
+        for d in ["deployments", "interfaces", "env-cache", "source-cache"]
+    ]
     hashes = {}
-    for root, dirs, files in os.walk("./build"):
-        if root.startswith("./build/deployments"):
-            continue
-        if root.startswith("./build/interfaces"):
+    index = {}
+    for root, dirs, files in os.walk(buildDir):
+        if any(root.startswith(s) for s in skipped):
             continue
         for name in files:
-            if name == "tests.json":
+            if name == "tests.json" or not name.endswith(".json"):
                 continue
-            if name.endswith(".json"):
-                print(os.path.join(root, name))
-                with open(os.path.join(root, name), "r") as f:
+
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            entry = cache.get(path)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                print(path)
+                with open(path, "r") as f:
                     data = json.load(f)
-                    hashes[data["sourcePath"]] = hashlib.sha1(
-                        data["source"].encode("utf8")
-                    ).hexdigest()
+                entry = {
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sourcePath": data["sourcePath"],
+                    "hash": hashlib.sha1(data["source"].encode("utf8")).hexdigest(),
+                }
+
+            index[path] = entry
+            hashes[entry["sourcePath"]] = entry["hash"]
+
+    if cachePath is not None and index != cache:
+        _write_json(cachePath, index)
 
     return hashes
 
@@ -121,72 +270,20 @@ def build_existing_hashes():
 def validate_libs(contracts):
     print("Validating Libraries...\n")
 
-    c = Contract.from_abi("", contracts["Views"], Views.abi)
-    assert (contracts["FreeCollateral"], contracts["MigrateIncentives"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["InitializeMarket"], InitializeMarketsAction.abi)
-    assert (contracts["nTokenMint"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["nTokenActions"], nTokenAction.abi)
-    assert (
-        contracts["FreeCollateral"],
-        contracts["MigrateIncentives"],
-        contracts["SettleAssets"],
-    ) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["BatchAction"], BatchAction.abi)
-    assert (
-        contracts["FreeCollateral"],
-        contracts["MigrateIncentives"],
-        contracts["SettleAssets"],
-        contracts["TradingAction"],
-        contracts["nTokenMint"],
-        contracts["nTokenRedeem"],
-    ) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["AccountAction"], AccountAction.abi)
-    assert (
-        contracts["FreeCollateral"],
-        contracts["MigrateIncentives"],
-        contracts["SettleAssets"],
-        contracts["nTokenRedeem"],
-    ) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["ERC1155"], ERC1155Action.abi)
-    assert (contracts["FreeCollateral"], contracts["SettleAssets"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["LiquidateCurrency"], LiquidateCurrencyAction.abi)
-    assert (contracts["FreeCollateral"], contracts["MigrateIncentives"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["LiquidatefCash"], LiquidatefCashAction.abi)
-    assert (contracts["FreeCollateral"], contracts['SettleAssets']) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["CalculationViews"], CalculationViews.abi)
-    assert (contracts["MigrateIncentives"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["VaultAccountAction"], VaultAccountAction.abi)
-    assert (contracts["TradingAction"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["VaultAction"], VaultAction.abi)
-    assert (contracts["TradingAction"]) == c.getLibInfo()
-
-    c = Contract.from_abi("", contracts["VaultLiquidationAction"], VaultLiquidationAction.abi)
-    assert (contracts["FreeCollateral"], contracts["SettleAssets"]) == c.getLibInfo()
+    deployed = {
+        name: Contract.from_abi(name, contracts[name], container.abi)
+        for (name, container) in ACTION_CONTAINERS.items()
+    }
+    libAddresses = {lib: contracts[name] for (lib, name) in LIBRARY_NAMES.items()}
+    validate_lib_links(ACTION_CONTAINERS, deployed, libAddresses)
 
 
 def main():
-    # with open("existing_hashes.json", "r") as f:
-    #     existing_hashes = json.load(f)
-
-    # with open("contracts.json", "r") as f:
-    #     contracts = json.load(f)
     contracts = get_contracts(ROUTER)
     existing_hashes = build_existing_hashes()
 
     validate_libs(contracts)
 
-    get_contract_hashes(ROUTER, "new_router", existing_hashes)
-
-    for (name, address) in contracts.items():
-        get_contract_hashes(address, name, existing_hashes)
-        time.sleep(0.5)
+    sources = fetch_sources({"new_router": ROUTER, **contracts})
+    for (name, resp) in sources.items():
+        get_contract_hashes(resp, name, existing_hashes)
@@ -0,0 +1,289 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import warnings
+
+from brownie import accounts
+from brownie._config import CONFIG
+from brownie.network import rpc, web3
+from brownie.project import ContractsV3Project
+from scripts.deployment import TestEnvironment
+from scripts.local_node import LocalNode, get_cmd_settings, restore_chain_time, rpc_request
+
+# Caches a deployed TestEnvironment as a node state snapshot plus a manifest of its addresses so
+# that later sessions can restore the state and rebuild the python objects without sending any
+# transactions. Entries are keyed by a hash of the build artifacts and deployment scripts, so any
+# recompile or change to the deployment invalidates them. Set ENV_CACHE=0 to disable.
+#
+# On anvil the state is dumped and loaded into the running node over RPC. Ganache state is a
+# database directory which can only be used when a node is launched, so test sessions launch
+# ganache themselves (launch_session_node, called from tests/conftest.py) on a copy of the last
+# entry saved for the network. Every module reset then returns to a state that already holds the
+# environment and only the python objects are rebuilt. When an environment is not in the state
+# it is deployed, then the node is restarted to flush its database into a new entry which the
+# next session launches from.
+#
+# On fork networks the dumped state also holds every account and storage slot the node fetched
+# from the upstream node while the environment was built, so a restored environment only fetches
+# state that was never accessed before. Fork entries are keyed by network and fork block and are
+# only used when the fork is pinned to a block.
+
+CACHE_DIR = os.path.join("build", "env-cache")
+STATE_FILE = "state"
+MANIFEST_FILE = "manifest.json"
+# Points to the last ganache entry saved for a network, keyed by network id
+GANACHE_POINTER = "ganache-{}.json"
+# Changes to these alter what gets deployed without changing any artifact
+DEPENDENCIES = ["scripts/config.py", "scripts/deployment.py", "tests/helpers.py"]
+
+_artifactsHash = None
+# The ganache node launched for the test session and the entry its state was copied from
+_session = {}
+_warned = set()
+
+
+def is_enabled():
+    return os.environ.get("ENV_CACHE", "1") != "0"
+
+
+def get_backend():
+    clientVersion = web3.clientVersion.lower()
+    if "anvil" in clientVersion:
+        return "anvil"
+    elif "ganache" in clientVersion or "testrpc" in clientVersion:
+        # Ganache 7 reports itself as EthereumJS TestRPC
+        return "ganache"
+    return None
+
+
+def warn_bypassed(reason):
+    # Shown once per reason in the pytest warnings summary
+    if reason not in _warned:
+        _warned.add(reason)
+        warnings.warn("Environment cache bypassed: {}".format(reason), stacklevel=3)
+
+
+def get_artifacts_hash():
+    global _artifactsHash
+    if _artifactsHash is not None:
+        return _artifactsHash
+
+    h = hashlib.sha256()
+    for (name, build) in sorted(ContractsV3Project._build.items(), key=lambda x: x[0]):
+        h.update(name.encode())
+        h.update(build.get("bytecode", "").encode())
+    for path in DEPENDENCIES + sorted(glob.glob("scripts/artifacts/*.json")):
+        with open(path, "rb") as f:
+            h.update(f.read())
+
+    _artifactsHash = h.hexdigest()[:16]
+    return _artifactsHash
+
+
+def get_fork_block():
+    # Returns None when not on a fork, raises when the fork is not pinned to a block
+    settings = CONFIG.active_network.get("cmd_settings") or {}
+    if "fork" not in settings and "fork_block" not in settings:
+        return None
+    if "fork_block" not in settings:
+        raise Exception("Fork state can only be cached for a pinned fork_block")
+    return settings["fork_block"]
+
+
+def get_fork_name(name):
+    forkBlock = get_fork_block()
+    if forkBlock is None:
+        return name
+    return "{}-{}-{}".format(CONFIG.active_network["id"], forkBlock, name)
+
+
+def get_cache_path(name, dependencies=()):
+    # Additional dependencies are scripts that change the cached state for this entry only
+    key = get_artifacts_hash()
+    if len(dependencies) > 0:
+        h = hashlib.sha256(key.encode())
+        for path in dependencies:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        key = h.hexdigest()[:16]
+
+    return os.path.join(CACHE_DIR, "{}-{}".format(name, key))
+
+
+def has_entry(cachePath):
+    return os.path.exists(os.path.join(cachePath, STATE_FILE)) and os.path.exists(
+        os.path.join(cachePath, MANIFEST_FILE)
+    )
+
+
+def get_manifest(env):
+    manifest = env.toManifest()
+    manifest["timestamp"] = web3.eth.get_block("latest")["timestamp"]
+    return manifest
+
+
+def write_manifest(manifest, cachePath):
+    # Written last and renamed into place so a partially written entry is never used
+    os.makedirs(cachePath, exist_ok=True)
+    tmpPath = os.path.join(cachePath, "{}.{}.tmp".format(MANIFEST_FILE, os.getpid()))
+    with open(tmpPath, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmpPath, os.path.join(cachePath, MANIFEST_FILE))
+
+
+def read_manifest(cachePath):
+    with open(os.path.join(cachePath, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def _read_pointer(networkId):
+    try:
+        with open(os.path.join(CACHE_DIR, GANACHE_POINTER.format(networkId)), "r") as f:
+            return json.load(f)["cachePath"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_pointer(networkId, cachePath):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, GANACHE_POINTER.format(networkId))
+    tmpPath = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmpPath, "w") as f:
+        json.dump({"cachePath": cachePath}, f)
+    os.replace(tmpPath, path)
+
+
+def launch_session_node(networkId):
+    # Must be called before brownie connects, brownie then attaches to the launched node
+    network = CONFIG.networks.get(networkId, {})
+    cmd = network.get("cmd", "")
+    if not is_enabled() or "ganache" not in cmd or len(_session) > 0:
+        return None
+
+    settings = get_cmd_settings(networkId)
+    try:
+        rpc_request(settings["port"], "eth_chainId")
+        warn_bypassed("a node is already listening on port {}".format(settings["port"]))
+        return None
+    except OSError:
+        pass
+
+    cachePath = _read_pointer(networkId)
+    dbPath = tempfile.mkdtemp(prefix="ganache-")
+    if cachePath is not None and has_entry(cachePath):
+        shutil.copytree(os.path.join(cachePath, STATE_FILE), dbPath, dirs_exist_ok=True)
+        print("Launching {} from environment cache {}".format(networkId, cachePath))
+    else:
+        cachePath = None
+
+    node = LocalNode(settings["port"], "ganache", state=dbPath, cmdSettings=settings, cmd=cmd)
+    node.start()
+    _session.update(node=node, dbPath=dbPath, cachePath=cachePath, networkId=networkId)
+    atexit.register(stop_session_node)
+    return node
+
+
+def stop_session_node():
+    if len(_session) == 0:
+        return
+    _session["node"].stop()
+    shutil.rmtree(_session["dbPath"], ignore_errors=True)
+    _session.clear()
+
+
+def load_environment(cachePath, deployer, envClass=TestEnvironment):
+    manifest = read_manifest(cachePath)
+    if get_backend() == "anvil":
+        with open(os.path.join(cachePath, STATE_FILE), "r") as f:
+            response = web3.provider.make_request("anvil_loadState", [f.read()])
+        if "error" in response:
+            raise Exception("anvil_loadState failed: {}".format(response["error"]))
+
+    # Tests depend on the time relative to market initialization, so time is restored to when
+    # the snapshot was taken rather than the current wall clock
+    restore_chain_time(manifest["timestamp"])
+    return envClass.fromManifest(manifest, deployer)
+
+
+def _save_ganache_state(cachePath):
+    # Ganache only flushes its database when it stops, the node is restarted on the same
+    # database so the session continues from the saved state
+    node = _session["node"]
+    os.makedirs(cachePath, exist_ok=True)
+    tmpPath = os.path.join(cachePath, "{}.{}.tmp".format(STATE_FILE, os.getpid()))
+    try:
+        node.dump_state(tmpPath)
+        statePath = os.path.join(cachePath, STATE_FILE)
+        # Another xdist worker may have saved the same entry first
+        shutil.rmtree(statePath, ignore_errors=True)
+        os.replace(tmpPath, statePath)
+    finally:
+        node.start()
+
+    # Contracts and snapshots of the previous process are gone, attaching again resets brownie's
+    # snapshot to the restarted state
+    rpc.attach("http://127.0.0.1:{}".format(node.port))
+    _session["cachePath"] = cachePath
+    _write_pointer(_session["networkId"], cachePath)
+
+
+def save_environment(env, cachePath):
+    if get_backend() == "ganache":
+        manifest = get_manifest(env)
+        _save_ganache_state(cachePath)
+        write_manifest(manifest, cachePath)
+        return
+
+    response = web3.provider.make_request("anvil_dumpState", [])
+    if "error" in response:
+        raise Exception("anvil_dumpState failed: {}".format(response["error"]))
+
+    # xdist workers may save the same entry concurrently, each writes its own file and renames
+    # it into place
+    os.makedirs(cachePath, exist_ok=True)
+    tmpPath = os.path.join(cachePath, "{}.{}.tmp".format(STATE_FILE, os.getpid()))
+    with open(tmpPath, "w") as f:
+        f.write(response["result"])
+    os.replace(tmpPath, os.path.join(cachePath, STATE_FILE))
+    write_manifest(get_manifest(env), cachePath)
+
+
+def cached_environment(name, builder, deployer=None, envClass=TestEnvironment, dependencies=()):
+    # Returns the environment created by builder, restoring it from the cache when possible.
+    # envClass must implement toManifest and fromManifest.
+    deployer = accounts[0] if deployer is None else deployer
+    if not is_enabled():
+        return builder()
+
+    backend = get_backend()
+    if backend is None:
+        warn_bypassed("{} does not support state snapshots".format(web3.clientVersion))
+        return builder()
+    elif backend == "ganache" and len(_session) == 0:
+        warn_bypassed("ganache was not launched by the test session")
+        return builder()
+
+    try:
+        cachePath = get_cache_path("{}_{}".format(get_fork_name(name), backend), dependencies)
+    except Exception as e:
+        warn_bypassed(str(e))
+        return builder()
+
+    # Ganache entries can only be used when the session node was launched from them
+    if has_entry(cachePath) and (backend == "anvil" or _session["cachePath"] == cachePath):
+        try:
+            return load_environment(cachePath, deployer, envClass)
+        except Exception as e:
+            print("Discarding environment cache {}: {}".format(cachePath, e))
+            shutil.rmtree(cachePath, ignore_errors=True)
+
+    env = builder()
+    save_environment(env, cachePath)
+    if backend == "ganache":
+        # Contracts deployed before the restart are no longer tracked by brownie
+        return load_environment(cachePath, deployer, envClass)
+    return env
@@ -1,4 +1,5 @@
-from brownie import Contract, cTokenV2Aggregator
+from brownie import cTokenV2Aggregator
+from scripts.abi_cache import get_contract
 from scripts.common import loadContractFromABI, loadContractFromArtifact
 
 
@@ -31,7 +32,7 @@ class EnvironmentV2:
             else:
                 path = "scripts/compound_artifacts/nCErc20.json"
             self.ctokens[k] = loadContractFromArtifact("c{}".format(k), v["address"], path)
-            self.cTokenOracles[k] = Contract.from_abi(
+            self.cTokenOracles[k] = get_contract(
                 "c{}Oracle".format(k), v["oracle"], cTokenV2Aggregator.abi
             )
 
@@ -1,29 +1,22 @@
-import json
-
 from brownie import SecondaryRewarder
 from brownie.project import ContractsV3Project
+from scripts.abi_cache import write_abi
 
 
 def main():
     NotionalABI = ContractsV3Project._build.get("NotionalProxy")["abi"]
-    with open("abi/Notional.json", "w") as f:
-        json.dump(NotionalABI, f, sort_keys=True, indent=4)
+    write_abi("abi/Notional.json", NotionalABI)
 
-    with open("abi/SecondaryRewarder.json", "w") as f:
-        json.dump(SecondaryRewarder.abi, f, sort_keys=True, indent=4)
+    write_abi("abi/SecondaryRewarder.json", SecondaryRewarder.abi)
 
     StrategyVaultABI = ContractsV3Project._build.get("IStrategyVault")["abi"]
-    with open("abi/IStrategyVault.json", "w") as f:
-        json.dump(StrategyVaultABI, f, sort_keys=True, indent=4)
+    write_abi("abi/IStrategyVault.json", StrategyVaultABI)
 
     ERC4626ABI = ContractsV3Project._build.get("BaseERC4626Proxy")["abi"]
-    with open("abi/ERC4626.json", "w") as f:
-        json.dump(ERC4626ABI, f, sort_keys=True, indent=4)
+    write_abi("abi/ERC4626.json", ERC4626ABI)
 
     PrimeCashHoldingsOracle = ContractsV3Project._build.get("IPrimeCashHoldingsOracle")["abi"]
-    with open("abi/PrimeCashHoldingsOracle.json", "w") as f:
-        json.dump(PrimeCashHoldingsOracle, f, sort_keys=True, indent=4)
+    write_abi("abi/PrimeCashHoldingsOracle.json", PrimeCashHoldingsOracle)
 
     LeveragedNTokenAdapater = ContractsV3Project._build.get("LeveragedNTokenAdapter")["abi"]
-    with open("abi/LeveragedNTokenAdapter.json", "w") as f:
-        json.dump(LeveragedNTokenAdapater, f, sort_keys=True, indent=4)
\ No newline at end of file
+    write_abi("abi/LeveragedNTokenAdapter.json", LeveragedNTokenAdapater)
\ No newline at end of file
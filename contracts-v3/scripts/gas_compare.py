@@ -0,0 +1,154 @@
+import argparse
+import json
+import sys
+
+# Compares the output of scripts/gas_stats.py against a committed baseline. Usage:
+#   python scripts/gas_compare.py --baseline gas_stats.baseline.json --new gas_stats.json
+# Exits with a non zero status if any key regresses beyond both the absolute and relative budget.
+
+DEFAULT_BASELINE = "gas_stats.baseline.json"
+DEFAULT_NEW = "gas_stats.json"
+DEFAULT_ABS_THRESHOLD = 500
+DEFAULT_REL_THRESHOLD = 0.01
+CASES = ["cold", "warm"]
+
+
+def load_gas_log(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_gas(baseline, new, absThreshold, relThreshold):
+    rows = []
+    for key in sorted(set(baseline.keys()) | set(new.keys())):
+        for case in CASES:
+            base = baseline[key][case] if baseline.get(key) is not None else None
+            current = new[key][case] if new.get(key) is not None else None
+
+            if base is None and current is None:
+                continue
+            elif base is None:
+                status = "new"
+                delta = None
+                relDelta = None
+            elif current is None:
+                status = "missing"
+                delta = None
+                relDelta = None
+            else:
+                delta = current - base
+                if base != 0:
+                    relDelta = delta / base
+                else:
+                    # Any increase over a zero baseline is an infinite relative change, so only
+                    # the absolute budget applies
+                    relDelta = float("inf") if delta > 0 else 0
+                # A key only counts as a regression when it exceeds both budgets, this filters out
+                # small absolute changes on cheap calls and small relative changes on expensive ones
+                if delta > absThreshold and relDelta > relThreshold:
+                    status = "regression"
+                elif delta < -absThreshold and relDelta < -relThreshold:
+                    status = "improvement"
+                else:
+                    status = "ok"
+
+            rows.append(
+                {
+                    "key": key,
+                    "case": case,
+                    "baseline": base,
+                    "new": current,
+                    "delta": delta,
+                    "relDelta": relDelta,
+                    "status": status,
+                }
+            )
+
+    return rows
+
+
+def _format_cell(value, fmt):
+    return "-" if value is None else fmt.format(value)
+
+
+def format_markdown(rows, showAll=False):
+    header = ["Key", "Case", "Baseline", "New", "Delta", "Delta %", "Status"]
+    alignments = [":---", ":---", "---:", "---:", "---:", "---:", ":---"]
+    lines = [
+        "| {} |".format(" | ".join(header)),
+        "| {} |".format(" | ".join(alignments)),
+    ]
+    for r in rows:
+        if not showAll and r["status"] == "ok":
+            continue
+
+        lines.append(
+            "| {} |".format(
+                " | ".join(
+                    [
+                        r["key"],
+                        r["case"],
+                        _format_cell(r["baseline"], "{:,}"),
+                        _format_cell(r["new"], "{:,}"),
+                        _format_cell(r["delta"], "{:+,}"),
+                        _format_cell(r["relDelta"], "{:+.2%}"),
+                        r["status"],
+                    ]
+                )
+            )
+        )
+
+    return "\n".join(lines)
+
+
+def main(
+    baselinePath=DEFAULT_BASELINE,
+    newPath=DEFAULT_NEW,
+    absThreshold=DEFAULT_ABS_THRESHOLD,
+    relThreshold=DEFAULT_REL_THRESHOLD,
+    showAll=False,
+    failOnMissing=False,
+):
+    rows = compare_gas(
+        load_gas_log(baselinePath), load_gas_log(newPath), absThreshold, relThreshold
+    )
+    print(format_markdown(rows, showAll))
+
+    regressions = [r for r in rows if r["status"] == "regression"]
+    missing = [r for r in rows if r["status"] == "missing"]
+    print(
+        "\n{} regressions, {} improvements, {} new, {} missing (abs > {}, rel > {:.2%})".format(
+            len(regressions),
+            len([r for r in rows if r["status"] == "improvement"]),
+            len([r for r in rows if r["status"] == "new"]),
+            len(missing),
+            absThreshold,
+            relThreshold,
+        )
+    )
+
+    if len(regressions) > 0 or (failOnMissing and len(missing) > 0):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gas_stats.json against a baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--new", default=DEFAULT_NEW)
+    parser.add_argument("--abs-threshold", type=int, default=DEFAULT_ABS_THRESHOLD)
+    parser.add_argument("--rel-threshold", type=float, default=DEFAULT_REL_THRESHOLD)
+    parser.add_argument("--show-all", action="store_true", help="Include unchanged keys")
+    parser.add_argument("--fail-on-missing", action="store_true")
+    args = parser.parse_args()
+
+    sys.exit(
+        main(
+            args.baseline,
+            args.new,
+            args.abs_threshold,
+            args.rel_threshold,
+            args.show_all,
+            args.fail_on_missing,
+        )
+    )
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from scripts.local_node import DEFAULT_BACKEND, LocalNode, connect, restore_chain_time
+
+# Runs the gas_stats.py scenarios sharded over several local nodes. The environment is deployed
+# and set up once, its node state is saved to the environment cache (scripts/env_cache.py) and
+# every worker node starts from a copy of it.
+#   python -m scripts.gas_parallel -n 4
+# Results are merged into gas_stats.json in the same format as scripts/gas_stats.py.
+
+BASE_PORT = 8700
+OUTPUT_FILE = "gas_stats.json"
+# Relative run time of each scenario, used to balance the shards
+SCENARIO_WEIGHTS = {
+    "deposits": 2,
+    "withdraws": 1,
+    "ntoken.0": 1,
+    "lend": 3,
+    "liquidity": 3,
+    "borrow": 5,
+}
+DEFAULT_WEIGHT = 2
+
+
+def shard_scenarios(scenarios, numShards):
+    # Longest processing time first, ties are broken by name so the assignment is deterministic
+    shards = [[] for _ in range(numShards)]
+    loads = [0] * numShards
+    ordered = sorted(scenarios, key=lambda s: (-SCENARIO_WEIGHTS.get(s, DEFAULT_WEIGHT), s))
+    for name in ordered:
+        i = loads.index(min(loads))
+        shards[i].append(name)
+        loads[i] += SCENARIO_WEIGHTS.get(name, DEFAULT_WEIGHT)
+
+    return [s for s in shards if len(s) > 0]
+
+
+def _load_project():
+    from brownie import project
+
+    if len(project.get_loaded_projects()) == 0:
+        project.load(".")
+
+
+def get_environment(manifest):
+    from brownie import accounts
+    from scripts.deployment import TestEnvironment
+
+    return TestEnvironment.fromManifest(manifest, accounts[0])
+
+
+def build_state(backend, port, cachePath):
+    _load_project()
+    from brownie import accounts, network
+    from scripts import env_cache, gas_stats
+
+    # Ganache writes its database into the cache as it runs, anvil state is dumped over RPC at
+    # the end. Leftovers from a failed build do not have a manifest and are discarded.
+    statePath = os.path.join(cachePath, env_cache.STATE_FILE)
+    shutil.rmtree(cachePath, ignore_errors=True)
+    os.makedirs(cachePath)
+    node = LocalNode(port, backend, state=statePath if backend == "ganache" else None)
+    node.start()
+    try:
+        connect(port)
+        env = gas_stats.environment(accounts)
+        gas_stats.setup(env)
+        manifest = env_cache.get_manifest(env)
+        network.disconnect(kill_rpc=False)
+        node.dump_state(statePath)
+    finally:
+        node.stop()
+
+    env_cache.write_manifest(manifest, cachePath)
+
+
+def run_worker(backend, port, statePath, manifest, scenarios, outputPath):
+    _load_project()
+    from brownie import network
+    from scripts import gas_stats
+
+    workerState = statePath
+    if backend == "ganache":
+        # Every ganache node needs its own copy of the database directory
+        workerState = os.path.join(os.path.dirname(outputPath), "state.{}".format(port))
+        shutil.rmtree(workerState, ignore_errors=True)
+        shutil.copytree(statePath, workerState)
+
+    with LocalNode(port, backend, state=workerState):
+        connect(port)
+        restore_chain_time(manifest["timestamp"])
+        gas_stats.run_scenarios(get_environment(manifest), scenarios)
+        network.disconnect(kill_rpc=False)
+
+    if backend == "ganache":
+        shutil.rmtree(workerState, ignore_errors=True)
+
+    with open(outputPath, "w") as f:
+        json.dump({k: v for (k, v) in gas_stats.gasLog.items() if v is not None}, f)
+
+
+def main(numWorkers, backend=DEFAULT_BACKEND, basePort=BASE_PORT, outputFile=OUTPUT_FILE):
+    _load_project()
+    from scripts import env_cache, gas_stats
+
+    # The deployed state is kept in the environment cache and reused until the build artifacts
+    # or the gas_stats.py setup change
+    cachePath = env_cache.get_cache_path("gas_stats_{}".format(backend), ["scripts/gas_stats.py"])
+    statePath = os.path.join(cachePath, env_cache.STATE_FILE)
+    manifestPath = os.path.join(cachePath, env_cache.MANIFEST_FILE)
+    if env_cache.has_entry(cachePath):
+        print("Using cached environment {}".format(cachePath))
+    else:
+        print("Deploying environment on port {}".format(basePort))
+        build_state(backend, basePort, cachePath)
+
+    workDir = tempfile.mkdtemp(prefix="gas-stats-")
+    try:
+
+        processes = []
+        for (i, shard) in enumerate(shard_scenarios(gas_stats.SCENARIOS, numWorkers)):
+            port = basePort + i + 1
+            outputPath = os.path.join(workDir, "worker-{}.json".format(i))
+            print("Worker {} on port {}: {}".format(i, port, ", ".join(shard)))
+            args = [
+                sys.executable,
+                "-m",
+                "scripts.gas_parallel",
+                "--worker",
+                "--backend",
+                backend,
+                "--port",
+                str(port),
+                "--state",
+                statePath,
+                "--manifest",
+                manifestPath,
+                "--scenarios",
+                ",".join(shard),
+                "--output",
+                outputPath,
+            ]
+            processes.append((i, outputPath, subprocess.Popen(args)))
+
+        failed = [i for (i, _, p) in processes if p.wait() != 0]
+        if len(failed) > 0:
+            raise Exception("Gas workers {} failed".format(failed))
+
+        gasLog = dict(gas_stats.gasLog)
+        for (_, outputPath, _) in processes:
+            with open(outputPath, "r") as f:
+                gasLog.update(json.load(f))
+
+        with open(outputFile, "w") as f:
+            json.dump(gasLog, f, sort_keys=True, indent=4)
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run gas_stats.py scenarios in parallel")
+    parser.add_argument("-n", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backend", choices=["ganache", "anvil"], default=DEFAULT_BACKEND)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--state", help=argparse.SUPPRESS)
+    parser.add_argument("--manifest", help=argparse.SUPPRESS)
+    parser.add_argument("--scenarios", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.manifest, "r") as f:
+            manifest = json.load(f)
+        run_worker(
+            args.backend,
+            args.port,
+            args.state,
+            manifest,
+            args.scenarios.split(","),
+            args.output,
+        )
+    else:
+        main(args.workers, args.backend, args.base_port, args.output)
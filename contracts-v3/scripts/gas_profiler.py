@@ -0,0 +1,287 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+from brownie.network import web3
+from brownie.network.state import _find_contract
+from brownie.project import ContractsV3Project
+
+# Attributes the gas of a transaction to the Solidity functions that spent it. Uses
+# debug_traceTransaction on the local node and maps each program counter back to a function
+# via the build artifacts. Profiling the gas_stats.py scenarios:
+#   brownie run scripts/gas_profiler.py
+# writes gas_profile.json (inclusive / exclusive gas per function) and one collapsed stack
+# file per transaction into gas_profile/, which can be rendered with flamegraph.pl.
+
+CALL_OPS = {"CALL", "CALLCODE", "DELEGATECALL", "STATICCALL"}
+CREATE_OPS = {"CREATE", "CREATE2"}
+TRACE_OPTIONS = {"disableStorage": True, "disableMemory": True}
+OUTPUT_FILE = "gas_profile.json"
+OUTPUT_DIR = "gas_profile"
+
+_pcMaps = {}
+_functionRanges = None
+
+
+def get_trace(txid, options=TRACE_OPTIONS):
+    response = web3.provider.make_request("debug_traceTransaction", [txid, options])
+    if "error" in response:
+        raise Exception("debug_traceTransaction failed: {}".format(response["error"]))
+
+    return response["result"]["structLogs"]
+
+
+def stack_value(step, position):
+    # Ganache returns unprefixed 32 byte words, geth and anvil return 0x prefixed values
+    return int(step["stack"][-position], 16)
+
+
+def call_target(step):
+    return web3.toChecksumAddress("0x{:040x}".format(stack_value(step, 2) % 2 ** 160))
+
+
+def _get_function_ranges():
+    # Maps each source path to the (start, end, name) of every function and modifier defined
+    # in it. Internal library functions are inlined into the calling contract, so these have
+    # to be collected across every artifact rather than from the contract's own AST.
+    global _functionRanges
+    if _functionRanges is not None:
+        return _functionRanges
+
+    _functionRanges = defaultdict(set)
+
+    def walk(node, contractName, path):
+        if not isinstance(node, dict):
+            return
+        nodeType = node.get("nodeType")
+        if nodeType == "ContractDefinition":
+            contractName = node["name"]
+        elif nodeType in ("FunctionDefinition", "ModifierDefinition"):
+            (start, length, _) = [int(x) for x in node["src"].split(":")]
+            name = node.get("name") or node.get("kind", "")
+            _functionRanges[path].add((start, start + length, "{}.{}".format(contractName, name)))
+
+        for child in node.values():
+            if isinstance(child, list):
+                for c in child:
+                    walk(c, contractName, path)
+            elif isinstance(child, dict):
+                walk(child, contractName, path)
+
+    for (_, build) in ContractsV3Project._build.items():
+        if "ast" in build and "sourcePath" in build:
+            walk(build["ast"], None, build["sourcePath"])
+
+    _functionRanges = {
+        path: sorted(ranges, key=lambda r: r[1] - r[0])
+        for (path, ranges) in _functionRanges.items()
+    }
+    return _functionRanges
+
+
+def _instruction_offsets(bytecode):
+    # Returns the program counter of each instruction, skipping over push data. Unlinked
+    # library placeholders are not valid hex so they are zeroed out first.
+    hexCode = bytecode[2:] if bytecode.startswith("0x") else bytecode
+    code = bytes.fromhex(re.sub("[^0-9a-fA-F]", "0", hexCode))
+    offsets = []
+    pc = 0
+    while pc < len(code):
+        offsets.append(pc)
+        op = code[pc]
+        pc += 1 + (op - 0x5F if 0x60 <= op <= 0x7F else 0)
+
+    return offsets
+
+
+def decode_source_map(build):
+    # Builds a brownie style pcMap from a solc compressed source map for artifacts that do not
+    # already include one
+    sourcePaths = build.get("allSourcePaths", {})
+    ranges = _get_function_ranges()
+    offsets = _instruction_offsets(build["deployedBytecode"])
+
+    pcMap = {}
+    last = ["0", "0", "-1", "-"]
+    for (index, item) in enumerate(build["deployedSourceMap"].split(";")):
+        if index >= len(offsets):
+            break
+        for (i, value) in enumerate(item.split(":")[:4]):
+            if value != "":
+                last[i] = value
+
+        (start, length, fileIndex, jump) = (int(last[0]), int(last[1]), last[2], last[3])
+        fn = None
+        path = sourcePaths.get(fileIndex)
+        if path is not None:
+            for (rangeStart, rangeEnd, name) in ranges.get(path, []):
+                if rangeStart <= start and start + length <= rangeEnd:
+                    fn = name
+                    break
+
+        pcMap[offsets[index]] = {"fn": fn, "jump": jump}
+
+    return pcMap
+
+
+def get_pc_map(address):
+    if address in _pcMaps:
+        return _pcMaps[address]
+
+    contract = _find_contract(address)
+    (name, pcMap) = ("<{}>".format(address), None)
+    if contract is not None:
+        build = contract._build
+        name = build.get("contractName", contract._name)
+        if build.get("pcMap"):
+            pcMap = {int(pc): v for (pc, v) in build["pcMap"].items()}
+        elif build.get("deployedSourceMap"):
+            pcMap = decode_source_map(build)
+
+    _pcMaps[address] = (name, pcMap)
+    return _pcMaps[address]
+
+
+class _Frame:
+    def __init__(self, address, callIndex=None):
+        self.address = address
+        self.callIndex = callIndex
+        (self.name, self.pcMap) = get_pc_map(address) if address else ("<create>", None)
+        self.functions = []
+        self.enterNext = False
+        self.totalGas = 0
+
+
+class GasProfile:
+    def __init__(self):
+        self.inclusive = defaultdict(int)
+        self.exclusive = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.stacks = defaultdict(int)
+        self.totalGas = 0
+
+    def add(self, other):
+        for attr in ("inclusive", "exclusive", "calls", "stacks"):
+            for (k, v) in getattr(other, attr).items():
+                getattr(self, attr)[k] += v
+        self.totalGas += other.totalGas
+
+    def _attribute(self, frames, cost):
+        stack = []
+        for f in frames:
+            stack.extend(f.functions if len(f.functions) > 0 else [f.name])
+
+        self.exclusive[stack[-1]] += cost
+        for fn in set(stack):
+            self.inclusive[fn] += cost
+        self.stacks[";".join(stack)] += cost
+        self.totalGas += cost
+        frames[-1].totalGas += cost
+
+    def _push(self, frame, fn):
+        frame.functions.append(fn)
+        self.calls[fn] += 1
+
+    def process(self, structLogs, rootAddress):
+        frames = [_Frame(rootAddress)]
+        for (i, step) in enumerate(structLogs):
+            frame = frames[-1]
+            nextStep = structLogs[i + 1] if i + 1 < len(structLogs) else None
+            info = frame.pcMap.get(step["pc"], {}) if frame.pcMap else {}
+            fn = info.get("fn")
+
+            if fn is not None and (len(frame.functions) == 0 or frame.enterNext):
+                self._push(frame, fn)
+            frame.enterNext = False
+
+            entersFrame = nextStep is not None and nextStep["depth"] > step["depth"]
+            if entersFrame and step["op"] in CALL_OPS:
+                frames.append(_Frame(call_target(step), i))
+                continue
+            elif entersFrame and step["op"] in CREATE_OPS:
+                frames.append(_Frame(None, i))
+                continue
+            elif step["op"] in CALL_OPS and nextStep is not None:
+                # Calls to precompiles or accounts without code do not open a new frame
+                self._attribute(frames, step["gas"] - nextStep["gas"])
+            else:
+                self._attribute(frames, step["gasCost"])
+
+            if info.get("jump") == "i":
+                frame.enterNext = True
+            elif info.get("jump") == "o" and len(frame.functions) > 1:
+                frame.functions.pop()
+
+            if nextStep is not None and nextStep["depth"] < step["depth"] and len(frames) > 1:
+                # Returning from a call, the call opcode is charged whatever the caller spent
+                # that was not consumed inside the callee
+                child = frames.pop()
+                callStep = structLogs[child.callIndex]
+                self._attribute(frames, callStep["gas"] - nextStep["gas"] - child.totalGas)
+                frames[-1].totalGas += child.totalGas
+
+        return self
+
+    def to_dict(self):
+        return {
+            "totalGas": self.totalGas,
+            "functions": {
+                fn: {
+                    "inclusive": self.inclusive[fn],
+                    "exclusive": self.exclusive.get(fn, 0),
+                    "calls": self.calls.get(fn, 0),
+                }
+                for fn in sorted(self.inclusive.keys())
+            },
+        }
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for (stack, gas) in sorted(self.stacks.items()):
+                if gas > 0:
+                    f.write("{} {}\n".format(stack, gas))
+
+    def print_summary(self, limit=25):
+        print("| Function | Inclusive | Exclusive | Calls |")
+        print("| :--- | ---: | ---: | ---: |")
+        for (fn, gas) in sorted(self.exclusive.items(), key=lambda x: -x[1])[:limit]:
+            print("| {} | {:,} | {:,} | {} |".format(fn, self.inclusive[fn], gas, self.calls[fn]))
+
+
+def profile_transaction(txn):
+    rootAddress = txn.receiver if txn.receiver is not None else txn.contract_address
+    return GasProfile().process(get_trace(txn.txid), rootAddress)
+
+
+def main():
+    from scripts import gas_stats
+
+    profiles = {}
+    total = GasProfile()
+
+    def profile_hook(key, txnCold, txnWarm):
+        cases = (
+            [("cold", txnCold)]
+            if txnCold == txnWarm
+            else [("cold", txnCold), ("warm", txnWarm)]
+        )
+        for (case, txn) in cases:
+            profile = profile_transaction(txn)
+            profiles["{}.{}".format(key, case)] = profile
+            total.add(profile)
+
+    gas_stats.GAS_LOG_HOOKS.append(profile_hook)
+    gas_stats.main()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for (name, profile) in profiles.items():
+        profile.write_collapsed(os.path.join(OUTPUT_DIR, "{}.folded".format(name)))
+    total.write_collapsed(os.path.join(OUTPUT_DIR, "all.folded"))
+
+    with open(OUTPUT_FILE, "w") as f:
+        output = {name: p.to_dict() for (name, p) in profiles.items()}
+        output["all"] = total.to_dict()
+        json.dump(output, f, sort_keys=True, indent=4)
+
+    total.print_summary()
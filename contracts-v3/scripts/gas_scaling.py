@@ -0,0 +1,214 @@
+import json
+
+from brownie import (
+    MockFreeCollateral,
+    MockSettingsLib,
+    MockSettleAssets,
+    SettleAssetsExternal,
+    accounts,
+)
+from brownie.convert.datatypes import HexString
+from brownie.network.contract import Contract
+from brownie.network.state import Chain
+from scripts.models.date_time import get_maturity_from_bit_num
+from tests.constants import SETTLEMENT_DATE, START_TIME_TREF
+from tests.helpers import get_fcash_token, setup_internal_mock
+
+# Measures how free collateral and settlement gas scale with the size of an account. Each
+# curve holds the number of active currencies fixed and sweeps the number of assets, the
+# results and a linear fit for each curve are written to gas_scaling.json. Run with:
+#   brownie run scripts/gas_scaling.py
+
+chain = Chain()
+
+# setup_internal_mock only lists four currencies, so this bounds the active currency sweep
+MAX_CURRENCIES = 4
+ASSET_ARRAY_LENGTH = range(1, 8)
+ASSETS_BITMAP_SIZE = range(1, 21)
+ACTIVE_CURRENCIES = range(1, MAX_CURRENCIES + 1)
+BLOCK_GAS_LIMIT = 30_000_000
+OUTPUT_FILE = "gas_scaling.json"
+
+
+def deploy_mock(MockContract):
+    settings = MockSettingsLib.deploy({"from": accounts[0]})
+    mock = MockContract.deploy(settings, {"from": accounts[0]})
+    mock = Contract.from_abi(
+        "mock", mock.address, MockSettingsLib.abi + mock.abi, owner=accounts[0]
+    )
+    setup_internal_mock(mock)
+
+    return mock
+
+
+def get_notional(i):
+    # Alternate signs so that both the haircut and buffer paths are exercised
+    return 100e8 if i % 2 == 0 else -50e8
+
+
+def set_balances(mock, account, activeCurrencies):
+    for currencyId in range(1, activeCurrencies + 1):
+        mock.setBalance(account, currencyId, 1_000e8, 0)
+
+
+def setup_portfolio_account(mock, account, numAssets, activeCurrencies):
+    set_balances(mock, account, activeCurrencies)
+
+    state = mock.buildPortfolioState(account)
+    for i in range(numAssets):
+        # Spread assets over the active currencies, maturities are daily bits which all
+        # mature before the first quarterly settlement date
+        currencyId = (i % activeCurrencies) + 1
+        maturity = get_maturity_from_bit_num(START_TIME_TREF, (i // activeCurrencies) + 1)
+        state = mock.addAsset(state, currencyId, maturity, 1, get_notional(i))
+    mock.setPortfolio(account, state)
+
+
+def setup_bitmap_account(mock, account, numAssets, activeCurrencies):
+    bitmapCurrency = 1
+    mock.setAccountContext(
+        account, (START_TIME_TREF, "0x00", 0, bitmapCurrency, HexString(0, "bytes18"), False)
+    )
+    set_balances(mock, account, activeCurrencies)
+
+    assets = [
+        get_fcash_token(
+            0,
+            currencyId=bitmapCurrency,
+            maturity=get_maturity_from_bit_num(START_TIME_TREF, i + 1),
+            notional=get_notional(i),
+        )
+        for i in range(numAssets)
+    ]
+    mock.setBitmapAssets(account, assets)
+
+
+def sweep(mock, sizes, setupAccount, measure):
+    curves = {}
+    chain.snapshot()
+    for activeCurrencies in ACTIVE_CURRENCIES:
+        points = []
+        for numAssets in sizes:
+            chain.revert()
+            setupAccount(mock, accounts[1], numAssets, activeCurrencies)
+            points.append([numAssets, measure(mock, accounts[1])])
+            print(
+                "{} assets, {} currencies: {} gas".format(
+                    numAssets, activeCurrencies, points[-1][1]
+                )
+            )
+        curves[str(activeCurrencies)] = points
+    chain.revert()
+
+    return curves
+
+
+def measure_free_collateral(mock, account):
+    chain.mine(1, timedelta=10)
+    txn = mock.getFreeCollateralStateful(account, chain.time() + 1)
+    return txn.gas_used
+
+
+def measure_settlement(mock, account):
+    chain.mine(1, timestamp=SETTLEMENT_DATE + 1)
+    txn = mock.settleAccount(account)
+    return txn.gas_used
+
+
+def linear_fit(points):
+    # Ordinary least squares fit of gas = intercept + slope * size
+    n = len(points)
+    if n < 2:
+        return None
+
+    meanX = sum(p[0] for p in points) / n
+    meanY = sum(p[1] for p in points) / n
+    covariance = sum((p[0] - meanX) * (p[1] - meanY) for p in points)
+    variance = sum((p[0] - meanX) ** 2 for p in points)
+    slope = covariance / variance
+    intercept = meanY - slope * meanX
+
+    totalSquares = sum((p[1] - meanY) ** 2 for p in points)
+    residualSquares = sum((p[1] - (intercept + slope * p[0])) ** 2 for p in points)
+    rSquared = 1 - residualSquares / totalSquares if totalSquares > 0 else 1
+
+    return {
+        "intercept": intercept,
+        "slope": slope,
+        "rSquared": rSquared,
+        # Extrapolated number of assets at which a single call would exhaust a block
+        "sizeAtBlockGasLimit": (BLOCK_GAS_LIMIT - intercept) / slope if slope > 0 else None,
+    }
+
+
+def fit_curves(results):
+    return {
+        measurement: {
+            portfolioType: {
+                activeCurrencies: linear_fit(points)
+                for (activeCurrencies, points) in curves.items()
+            }
+            for (portfolioType, curves) in byType.items()
+        }
+        for (measurement, byType) in results.items()
+    }
+
+
+def plot_curves(results, fits, path="gas_scaling.png"):
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, skipping plot")
+        return
+
+    panels = [(m, t) for m in results.keys() for t in results[m].keys()]
+    (fig, axes) = plt.subplots(1, len(panels), figsize=(6 * len(panels), 5))
+    for (ax, (measurement, portfolioType)) in zip(axes, panels):
+        for (activeCurrencies, points) in results[measurement][portfolioType].items():
+            xs = [p[0] for p in points]
+            line = ax.plot(xs, [p[1] for p in points], "o", label="{} ccy".format(activeCurrencies))
+            fit = fits[measurement][portfolioType][activeCurrencies]
+            if fit is not None:
+                ax.plot(
+                    xs,
+                    [fit["intercept"] + fit["slope"] * x for x in xs],
+                    "-",
+                    color=line[0].get_color(),
+                )
+        ax.set_title("{} ({})".format(measurement, portfolioType))
+        ax.set_xlabel("assets")
+        ax.set_ylabel("gas")
+        ax.legend()
+
+    fig.tight_layout()
+    fig.savefig(path)
+    print("Saved plot to {}".format(path))
+
+
+def main():
+    fcMock = deploy_mock(MockFreeCollateral)
+    results = {"freeCollateral": {}, "settleAssets": {}}
+    results["freeCollateral"]["portfolio"] = sweep(
+        fcMock, ASSET_ARRAY_LENGTH, setup_portfolio_account, measure_free_collateral
+    )
+    results["freeCollateral"]["bitmap"] = sweep(
+        fcMock, ASSETS_BITMAP_SIZE, setup_bitmap_account, measure_free_collateral
+    )
+
+    SettleAssetsExternal.deploy({"from": accounts[0]})
+    settleMock = deploy_mock(MockSettleAssets)
+    results["settleAssets"]["portfolio"] = sweep(
+        settleMock, ASSET_ARRAY_LENGTH, setup_portfolio_account, measure_settlement
+    )
+    results["settleAssets"]["bitmap"] = sweep(
+        settleMock, ASSETS_BITMAP_SIZE, setup_bitmap_account, measure_settlement
+    )
+
+    fits = fit_curves(results)
+    with open(OUTPUT_FILE, "w") as f:
+        json.dump({"results": results, "fits": fits}, f, sort_keys=True, indent=4)
+
+    plot_curves(results, fits)
@@ -108,16 +108,7 @@ gasLog = {
     # },
     # "liquidatefCashLocal": {"fCashAssets": range(1, 5),},
     # "liquidatefCashCrossCurrency": {"fCashAssets": range(1, 5)},
-    # "freeCollateral": {
-    #     "assetArrayLength": range(1, 7),
-    #     "assetsBitmapSize": range(1, 20),
-    #     "activeCurrencies": range(1, 9),
-    # },
-    # "settleAssets": {
-    #     "assetArrayLength": range(1, 7),
-    #     "assetsBitmapSize": range(1, 20),
-    #     "activeCurrencies": range(1, 9),
-    # },
+    # freeCollateral and settleAssets scaling by portfolio size is in scripts/gas_scaling.py
 }
 
 
@@ -125,8 +116,14 @@ def environment(accounts):
     return TestEnvironment(accounts[0])
 
 
+# Called with (key, txnCold, txnWarm) on every measurement, used by the trace based profilers
+GAS_LOG_HOOKS = []
+
+
 def log_gas(key, txnCold, txnWarm):
     gasLog[key] = {"cold": txnCold.gas_used, "warm": txnWarm.gas_used}
+    for hook in GAS_LOG_HOOKS:
+        hook(key, txnCold, txnWarm)
 
 
 def deposits(env):
@@ -767,9 +764,7 @@ INIT_PARAMETERS = {
 }
 
 
-def main():
-    env = environment(accounts)
-
+def setup(env):
     # Set time
     blockTime = chain.time()
     newTime = get_tref(blockTime) + SECONDS_IN_QUARTER + 1
@@ -819,19 +814,10 @@ def main():
     env.notional.updateTokenCollateralParameters(currencyId, *(nTokenDefaults["Collateral"]))
     env.notional.updateIncentiveEmissionRate(currencyId, CurrencyDefaults["incentiveEmissionRate"])
 
-    chain.snapshot()
-
-    deposits(env)
-    chain.revert()
-
-    withdraws(env)
-    chain.revert()
-
-    ntoken(env, 0)
-    currencyId = 2
-    for maxMarkets in range(2, 8):
-        chain.revert()
 
+def ntoken_markets(maxMarkets):
+    def scenario(env):
+        currencyId = 2
         cashGroup = list(env.notional.getCashGroup(currencyId))
         cashGroup[0] = maxMarkets
         env.notional.updateCashGroup(currencyId, cashGroup)
@@ -853,7 +839,10 @@ def main():
 
         ntoken(env, maxMarkets)
 
-    chain.revert()
+    return scenario
+
+
+def setup_markets(env):
     env.notional.batchBalanceAction(
         accounts[0],
         [
@@ -864,16 +853,48 @@ def main():
     )
     env.notional.initializeMarkets(2, True)
     env.notional.initializeMarkets(4, True)
+
+
+# Scenarios are grouped by the state they start from, each stage setup runs once from the state
+# left by setup() and is snapshotted. Brownie only holds a single snapshot, so stages with a setup
+# must come after the stage without one.
+STAGES = [
+    (
+        None,
+        [
+            ("deposits", deposits),
+            ("withdraws", withdraws),
+            ("ntoken.0", lambda env: ntoken(env, 0)),
+        ]
+        + [("ntoken.{}".format(m), ntoken_markets(m)) for m in range(2, 8)],
+    ),
+    (setup_markets, [("lend", lend), ("liquidity", liquidity), ("borrow", borrow)]),
+]
+SCENARIOS = [name for (_, scenarios) in STAGES for (name, _) in scenarios]
+
+
+def run_scenarios(env, names=None):
     chain.snapshot()
+    for (stageSetup, scenarios) in STAGES:
+        selected = [fn for (name, fn) in scenarios if names is None or name in names]
+        if len(selected) == 0:
+            continue
 
-    lend(env)
-    chain.revert()
+        chain.revert()
+        if stageSetup is not None:
+            stageSetup(env)
+            chain.snapshot()
 
-    liquidity(env)
+        for fn in selected:
+            chain.revert()
+            fn(env)
     chain.revert()
 
-    borrow(env)
-    chain.revert()
+
+def main():
+    env = environment(accounts)
+    setup(env)
+    run_scenarios(env)
 
     with open("gas_stats.json", "w") as f:
         json.dump(gasLog, f, sort_keys=True, indent=4)
@@ -0,0 +1,376 @@
+import json
+from collections import namedtuple
+
+from brownie import Contract, accounts, interface
+from scripts.arbitrum.arb_config import ListedTokens
+from scripts.arbitrum.arb_deploy import (
+    OWNER,
+    _deploy_chainlink_oracle,
+    _deploy_pcash_oracle,
+    _to_interest_rate_curve,
+)
+from scripts.common import TokenType
+from scripts.models.interest_rate_curve import from_curve_settings
+
+# Compiles a currency onboarding plan (listCurrency, enableCashGroup, curve, deposit, initialization
+# and collateral parameters, supply caps and liquidator trading permissions) into the smallest
+# number of Safe batches. Notional does not have a multicall, the owner Safe executes each batch
+# through MultiSendCallOnly. Usage:
+#
+#   brownie run scripts/initializers/governance_batcher.py main UNI,LINK,LDO --network arbitrum-fork
+#
+# The plan is simulated call by call from the owner on the fork, the resulting on chain config is
+# checked against ListedTokens and the batches are written to batch-<symbols>-<n>.json in the
+# Safe transaction builder format. Oracles missing from ListedTokens are deployed first.
+
+LIQUIDATOR = "0xCeF77C74C88B6deCeAF2E954038e7789A0F1bB33"
+# Deploys the oracles of new listings
+DEPLOYER = "0x8F5ea3CDe898B208280c0e93F3aDaaf1F5c35a7e"
+TRADING_MODULE = "0xBf6B9c5608D520469d8c4BD1E24F850497AF0Bb8"
+# Safe v1.3.0 MultiSendCallOnly, deployed at the same address on every chain
+MULTISEND_CALL_ONLY = "0x40A2aCCbd92BCA938b02010E17A5b8929b49130D"
+MULTISEND_SELECTOR = "0x8d80ff0a"
+# Leaves headroom for the Safe execution overhead under the block gas limit
+MAX_BATCH_GAS = 15_000_000
+# Defaults for parameters added to governance after the configs were written
+DEFAULT_MAX_PRIME_DEBT_UTILIZATION = 70
+DEFAULT_MAX_MINT_DEVIATION = 4
+
+GovernanceCall = namedtuple("GovernanceCall", ["to", "value", "data", "label"])
+
+
+def get_cash_group_settings(token):
+    return (
+        token["maxMarketIndex"],
+        token["rateOracleTimeWindow"],
+        token["maxDiscountFactor"],
+        token["reserveFeeShare"],
+        token["debtBuffer"],
+        token["fCashHaircut"],
+        token["minOracleRate"],
+        token["liquidationfCashDiscount"],
+        token["liquidationDebtBuffer"],
+        token["maxOracleRate"],
+    )
+
+
+def get_collateral_parameters(token):
+    return (
+        token["residualPurchaseIncentive"],
+        token["pvHaircutPercentage"],
+        token["residualPurchaseTimeBufferHours"],
+        token["cashWithholdingBuffer10BPS"],
+        token["liquidationHaircutPercentage"],
+        token.get("maxMintDeviationPercentage", DEFAULT_MAX_MINT_DEVIATION),
+    )
+
+
+def deploy_missing_oracles(symbol, notional, deployer):
+    # These contracts are verified automatically on Arbiscan
+    token = ListedTokens[symbol]
+    if token.get("pCashOracle", "") == "":
+        print("Deploying pCash oracle for {}".format(symbol))
+        token["pCashOracle"] = _deploy_pcash_oracle(symbol, notional, deployer).address
+    if "baseOracle" in token and token.get("ethOracle", "") == "":
+        print("Deploying ETH oracle for {}".format(symbol))
+        token["ethOracle"] = _deploy_chainlink_oracle(symbol, deployer).address
+
+
+def get_listing_calls(notional, symbol, currencyId, token=None, tradingModule=None):
+    token = ListedTokens[symbol] if token is None else token
+    missing = [o for o in ("ethOracle", "pCashOracle") if token.get(o, "") == ""]
+    if len(missing) > 0:
+        raise Exception(
+            "{} has no {}, deploy it before listing".format(symbol, " or ".join(missing))
+        )
+    calls = []
+
+    def add(fn, *args):
+        calls.append(
+            GovernanceCall(
+                notional.address, 0, fn.encode_input(*args), "{}.{}".format(symbol, fn.abi["name"])
+            )
+        )
+
+    add(
+        notional.listCurrency,
+        (
+            token["address"],
+            False,
+            TokenType["UnderlyingToken"] if symbol != "ETH" else TokenType["Ether"],
+            token["decimals"],
+            0,
+        ),
+        (
+            token["ethOracle"],
+            18,
+            False,
+            token["buffer"],
+            token["haircut"],
+            token["liquidationDiscount"],
+        ),
+        _to_interest_rate_curve(token["primeCashCurve"]),
+        token["pCashOracle"],
+        token["allowDebt"],
+        token["primeRateOracleTimeWindow5Min"],
+        token["name"],
+        symbol,
+    )
+    add(
+        notional.setMaxUnderlyingSupply,
+        currencyId,
+        token["maxUnderlyingSupply"],
+        token.get("maxPrimeDebtUtilization", DEFAULT_MAX_PRIME_DEBT_UTILIZATION),
+    )
+
+    # Inside here, we are listing fCash
+    if "maxMarketIndex" in token:
+        add(
+            notional.enableCashGroup,
+            currencyId,
+            get_cash_group_settings(token),
+            token["name"],
+            symbol,
+        )
+        add(
+            notional.updateInterestRateCurve,
+            currencyId,
+            list(range(1, token["maxMarketIndex"] + 1)),
+            [_to_interest_rate_curve(c) for c in token["fCashCurves"]],
+        )
+        add(
+            notional.updateDepositParameters,
+            currencyId,
+            token["depositShare"],
+            token["leverageThreshold"],
+        )
+        add(
+            notional.updateInitializationParameters,
+            currencyId,
+            [0] * token["maxMarketIndex"],
+            token["proportion"],
+        )
+        add(notional.updateTokenCollateralParameters, currencyId, *get_collateral_parameters(token))
+
+    if tradingModule is not None and symbol != "ETH":
+        # Allow the liquidator to sell the token, 8 is 0x, 15 is all trade types
+        fn = tradingModule.setTokenPermissions
+        calls.append(
+            GovernanceCall(
+                tradingModule.address,
+                0,
+                fn.encode_input(LIQUIDATOR, token["address"], (True, 8, 15)),
+                "{}.setTokenPermissions".format(symbol),
+            )
+        )
+
+    return calls
+
+
+def get_onboarding_plan(notional, symbols, tokens=None, tradingModule=None):
+    # Currency ids are assigned in listing order after the last listed currency
+    tokens = ListedTokens if tokens is None else tokens
+    firstId = notional.getMaxCurrencyId() + 1
+    currencyIds = {}
+    calls = []
+    for (i, symbol) in enumerate(symbols):
+        currencyIds[symbol] = firstId + i
+        calls.extend(
+            get_listing_calls(notional, symbol, firstId + i, tokens[symbol], tradingModule)
+        )
+
+    return (calls, currencyIds)
+
+
+def simulate_plan(calls, sender):
+    # The Safe calls every target directly through MultiSendCallOnly, so sending each call from
+    # the owner executes the same state changes. Returns the gas used by each call.
+    gasUsed = []
+    for call in calls:
+        txn = sender.transfer(call.to, call.value, data=call.data)
+        if txn.status != 1:
+            raise Exception("{} reverted: {}".format(call.label, txn.revert_msg))
+        gasUsed.append(txn.gas_used)
+
+    return gasUsed
+
+
+def pack_batches(calls, gasUsed, maxBatchGas=MAX_BATCH_GAS):
+    # Calls must execute in order, so filling each batch until the next call does not fit gives the
+    # minimum number of batches
+    batches = []
+    batch = []
+    batchGas = 0
+    for (call, gas) in zip(calls, gasUsed):
+        if gas > maxBatchGas:
+            raise Exception("{} uses {} gas, over the batch limit".format(call.label, gas))
+        if len(batch) > 0 and batchGas + gas > maxBatchGas:
+            batches.append(batch)
+            batch = []
+            batchGas = 0
+        batch.append(call)
+        batchGas += gas
+
+    if len(batch) > 0:
+        batches.append(batch)
+    return batches
+
+
+def encode_multisend(calls):
+    # MultiSendCallOnly.multiSend(bytes) where each call is packed as
+    # (uint8 operation, address to, uint256 value, uint256 dataLength, bytes data)
+    packed = b""
+    for call in calls:
+        data = bytes.fromhex(call.data[2:])
+        packed += (
+            (0).to_bytes(1, "big")
+            + bytes.fromhex(call.to[2:])
+            + int(call.value).to_bytes(32, "big")
+            + len(data).to_bytes(32, "big")
+            + data
+        )
+
+    padding = b"\x00" * (-len(packed) % 32)
+    encoded = (32).to_bytes(32, "big") + len(packed).to_bytes(32, "big") + packed + padding
+    return MULTISEND_SELECTOR + encoded.hex()
+
+
+def to_safe_batch(calls, chainId, name="Transactions Batch"):
+    return {
+        "version": "1.0",
+        "chainId": str(chainId),
+        "createdAt": 1692567274357,
+        "meta": {
+            "name": name,
+            "description": ", ".join(call.label for call in calls),
+            "txBuilderVersion": "1.16.1",
+        },
+        "transactions": [
+            {
+                "to": call.to,
+                "value": str(call.value),
+                "data": call.data,
+                "contractMethod": {"inputs": [], "name": "fallback", "payable": True},
+                "contractInputsValues": None,
+            }
+            for call in calls
+        ],
+    }
+
+
+def check_listing(notional, symbol, currencyId, token=None):
+    # Returns (field, expected, actual) for every on chain value that does not match the config,
+    # maxUnderlyingSupply is stored as a packed float and is not checked exactly
+    token = ListedTokens[symbol] if token is None else token
+    mismatches = []
+
+    def check(field, expected, actual):
+        if expected != actual:
+            mismatches.append((field, expected, actual))
+
+    underlying = notional.getCurrency(currencyId)[1]
+    check("address", token["address"].lower(), underlying[0].lower())
+    check("decimals", 10 ** token["decimals"], underlying[2])
+
+    ethRate = notional.getRateStorage(currencyId)[0]
+    check("ethOracle", token["ethOracle"].lower(), ethRate[0].lower())
+    check("buffer", token["buffer"], ethRate[3])
+    check("haircut", token["haircut"], ethRate[4])
+    check("liquidationDiscount", token["liquidationDiscount"], ethRate[5])
+    check(
+        "pCashOracle",
+        token["pCashOracle"].lower(),
+        notional.getPrimeCashHoldingsOracle(currencyId).lower(),
+    )
+    check(
+        "primeCashCurve",
+        tuple(from_curve_settings(_to_interest_rate_curve(token["primeCashCurve"]))),
+        tuple(notional.getPrimeInterestRateCurve(currencyId)),
+    )
+
+    if "maxMarketIndex" not in token:
+        return mismatches
+
+    check("cashGroup", get_cash_group_settings(token), tuple(notional.getCashGroup(currencyId)))
+    # Curve updates are stored as the next curve until markets are initialized
+    nextCurves = notional.getInterestRateCurve(currencyId)[0]
+    for (i, c) in enumerate(token["fCashCurves"]):
+        check(
+            "fCashCurves.{}".format(i),
+            tuple(from_curve_settings(_to_interest_rate_curve(c))),
+            tuple(nextCurves[i]),
+        )
+
+    (depositShares, leverageThresholds) = notional.getDepositParameters(currencyId)
+    check("depositShare", list(token["depositShare"]), list(depositShares))
+    check("leverageThreshold", list(token["leverageThreshold"]), list(leverageThresholds))
+    check(
+        "proportion",
+        list(token["proportion"]),
+        list(notional.getInitializationParameters(currencyId)[1]),
+    )
+
+    # nTokenParameters are packed from the liquidation haircut down to the max mint deviation
+    nTokenParameters = bytes(notional.getNTokenAccount(notional.nTokenAddress(currencyId))[4])
+    check(
+        "nTokenParameters",
+        get_collateral_parameters(token),
+        tuple(nTokenParameters[i] for i in [4, 3, 2, 1, 0, 5]),
+    )
+
+    return mismatches
+
+
+def main(symbols="UNI,LINK,LDO", chainId="42161", maxBatchGas=MAX_BATCH_GAS):
+    from scripts.initializers.list_currency import donate_initial
+    from scripts.inspect import get_addresses
+
+    symbols = [s for s in symbols.split(",") if s != ""]
+    (addresses, notional, note, router, networkName) = get_addresses()
+    owner = accounts.at(notional.owner(), force=True)
+    deployer = accounts.at(DEPLOYER, force=True)
+    fundingAccount = accounts.at("0x7d7935EDd4b6cDB5f34B0E1cCEAF85a3C4A11254", force=True)
+    tradingModule = Contract.from_abi("trading", TRADING_MODULE, interface.ITradingModule.abi)
+    if owner.address != OWNER:
+        print("Notional owner is {}, not {}".format(owner.address, OWNER))
+
+    # Listing requires an initial balance of the token on Notional
+    for symbol in symbols:
+        donate_initial(symbol, notional, fundingAccount)
+        deploy_missing_oracles(symbol, notional, deployer)
+
+    (calls, currencyIds) = get_onboarding_plan(notional, symbols, tradingModule=tradingModule)
+    gasUsed = simulate_plan(calls, owner)
+
+    failed = False
+    for symbol in symbols:
+        for (field, expected, actual) in check_listing(notional, symbol, currencyIds[symbol]):
+            print("{} {} mismatch: expected {} got {}".format(symbol, field, expected, actual))
+            failed = True
+    if failed:
+        raise Exception("On chain config does not match ListedTokens")
+
+    batches = pack_batches(calls, gasUsed, int(maxBatchGas))
+    start = 0
+    for (i, batch) in enumerate(batches):
+        fileName = "batch-{}-{}.json".format("-".join(symbols), i)
+        with open(fileName, "w") as f:
+            json.dump(to_safe_batch(batch, chainId), f, indent=4)
+        print(
+            "{}: {} calls, {} gas, {} bytes of multiSend calldata to {}".format(
+                fileName,
+                len(batch),
+                sum(gasUsed[start : start + len(batch)]),
+                (len(encode_multisend(batch)) - 2) // 2,
+                MULTISEND_CALL_ONLY,
+            )
+        )
+        start += len(batch)
+
+    print(
+        "Listed {} with {} owner transactions instead of {}".format(
+            ", ".join("{} ({})".format(s, currencyIds[s]) for s in symbols),
+            len(batches),
+            len(calls),
+        )
+    )
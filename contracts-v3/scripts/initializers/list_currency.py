@@ -1,7 +1,13 @@
 from brownie import Contract, accounts, interface
 from scripts.arbitrum.arb_config import ListedTokens, ListedOrder
-from scripts.arbitrum.arb_deploy import _deploy_chainlink_oracle, _deploy_pcash_oracle, _to_interest_rate_curve
-from scripts.common import TokenType
+from scripts.initializers.governance_batcher import (
+    DEPLOYER,
+    TRADING_MODULE,
+    deploy_missing_oracles,
+    get_listing_calls,
+    simulate_plan,
+    to_safe_batch,
+)
 from scripts.inspect import get_addresses
 import json
 from tests.helpers import get_balance_action
@@ -13,9 +19,6 @@ WHALES = {
     'RDNT': "0x9d9e4A95765154A575555039E9E2a321256B5704"
 }
 
-LIQUIDATOR = '0xCeF77C74C88B6deCeAF2E954038e7789A0F1bB33'
-TRADING_MODULE = '0xBf6B9c5608D520469d8c4BD1E24F850497AF0Bb8'
-
 def donate_initial(symbol, notional, fundingAccount):
     token = ListedTokens[symbol]
     if symbol == 'ETH':
@@ -28,152 +31,29 @@ def donate_initial(symbol, notional, fundingAccount):
         erc20.transfer(notional, 0.05 * 10 ** erc20.decimals(), {"from": fundingAccount})
 
 def list_currency(notional, symbol):
-    token = ListedTokens[symbol]
-    callData = []
-
-    txn = notional.listCurrency(
-        (
-            token['address'],
-            False,
-            TokenType["UnderlyingToken"] if symbol != "ETH" else TokenType["Ether"],
-            token['decimals'],
-            0,
-        ),
-        (
-            token['ethOracle'],
-            18,
-            False,
-            token["buffer"],
-            token["haircut"],
-            token["liquidationDiscount"],
-        ),
-        _to_interest_rate_curve(token['primeCashCurve']),
-        token['pCashOracle'],
-        token["allowDebt"],
-        token['primeRateOracleTimeWindow5Min'],
-        token['name'],
-        symbol,
-        {"from": notional.owner()}
-    )
-    currencyId = ListedOrder.index(symbol) + 1
-    callData.append(txn.input)
-
-    txn = notional.setMaxUnderlyingSupply(currencyId, token['maxUnderlyingSupply'], {"from": notional.owner()})
-    callData.append(txn.input)
-
-    # Inside here, we are listing fCash
-    if "maxMarketIndex" in token:
-        txn = notional.enableCashGroup(
-            currencyId,
-            (
-                token["maxMarketIndex"],
-                token["rateOracleTimeWindow"],
-                token["maxDiscountFactor"],
-                token["reserveFeeShare"],
-                token["debtBuffer"],
-                token["fCashHaircut"],
-                token["minOracleRate"],
-                token["liquidationfCashDiscount"],
-                token["liquidationDebtBuffer"],
-                token["maxOracleRate"]
-            ),
-            token['name'],
-            symbol,
-            {"from": notional.owner()}
-        )
-        callData.append(txn.input)
-
-        txn = notional.updateInterestRateCurve(
-            currencyId,
-            [1, 2],
-            [_to_interest_rate_curve(c) for c in token['fCashCurves']],
-            {"from": notional.owner()}
-        )
-        callData.append(txn.input)
-
-        txn = notional.updateDepositParameters(currencyId, token['depositShare'], token['leverageThreshold'], {"from": notional.owner()})
-        callData.append(txn.input)
-
-        txn = notional.updateInitializationParameters(currencyId, [0, 0], token['proportion'], {"from": notional.owner()})
-        callData.append(txn.input)
-
-        txn = notional.updateTokenCollateralParameters(
-            currencyId,
-            token["residualPurchaseIncentive"],
-            token["pvHaircutPercentage"],
-            token["residualPurchaseTimeBufferHours"],
-            token["cashWithholdingBuffer10BPS"],
-            token["liquidationHaircutPercentage"],
-            {"from": notional.owner()}
-        )
-        callData.append(txn.input)
-    
-    # Set trading module approvals for the liquidator
+    # Sends the listing calls from the owner on the fork, returns them for the Safe batch
     tradingModule = Contract.from_abi("trading", TRADING_MODULE, interface.ITradingModule.abi)
-    
-    txn = tradingModule.setTokenPermissions(
-        LIQUIDATOR,
-        token['address'],
-        (True, 8, 15), # allow sell, 8 is 0x, 15 is all trade types
-        {"from": notional.owner()}
-    )
+    currencyId = ListedOrder.index(symbol) + 1
+    calls = get_listing_calls(notional, symbol, currencyId, tradingModule=tradingModule)
+    simulate_plan(calls, accounts.at(notional.owner(), force=True))
 
-    return {'notional': callData, 'tradingModule': txn.input}
+    return calls
 
 def main():
     listTokens = ['UNI', 'LINK', 'LDO']
     fundingAccount = accounts.at("0x7d7935EDd4b6cDB5f34B0E1cCEAF85a3C4A11254", force=True)
     (addresses, notional, note, router, networkName) = get_addresses()
-    deployer = accounts.at("0x8F5ea3CDe898B208280c0e93F3aDaaf1F5c35a7e", force=True)
+    deployer = accounts.at(DEPLOYER, force=True)
     # deployer = accounts.load(networkName.upper() + "_DEPLOYER")
     print("DEPLOYER ADDRESS", deployer.address)
 
     for t in listTokens:
         donate_initial(t, notional, fundingAccount)
-        if ListedTokens[t]["pCashOracle"] == "":
-            # These contracts are verified automatically on Arbiscan
-            print("DEPLOYING PCASH ORACLE FOR: ", t)
-            pCash = _deploy_pcash_oracle(t, notional, deployer)
-            ListedTokens[t]["pCashOracle"] = pCash.address
-        if "baseOracle" in ListedTokens[t] and ListedTokens[t]["ethOracle"] == "":
-            # These contracts are verified automatically on Arbiscan
-            print("DEPLOYING ETH ORACLE FOR: ", t)
-            ethOracle = _deploy_chainlink_oracle(t, deployer)
-            ListedTokens[t]["ethOracle"] = ethOracle.address
-
-    batchBase = {
-        "version": "1.0",
-        "chainId": "42161",
-        "createdAt": 1692567274357,
-        "meta": {
-            "name": "Transactions Batch",
-            "description": "",
-            "txBuilderVersion": "1.16.1"
-        },
-        "transactions": []
-    }
+        deploy_missing_oracles(t, notional, deployer)
 
     for t in listTokens:
-        batchBase['transactions'] = []
-        transactions = list_currency(notional, t)
-        for data in transactions['notional']:
-            batchBase['transactions'].append({
-                "to": notional.address,
-                "value": "0",
-                "data": data,
-                "contractMethod": { "inputs": [], "name": "fallback", "payable": True },
-                "contractInputsValues": None
-            })
-
-        batchBase['transactions'].append({
-            "to": TRADING_MODULE,
-            "value": "0",
-            "data": transactions['tradingModule'],
-            "contractMethod": { "inputs": [], "name": "fallback", "payable": True },
-            "contractInputsValues": None
-        })
-        
-        json.dump(batchBase, open("batch-{}.json".format(t), 'w'))
+        calls = list_currency(notional, t)
+        json.dump(to_safe_batch(calls, "42161"), open("batch-{}.json".format(t), 'w'))
 
         token = ListedTokens[t]
         if "maxMarketIndex" in token:
@@ -1,7 +1,7 @@
 # flake8: noqa
 import json
 from brownie import NoteERC20, Router, network, interface
-from brownie.network.contract import Contract
+from scripts.abi_cache import get_contract
 from tests.helpers import get_balance_action, get_balance_trade_action
 
 def get_router_args(router):
@@ -36,9 +36,9 @@ def get_addresses():
     with open(output_file, "r") as f:
         addresses = json.load(f)
 
-    notional = Contract.from_abi("Notional", addresses["notional"], abi=interface.NotionalProxy.abi)
+    notional = get_contract("Notional", addresses["notional"], interface.NotionalProxy.abi)
     note = NoteERC20.at(addresses["note"])
-    router = Contract.from_abi("Router", addresses["notional"], abi=Router.abi)
+    router = get_contract("Router", addresses["notional"], Router.abi)
 
     return (addresses, notional, note, router, networkName)
 
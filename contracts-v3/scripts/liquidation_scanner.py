@@ -0,0 +1,322 @@
+from collections import namedtuple
+
+import eth_abi
+from brownie import ZERO_ADDRESS
+from brownie.network.state import Chain
+from scripts.models.free_collateral import load_snapshot
+from scripts.models.liquidation import (
+    calculate_collateral_currency_liquidation,
+    calculate_local_currency_liquidation,
+)
+from scripts.models.prime_rate import convert_to_underlying
+from scripts.models.solidity import Revert, div, mul, sub
+
+# Scans a set of accounts for liquidations using the python free collateral model. All accounts
+# are valued against a single snapshot of currency state so a full book scan only costs one
+# getAccount call per account. Candidates are ranked by the expected profit of the liquidation
+# in ETH (8 decimals), before flash loan fees and DEX slippage. Usage:
+#
+#   accounts = get_accounts_with_debt(notional)
+#   snapshot = load_snapshot(notional, accounts)
+#   candidates = scan_liquidations(snapshot)
+#   args = get_flash_liquidation_args(candidates[0], load_tokens(notional), weth, tradeData)
+#   flashLiquidator.flashLoan(*args, {"from": owner})
+#
+# Accounts that require settlement are valued as is, the liquidation itself will settle them.
+
+chain = Chain()
+
+INTERNAL_TOKEN_PRECISION = 10 ** 8
+DEFAULT_BUFFER_BPS = 100
+
+LOCAL_CURRENCY = 0
+COLLATERAL_CURRENCY = 1
+
+EXACT_IN_SINGLE = 0
+DEX_UNISWAP_V3 = 2
+
+TRADE_DATA_TYPE = "((uint8,address,address,uint256,uint256,uint256,bytes),uint16,bool,uint32)"
+LIQUIDATION_ACTION_TYPE = "(uint8,bool,bool,bool,bytes,bytes)"
+LOCAL_CURRENCY_LIQUIDATION_TYPE = "(address,uint16,uint96)"
+COLLATERAL_CURRENCY_LIQUIDATION_TYPE = "(address,uint16,uint16,address,uint128,uint96,{})".format(
+    TRADE_DATA_TYPE
+)
+
+# Underlying token of each currency, tokenAddress is the zero address for ETH
+CurrencyToken = namedtuple("CurrencyToken", ["tokenAddress", "hasTransferFee", "decimals"])
+
+LiquidationCandidate = namedtuple(
+    "LiquidationCandidate",
+    [
+        "account",
+        "liquidationType",
+        "localCurrencyId",
+        # Zero for local currency liquidations
+        "collateralCurrencyId",
+        "netETHValue",
+        # Local prime cash paid by the liquidator and its underlying value (internal precision)
+        "localPrimeCash",
+        "localUnderlying",
+        # Collateral prime cash and nTokens paid to the liquidator, for local currency
+        # liquidations nTokens are in the local currency
+        "collateralPrimeCash",
+        "nTokens",
+        "collateralUnderlying",
+        "expectedProfitETH",
+    ],
+)
+
+
+def get_accounts_with_debt(notional, fromBlock=0, toBlock=None):
+    # Every account that has ever updated its context emits AccountContextUpdate
+    events = notional.events.get_sequence(fromBlock, toBlock, "AccountContextUpdate")
+    accounts = sorted({e.args.account for e in events})
+    return [
+        a
+        for a in accounts
+        if int.from_bytes(bytes(notional.getAccountContext(a)["hasDebt"]), "big") != 0
+    ]
+
+
+def load_tokens(notional, currencyIds=None):
+    if currencyIds is None:
+        currencyIds = range(1, notional.getMaxCurrencyId() + 1)
+
+    tokens = {}
+    for currencyId in currencyIds:
+        (_, underlying) = notional.getCurrency(currencyId)
+        tokens[currencyId] = CurrencyToken(underlying[0], underlying[1], 10 ** underlying[2])
+    return tokens
+
+
+def _to_eth(currency, underlying):
+    # Converts at the oracle rate, without the haircuts and buffers applied in free collateral
+    return div(mul(underlying, currency.ethRate.rate), currency.ethRate.rateDecimals)
+
+
+def _ntoken_prime_value(currency, nTokens):
+    return div(mul(nTokens, currency.nTokenPrimePV), currency.nTokenTotalSupply)
+
+
+def _local_currency_candidate(snapshot, account, currencyId):
+    currency = snapshot.currencies[currencyId]
+    factors = snapshot.get_liquidation_factors(account, currencyId)
+    (_, nTokenBalance) = account.balances.get(currencyId, (0, 0))
+    (localPrimeCash, nTokens) = calculate_local_currency_liquidation(factors, nTokenBalance)
+    if nTokens == 0:
+        return None
+
+    primeRate = currency.cashGroup.primeRate
+    localUnderlying = convert_to_underlying(primeRate, localPrimeCash)
+    nTokenUnderlying = convert_to_underlying(primeRate, _ntoken_prime_value(currency, nTokens))
+
+    return LiquidationCandidate(
+        account.account,
+        LOCAL_CURRENCY,
+        currencyId,
+        0,
+        factors.netETHValue,
+        localPrimeCash,
+        localUnderlying,
+        0,
+        nTokens,
+        nTokenUnderlying,
+        _to_eth(currency, sub(nTokenUnderlying, localUnderlying)),
+    )
+
+
+def _collateral_currency_candidate(snapshot, account, localCurrencyId, collateralCurrencyId):
+    local = snapshot.currencies[localCurrencyId]
+    collateral = snapshot.currencies[collateralCurrencyId]
+    factors = snapshot.get_liquidation_factors(account, localCurrencyId, collateralCurrencyId)
+    (cashBalance, nTokenBalance) = account.balances.get(collateralCurrencyId, (0, 0))
+    (localPrimeCash, collateralPrimeCash, nTokens) = calculate_collateral_currency_liquidation(
+        factors, cashBalance, nTokenBalance
+    )
+
+    localUnderlying = convert_to_underlying(local.cashGroup.primeRate, localPrimeCash)
+    collateralUnderlying = convert_to_underlying(
+        collateral.cashGroup.primeRate,
+        collateralPrimeCash + _ntoken_prime_value(collateral, nTokens),
+    )
+
+    return LiquidationCandidate(
+        account.account,
+        COLLATERAL_CURRENCY,
+        localCurrencyId,
+        collateralCurrencyId,
+        factors.netETHValue,
+        localPrimeCash,
+        localUnderlying,
+        collateralPrimeCash,
+        nTokens,
+        collateralUnderlying,
+        sub(_to_eth(collateral, collateralUnderlying), _to_eth(local, localUnderlying)),
+    )
+
+
+def get_liquidation_candidates(snapshot, account):
+    # Returns every currency and collateral currency liquidation the account is eligible for
+    candidates = []
+    values = snapshot.get_currency_values(account)
+    for (localCurrencyId, localAvailable, _, _) in values:
+        (_, nTokenBalance) = account.balances.get(localCurrencyId, (0, 0))
+        liquidations = []
+        if nTokenBalance > 0 and localAvailable != 0:
+            liquidations.append((_local_currency_candidate, (localCurrencyId,)))
+
+        if localAvailable < 0:
+            for (collateralCurrencyId, collateralAvailable, _, _) in values:
+                if collateralAvailable > 0 and collateralCurrencyId != account.bitmapCurrencyId:
+                    liquidations.append(
+                        (_collateral_currency_candidate, (localCurrencyId, collateralCurrencyId))
+                    )
+
+        for (method, args) in liquidations:
+            try:
+                candidate = method(snapshot, account, *args)
+            except Revert:
+                continue
+            if candidate is not None:
+                candidates.append(candidate)
+
+    return candidates
+
+
+def scan_liquidations(snapshot, accounts=None, minProfitETH=0):
+    # Returns liquidation candidates across all accounts ranked by expected profit
+    if accounts is None:
+        accounts = snapshot.accounts
+
+    results = snapshot.get_free_collateral_batch(accounts)
+    candidates = []
+    for (i, account) in enumerate(accounts):
+        if results["reverted"][i] or results["netETHValue"][i] >= 0:
+            continue
+        candidates.extend(
+            c
+            for c in get_liquidation_candidates(snapshot, account)
+            if c.expectedProfitETH > minProfitETH
+        )
+
+    return sorted(candidates, key=lambda c: c.expectedProfitETH, reverse=True)
+
+
+def scan(notional, accounts=None, fromBlock=0, minProfitETH=0):
+    if accounts is None:
+        accounts = get_accounts_with_debt(notional, fromBlock)
+    return scan_liquidations(load_snapshot(notional, accounts), minProfitETH=minProfitETH)
+
+
+def to_external(token, underlying, bufferBPS=0):
+    # Converts an internal precision underlying amount to token precision, rounding up
+    scaled = underlying * token.decimals * (10000 + bufferBPS)
+    return -(-scaled // (INTERNAL_TOKEN_PRECISION * 10000))
+
+
+def get_trade_data(
+    sellToken,
+    buyToken,
+    amount,
+    limit=0,
+    deadline=None,
+    exchangeData=b"",
+    dexId=DEX_UNISWAP_V3,
+    tradeType=EXACT_IN_SINGLE,
+    useDynamicSlippage=False,
+    dynamicSlippageLimit=0,
+):
+    if deadline is None:
+        deadline = chain.time() + 3600
+    return [
+        [tradeType, sellToken, buyToken, amount, limit, deadline, exchangeData],
+        dexId,
+        useDynamicSlippage,
+        dynamicSlippageLimit,
+    ]
+
+
+def _flash_token(token, weth):
+    # Flash loans and trades are in WETH when the underlying is ETH
+    return weth if token.tokenAddress == ZERO_ADDRESS else token.tokenAddress
+
+
+def get_flash_liquidation_args(
+    candidate, tokens, weth, tradeData=None, withdrawProfit=True, bufferBPS=DEFAULT_BUFFER_BPS
+):
+    # Returns the arguments to FlashLiquidator.flashLoan. Collateral currency liquidations trade
+    # the collateral back to the local currency to repay the flash loan, tradeData must sell the
+    # collateral underlying (see get_trade_data)
+    local = tokens[candidate.localCurrencyId]
+    flashAsset = _flash_token(local, weth)
+    amount = to_external(local, candidate.localUnderlying, bufferBPS)
+
+    if candidate.liquidationType == LOCAL_CURRENCY:
+        collateralAddress = flashAsset
+        tradeInWETH = False
+        payload = eth_abi.encode_abi(
+            [LOCAL_CURRENCY_LIQUIDATION_TYPE],
+            [[candidate.account, candidate.localCurrencyId, 0]],
+        )
+    else:
+        if tradeData is None:
+            raise Exception("Collateral currency liquidation requires trade data")
+        collateral = tokens[candidate.collateralCurrencyId]
+        collateralAddress = _flash_token(collateral, weth)
+        tradeInWETH = collateral.tokenAddress == ZERO_ADDRESS
+        payload = eth_abi.encode_abi(
+            [COLLATERAL_CURRENCY_LIQUIDATION_TYPE],
+            [
+                [
+                    candidate.account,
+                    candidate.localCurrencyId,
+                    candidate.collateralCurrencyId,
+                    collateralAddress,
+                    0,
+                    0,
+                    tradeData,
+                ]
+            ],
+        )
+
+    params = eth_abi.encode_abi(
+        [LIQUIDATION_ACTION_TYPE],
+        [
+            [
+                candidate.liquidationType,
+                withdrawProfit,
+                local.hasTransferFee,
+                tradeInWETH,
+                b"",
+                payload,
+            ]
+        ],
+    )
+
+    return (flashAsset, amount, params, flashAsset, collateralAddress)
+
+
+def get_manual_liquidation_calldata(liquidator, candidate, tokens, bufferBPS=DEFAULT_BUFFER_BPS):
+    # Returns (calldata, value) for a ManualLiquidator holding the local currency, value is the
+    # ETH to send when the local currency is ETH
+    local = tokens[candidate.localCurrencyId]
+    value = 0
+    if local.tokenAddress == ZERO_ADDRESS:
+        value = to_external(local, candidate.localUnderlying, bufferBPS)
+
+    if candidate.liquidationType == LOCAL_CURRENCY:
+        calldata = liquidator.liquidateLocalCurrency.encode_input(
+            candidate.account, candidate.localCurrencyId, 0
+        )
+    else:
+        calldata = liquidator.liquidateCollateralCurrency.encode_input(
+            candidate.account,
+            candidate.localCurrencyId,
+            candidate.collateralCurrencyId,
+            0,
+            0,
+            True,
+            True,
+        )
+
+    return (calldata, value)
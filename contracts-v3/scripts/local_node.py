@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import time
+import urllib.request
+
+from brownie._config import CONFIG
+
+# Launches development nodes outside of brownie so that several can run side by side on
+# different ports and so that their state can be saved and restored. Both ganache (state is a
+# database directory) and anvil (state is a JSON dump file) are supported.
+
+DEFAULT_BACKEND = "ganache"
+STARTUP_TIMEOUT = 60
+# Brownie launches ganache with this hardfork unless the network sets evm_version
+DEFAULT_EVM_VERSION = "istanbul"
+
+
+def get_cmd_settings(network="development"):
+    settings = dict(CONFIG.networks[network].get("cmd_settings", {}))
+    # Fork networks refer to the forked network by id, resolved to its host like brownie does
+    if "fork" in settings:
+        fork = settings["fork"]
+        if fork in CONFIG.networks:
+            settings["fork"] = CONFIG.networks[fork]["host"]
+            settings.setdefault("chain_id", int(CONFIG.networks[fork]["chainid"]))
+        settings["fork"] = os.path.expandvars(settings["fork"])
+    return settings
+
+
+def rpc_request(port, method, params=None):
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params or []})
+    request = urllib.request.Request(
+        "http://127.0.0.1:{}".format(port),
+        data=payload.encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        result = json.loads(response.read())
+
+    if "error" in result:
+        raise Exception("{} failed: {}".format(method, result["error"]))
+    return result["result"]
+
+
+class LocalNode:
+    def __init__(self, port, backend=DEFAULT_BACKEND, state=None, cmdSettings=None, cmd=None):
+        self.port = port
+        self.backend = backend
+        # Path to a ganache database directory or an anvil state file, may not exist yet
+        self.state = state
+        self.cmdSettings = get_cmd_settings() if cmdSettings is None else cmdSettings
+        # Command of the brownie network, e.g. "npx ganache"
+        self.cmd = backend if cmd is None else cmd
+        self.process = None
+
+    def _ganache_args(self):
+        s = self.cmdSettings
+        args = self.cmd.split(" ") + ["--server.port", str(self.port), "--logging.quiet"]
+        # Brownie relies on revert reasons being returned in the RPC response
+        args += ["--chain.vmErrorsOnRPCResponse", "true"]
+        args += ["--hardfork", s.get("evm_version", DEFAULT_EVM_VERSION)]
+        if "accounts" in s:
+            args += ["--wallet.totalAccounts", str(s["accounts"])]
+        if "mnemonic" in s:
+            args += ["--wallet.mnemonic", s["mnemonic"]]
+        if "default_balance" in s:
+            args += ["--wallet.defaultBalance", str(s["default_balance"])]
+        if "gas_limit" in s:
+            args += ["--miner.blockGasLimit", str(s["gas_limit"])]
+        if s.get("unlimited_contract_size"):
+            args += ["--chain.allowUnlimitedContractSize"]
+        if "fork" in s:
+            args += ["--fork.url", s["fork"]]
+        if "fork_block" in s:
+            args += ["--fork.blockNumber", str(s["fork_block"])]
+        if "chain_id" in s:
+            args += ["--chain.chainId", str(s["chain_id"])]
+        if "network_id" in s:
+            args += ["--chain.networkId", str(s["network_id"])]
+        unlock = s.get("unlock", [])
+        for address in unlock if isinstance(unlock, list) else [unlock]:
+            args += ["--wallet.unlockedAccounts", str(address)]
+        if self.state is not None:
+            args += ["--database.dbPath", self.state]
+        return args
+
+    def _anvil_args(self):
+        s = self.cmdSettings
+        args = self.cmd.split(" ") + ["--port", str(self.port), "--silent"]
+        if "accounts" in s:
+            args += ["--accounts", str(s["accounts"])]
+        if "mnemonic" in s:
+            args += ["--mnemonic", s["mnemonic"]]
+        if "default_balance" in s:
+            args += ["--balance", str(s["default_balance"])]
+        if "gas_limit" in s:
+            args += ["--gas-limit", str(s["gas_limit"])]
+        if s.get("unlimited_contract_size"):
+            args += ["--disable-code-size-limit"]
+        if "fork" in s:
+            args += ["--fork-url", s["fork"]]
+        if "fork_block" in s:
+            args += ["--fork-block-number", str(s["fork_block"])]
+        if self.state is not None and os.path.exists(self.state):
+            args += ["--load-state", self.state]
+        return args
+
+    def start(self):
+        args = self._ganache_args() if self.backend == "ganache" else self._anvil_args()
+        if self.backend == "ganache" and self.state is not None:
+            os.makedirs(self.state, exist_ok=True)
+
+        self.process = subprocess.Popen(
+            args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True
+        )
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise Exception(
+                    "{} exited on startup: {}".format(self.backend, self.process.stderr.read())
+                )
+            try:
+                rpc_request(self.port, "eth_chainId")
+                return self
+            except OSError:
+                time.sleep(0.25)
+
+        self.stop()
+        raise Exception("{} did not start on port {}".format(self.backend, self.port))
+
+    def dump_state(self, path):
+        if self.backend == "anvil":
+            with open(path, "w") as f:
+                f.write(rpc_request(self.port, "anvil_dumpState"))
+        else:
+            # Ganache persists to its database directory as blocks are mined, it must be stopped
+            # before the directory is copied so the database is flushed
+            if self.state is None:
+                raise Exception("Ganache node was not started with a database path")
+            self.stop()
+            if os.path.abspath(path) != os.path.abspath(self.state):
+                shutil.rmtree(path, ignore_errors=True)
+                shutil.copytree(self.state, path)
+
+    def load_state(self, path):
+        # Anvil can load state into a running node, ganache has to restart on a copy of the db
+        if self.backend == "anvil":
+            with open(path, "r") as f:
+                rpc_request(self.port, "anvil_loadState", [f.read()])
+        else:
+            self.stop()
+            shutil.rmtree(self.state, ignore_errors=True)
+            shutil.copytree(path, self.state)
+            self.start()
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            os.killpg(self.process.pid, signal.SIGINT)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def connect(port, network="development"):
+    # Brownie attaches to a node that is already listening instead of launching its own, the
+    # port is overridden the same way brownie does it for xdist workers
+    from brownie import network as brownieNetwork
+
+    CONFIG.networks[network]["cmd_settings"]["port"] = port
+    brownieNetwork.connect(network)
+
+
+def restore_chain_time(timestamp=None):
+    # A restarted node does not keep the time offset it had when the state was saved, mine a
+    # block right after the saved block so the chain resumes from the time it was saved at
+    from brownie.network import web3
+    from brownie.network.state import Chain
+
+    chain = Chain()
+    latest = web3.eth.get_block("latest")["timestamp"]
+    if timestamp is not None:
+        chain.mine(1, timestamp=max(latest, timestamp) + 1)
+    elif chain.time() <= latest:
+        chain.mine(1, timestamp=latest + 1)
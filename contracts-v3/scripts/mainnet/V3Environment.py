@@ -1,47 +1,58 @@
 import json
 from brownie import (
     accounts,
-    Contract, 
     interface, 
     ZERO_ADDRESS,
     MigratePrimeCash, 
     nProxy, 
+    PauseRouter,
     Router, 
     CompoundV2HoldingsOracle, 
     MockERC20, 
     ProportionalRebalancingStrategy
 )
 from tests.helpers import get_interest_rate_curve
+from scripts.abi_cache import get_contract
+from scripts.common import LazyDict
 from scripts.primeCashOracle import CompoundConfig
 from scripts.deployment import deployNotionalContracts, deployBeacons
+from scripts.env_cache import cached_environment
+from brownie.project import ContractsV3Project
 
 def getEnvironment(accounts, configFile, deploy=True, migrate=False):
     with open(configFile, "r") as j:
         config = json.load(j)
     return V3Environment(accounts, config, deploy, migrate)
 
+def getCachedEnvironment(accounts, configFile, deploy=True, migrate=False):
+    # Restores the deployed (and migrated) fork state from a snapshot when one exists for this
+    # fork block and build, see env_cache.py
+    name = "v3env-{}-{}-{}".format(configFile.replace(".json", ""), int(deploy), int(migrate))
+    return cached_environment(
+        name,
+        lambda: getEnvironment(accounts, configFile, deploy, migrate),
+        accounts[0],
+        V3Environment,
+        [configFile, "scripts/mainnet/V3Environment.py", "scripts/primeCashOracle.py"],
+    )
+
 class V3Environment:
     def __init__(self, accounts, config, deploy=True, migrate=True):
         notionalInterfaceABI = interface.NotionalProxy.abi
         self.deployer = accounts[0]
-        self.notional = Contract.from_abi(
-            "Notional", config["notional"], abi=notionalInterfaceABI
-        )
-        self.proxy = Contract.from_abi(
-            "Notional", config["notional"], abi=nProxy.abi
-        )
-        self.router = Contract.from_abi(
-            "Notional", config["notional"], abi=Router.abi
-        )
+        self.notional = get_contract("Notional", config["notional"], notionalInterfaceABI)
+        self.proxy = get_contract("Notional", config["notional"], nProxy.abi)
+        self.router = get_contract("Notional", config["notional"], Router.abi)
 
-        self.tokens = {
-            'DAI': Contract.from_abi('DAI', config['tokens']['DAI']['address'], MockERC20.abi),
-            'USDC': Contract.from_abi('USDC', config['tokens']['USDC']['address'], MockERC20.abi),
-            'WBTC': Contract.from_abi('WBTC', config['tokens']['WBTC']['address'], MockERC20.abi),
-            'WETH': Contract.from_abi('WETH', config['tokens']['WETH']['address'], MockERC20.abi),
-            'wstETH': Contract.from_abi('wstETH', config['tokens']['wstETH']['address'], MockERC20.abi),
-            'FRAX': Contract.from_abi('FRAX', config['tokens']['FRAX']['address'], MockERC20.abi),
-        }
+        # Token wrappers are built when a test first uses them
+        self.tokens = LazyDict(
+            factories={
+                symbol: lambda symbol=symbol: get_contract(
+                    symbol, config['tokens'][symbol]['address'], MockERC20.abi
+                )
+                for symbol in ['DAI', 'USDC', 'WBTC', 'WETH', 'wstETH', 'FRAX']
+            }
+        )
 
         self.owner = self.notional.owner()
         self.pauseRouter = self.router.pauseRouter()
@@ -107,14 +118,79 @@ class V3Environment:
 
             self.primeCashOracles = { 'ETH': self.pETH, 'DAI': self.pDAI, 'USDC': self.pUSDC, 'WBTC': self.pWBTC }
 
-            self.tokens['cETH'] = Contract.from_abi('cETH', CompoundConfig['ETH']['cToken'], MockERC20.abi)
-            self.tokens['cDAI'] = Contract.from_abi('cDAI', CompoundConfig['DAI']['cToken'], MockERC20.abi)
-            self.tokens['cUSDC'] = Contract.from_abi('cUSDC', CompoundConfig['USDC']['cToken'], MockERC20.abi)
-            self.tokens['cWBTC'] = Contract.from_abi('cWBTC', CompoundConfig['WBTC']['cToken'], MockERC20.abi)
+            for symbol in ['ETH', 'DAI', 'USDC', 'WBTC']:
+                self.tokens.setLazy(
+                    'c' + symbol,
+                    lambda symbol=symbol: get_contract(
+                        'c' + symbol, CompoundConfig[symbol]['cToken'], MockERC20.abi
+                    ),
+                )
         else:
             self.notional.upgradeTo(self.finalRouter, {"from": self.owner})
 
 
+    def toManifest(self):
+        # Addresses required to rebuild this object against a node that has had its state
+        # restored, see fromManifest
+        def address(contract):
+            return contract if isinstance(contract, str) else contract.address
+
+        manifest = {
+            "notional": self.notional.address,
+            "tokens": {k: v.address for (k, v) in self.tokens.items()},
+            "pauseRouter": address(self.pauseRouter),
+            "multisig": self.multisig,
+        }
+        if hasattr(self, "finalRouter"):
+            manifest["finalRouter"] = self.finalRouter.address
+            manifest["rebalancingStrategy"] = self.rebalancingStrategy.address
+            manifest["contracts"] = {k: [v._name, v.address] for (k, v) in self.contracts.items()}
+        if hasattr(self, "patchFix"):
+            manifest["patchFix"] = self.patchFix.address
+            manifest["primeCashOracles"] = {
+                k: v.address for (k, v) in self.primeCashOracles.items()
+            }
+        return manifest
+
+    @classmethod
+    def fromManifest(cls, manifest, deployer):
+        env = cls.__new__(cls)
+        env.deployer = deployer
+        env.notional = get_contract("Notional", manifest["notional"], interface.NotionalProxy.abi)
+        env.proxy = get_contract("Notional", manifest["notional"], nProxy.abi)
+        env.router = get_contract("Notional", manifest["notional"], Router.abi)
+        env.tokens = LazyDict(
+            factories={
+                k: lambda k=k, v=v: get_contract(k, v, MockERC20.abi)
+                for (k, v) in manifest["tokens"].items()
+            }
+        )
+        env.owner = env.notional.owner()
+        env.pauseRouter = manifest["pauseRouter"]
+        env.guardian = env.router.pauseGuardian()
+        env.multisig = manifest["multisig"]
+
+        if "finalRouter" in manifest:
+            env.finalRouter = Router.at(manifest["finalRouter"])
+            env.pauseRouter = PauseRouter.at(manifest["pauseRouter"])
+            env.rebalancingStrategy = ProportionalRebalancingStrategy.at(
+                manifest["rebalancingStrategy"]
+            )
+            env.contracts = {
+                k: ContractsV3Project.dict()[name].at(address)
+                for (k, (name, address)) in manifest["contracts"].items()
+            }
+        if "patchFix" in manifest:
+            env.patchFix = MigratePrimeCash.at(manifest["patchFix"])
+            env.primeCashOracles = {
+                k: CompoundV2HoldingsOracle.at(v) for (k, v) in manifest["primeCashOracles"].items()
+            }
+            (env.pETH, env.pDAI, env.pUSDC, env.pWBTC) = [
+                env.primeCashOracles[k] for k in ["ETH", "DAI", "USDC", "WBTC"]
+            ]
+
+        return env
+
     def setMigrationSettings(self):
         # TODO: change these...
         self.patchFix.setMigrationSettings(
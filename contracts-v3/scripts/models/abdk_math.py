@@ -0,0 +1,207 @@
+from scripts.models.solidity import require, tdiv
+
+# Bit exact port of the ABDKMath64x64 functions used by the protocol. Values are signed 64.64
+# fixed point numbers held in python ints, intermediate results are wrapped the same way the
+# Solidity casts wrap them.
+
+MIN_64x64 = -(2 ** 127)
+MAX_64x64 = 2 ** 127 - 1
+
+LN_2 = 0xB17217F7D1CF79ABC9E3B39803F2F6AF
+LOG2_E = 0x171547652B82FE1777D0FFDA0D23A7D12
+
+# exp_2 multiplies by 2 ^ (2 ^ -i) in 128.128 fixed point for every bit i set in the fraction
+EXP_2_FACTORS = [
+    0x16A09E667F3BCC908B2FB1366EA957D3E,
+    0x1306FE0A31B7152DE8D5A46305C85EDEC,
+    0x1172B83C7D517ADCDF7C8C50EB14A791F,
+    0x10B5586CF9890F6298B92B71842A98363,
+    0x1059B0D31585743AE7C548EB68CA417FD,
+    0x102C9A3E778060EE6F7CACA4F7A29BDE8,
+    0x10163DA9FB33356D84A66AE336DCDFA3F,
+    0x100B1AFA5ABCBED6129AB13EC11DC9543,
+    0x10058C86DA1C09EA1FF19D294CF2F679B,
+    0x1002C605E2E8CEC506D21BFC89A23A00F,
+    0x100162F3904051FA128BCA9C55C31E5DF,
+    0x1000B175EFFDC76BA38E31671CA939725,
+    0x100058BA01FB9F96D6CACD4B180917C3D,
+    0x10002C5CC37DA9491D0985C348C68E7B3,
+    0x1000162E525EE054754457D5995292026,
+    0x10000B17255775C040618BF4A4ADE83FC,
+    0x1000058B91B5BC9AE2EED81E9B7D4CFAB,
+    0x100002C5C89D5EC6CA4D7C8ACC017B7C9,
+    0x10000162E43F4F831060E02D839A9D16D,
+    0x100000B1721BCFC99D9F890EA06911763,
+    0x10000058B90CF1E6D97F9CA14DBCC1628,
+    0x1000002C5C863B73F016468F6BAC5CA2B,
+    0x100000162E430E5A18F6119E3C02282A5,
+    0x1000000B1721835514B86E6D96EFD1BFE,
+    0x100000058B90C0B48C6BE5DF846C5B2EF,
+    0x10000002C5C8601CC6B9E94213C72737A,
+    0x1000000162E42FFF037DF38AA2B219F06,
+    0x10000000B17217FBA9C739AA5819F44F9,
+    0x1000000058B90BFCDEE5ACD3C1CEDC823,
+    0x100000002C5C85FE31F35A6A30DA1BE50,
+    0x10000000162E42FF0999CE3541B9FFFCF,
+    0x100000000B17217F80F4EF5AADDA45554,
+    0x10000000058B90BFBF8479BD5A81B51AD,
+    0x1000000002C5C85FDF84BD62AE30A74CC,
+    0x100000000162E42FEFB2FED257559BDAA,
+    0x1000000000B17217F7D5A7716BBA4A9AE,
+    0x100000000058B90BFBE9DDBAC5E109CCE,
+    0x10000000002C5C85FDF4B15DE6F17EB0D,
+    0x1000000000162E42FEFA494F1478FDE05,
+    0x10000000000B17217F7D20CF927C8E94C,
+    0x1000000000058B90BFBE8F71CB4E4B33D,
+    0x100000000002C5C85FDF477B662B26945,
+    0x10000000000162E42FEFA3AE53369388C,
+    0x100000000000B17217F7D1D351A389D40,
+    0x10000000000058B90BFBE8E8B2D3D4EDE,
+    0x1000000000002C5C85FDF4741BEA6E77E,
+    0x100000000000162E42FEFA39FE95583C2,
+    0x1000000000000B17217F7D1CFB72B45E1,
+    0x100000000000058B90BFBE8E7CC35C3F0,
+    0x10000000000002C5C85FDF473E242EA38,
+    0x1000000000000162E42FEFA39F02B772C,
+    0x10000000000000B17217F7D1CF7D83C1A,
+    0x1000000000000058B90BFBE8E7BDCBE2E,
+    0x100000000000002C5C85FDF473DEA871F,
+    0x10000000000000162E42FEFA39EF44D91,
+    0x100000000000000B17217F7D1CF79E949,
+    0x10000000000000058B90BFBE8E7BCE544,
+    0x1000000000000002C5C85FDF473DE6ECA,
+    0x100000000000000162E42FEFA39EF366F,
+    0x1000000000000000B17217F7D1CF79AFA,
+    0x100000000000000058B90BFBE8E7BCD6D,
+    0x10000000000000002C5C85FDF473DE6B2,
+    0x1000000000000000162E42FEFA39EF358,
+    0x10000000000000000B17217F7D1CF79AB,
+]
+
+
+def _int128(x):
+    return (x + 2 ** 127) % 2 ** 128 - 2 ** 127
+
+
+def _int64(x):
+    return (x + 2 ** 63) % 2 ** 64 - 2 ** 63
+
+
+def from_int(x):
+    require(-0x8000000000000000 <= x <= 0x7FFFFFFFFFFFFFFF)
+    return x << 64
+
+
+def from_uint(x):
+    require(0 <= x <= 0x7FFFFFFFFFFFFFFF)
+    return x << 64
+
+
+def to_int(x):
+    return _int64(x >> 64)
+
+
+def mul(x, y):
+    result = (x * y) >> 64
+    require(MIN_64x64 <= result <= MAX_64x64)
+    return result
+
+
+def div(x, y):
+    require(y != 0)
+    result = tdiv(x << 64, y)
+    require(MIN_64x64 <= result <= MAX_64x64)
+    return result
+
+
+def neg(x):
+    require(x != MIN_64x64)
+    return -x
+
+
+def divuu(x, y):
+    require(y != 0)
+    if x <= 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF:
+        result = (x << 64) // y
+    else:
+        msb = 192
+        xc = x >> 192
+        for (limit, shift) in ((0x100000000, 32), (0x10000, 16), (0x100, 8), (0x10, 4), (0x4, 2)):
+            if xc >= limit:
+                xc >>= shift
+                msb += shift
+        if xc >= 0x2:
+            msb += 1
+
+        result = ((x << (255 - msb)) % 2 ** 256) // (((y - 1) >> (msb - 191)) + 1)
+        require(result <= 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF)
+
+        hi = result * (y >> 128)
+        lo = result * (y & 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF)
+        xh = x >> 192
+        xl = (x << 64) % 2 ** 256
+        if xl < lo:
+            xh -= 1
+        xl = (xl - lo) % 2 ** 256
+        lo = (hi << 128) % 2 ** 256
+        if xl < lo:
+            xh -= 1
+        xl = (xl - lo) % 2 ** 256
+        assert xh == hi >> 128
+
+        result += xl // y
+
+    require(result <= 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF)
+    return result
+
+
+def divu(x, y):
+    result = divuu(x, y)
+    require(result <= MAX_64x64)
+    return result
+
+
+def log_2(x):
+    require(x > 0)
+    msb = x.bit_length() - 1
+    result = (msb - 64) << 64
+    ux = x << (127 - msb)
+    bit = 0x8000000000000000
+    while bit > 0:
+        ux = (ux * ux) % 2 ** 256
+        b = ux >> 255
+        ux >>= 127 + b
+        result += bit * b
+        bit >>= 1
+
+    return _int128(result)
+
+
+def ln(x):
+    require(x > 0)
+    # The signed log is reinterpreted as a uint256 before the multiplication, this relies on
+    # overflow so it is reproduced here
+    return _int128((((log_2(x) % 2 ** 256) * LN_2) % 2 ** 256) >> 128)
+
+
+def exp_2(x):
+    require(x < 0x400000000000000000)
+    if x < -0x400000000000000000:
+        return 0
+
+    result = 0x80000000000000000000000000000000
+    for (i, factor) in enumerate(EXP_2_FACTORS):
+        if x & (0x8000000000000000 >> i) > 0:
+            result = (result * factor) >> 128
+
+    result >>= 63 - (x >> 64)
+    require(result <= MAX_64x64)
+    return result
+
+
+def exp(x):
+    require(x < 0x400000000000000000)
+    if x < -0x400000000000000000:
+        return 0
+
+    return exp_2(_int128((x * LOG2_E) >> 128))
@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+from scripts.models import abdk_math
+from scripts.models.cash_group import (
+    calculate_risk_adjusted_debt_oracle_rate,
+    calculate_risk_adjusted_fcash_oracle_rate,
+    get_max_discount_factor,
+)
+from scripts.models.date_time import YEAR
+from scripts.models.interest_rate_curve import RATE_PRECISION_64x64
+from scripts.models.prime_rate import convert_from_underlying
+from scripts.models.solidity import (
+    RATE_PRECISION,
+    add,
+    div,
+    mul,
+    mul_in_rate_precision,
+    require,
+    udiv,
+    umul,
+    usub,
+)
+
+# Python model of AssetHandler, oracle rates are passed through to the cash group model
+
+FCASH_ASSET_TYPE = 1
+MIN_LIQUIDITY_TOKEN_INDEX = 2
+MAX_LIQUIDITY_TOKEN_INDEX = 8
+
+# Field order matches the PortfolioAsset struct so chain return values can be passed in directly
+PortfolioAsset = namedtuple(
+    "PortfolioAsset",
+    ["currencyId", "maturity", "assetType", "notional", "storageSlot", "storageState"],
+)
+
+
+def get_discount_factor(timeToMaturity, oracleRate):
+    expValue = abdk_math.from_uint(udiv(umul(oracleRate, timeToMaturity), YEAR))
+    expValue = abdk_math.div(expValue, RATE_PRECISION_64x64)
+    expValue = abdk_math.exp(abdk_math.neg(expValue))
+    expValue = abdk_math.mul(expValue, RATE_PRECISION_64x64)
+    return abdk_math.to_int(expValue)
+
+
+def apply_discount_factor(notional, discountFactor):
+    require(discountFactor <= RATE_PRECISION)
+    pv = mul_in_rate_precision(notional, discountFactor)
+    return min(pv, -1) if notional < 0 else pv
+
+
+def get_present_fcash_value(notional, maturity, blockTime, oracleRate):
+    if notional == 0:
+        return 0
+
+    discountFactor = get_discount_factor(usub(maturity, blockTime), oracleRate)
+    return apply_discount_factor(notional, discountFactor)
+
+
+def get_risk_adjusted_fcash_discount(cashGroup, maturity, blockTime, oracleRates):
+    oracleRate = calculate_risk_adjusted_fcash_oracle_rate(
+        cashGroup, maturity, blockTime, oracleRates
+    )
+    discountFactor = get_discount_factor(usub(maturity, blockTime), oracleRate)
+    return min(discountFactor, get_max_discount_factor(cashGroup))
+
+
+def get_risk_adjusted_debt_discount(cashGroup, maturity, blockTime, oracleRates):
+    oracleRate = calculate_risk_adjusted_debt_oracle_rate(
+        cashGroup, maturity, blockTime, oracleRates
+    )
+    if oracleRate == 0:
+        return RATE_PRECISION
+    return get_discount_factor(usub(maturity, blockTime), oracleRate)
+
+
+def get_risk_adjusted_discount(cashGroup, notional, maturity, blockTime, oracleRates):
+    # Positive fCash is discounted more heavily than the oracle rate and debts less heavily
+    if notional > 0:
+        return get_risk_adjusted_fcash_discount(cashGroup, maturity, blockTime, oracleRates)
+    return get_risk_adjusted_debt_discount(cashGroup, maturity, blockTime, oracleRates)
+
+
+def get_risk_adjusted_present_fcash_value(cashGroup, notional, maturity, blockTime, oracleRates):
+    if notional == 0:
+        return 0
+
+    discountFactor = get_risk_adjusted_discount(
+        cashGroup, notional, maturity, blockTime, oracleRates
+    )
+    return apply_discount_factor(notional, discountFactor)
+
+
+def is_liquidity_token(assetType):
+    return MIN_LIQUIDITY_TOKEN_INDEX <= assetType <= MAX_LIQUIDITY_TOKEN_INDEX
+
+
+def get_cash_claims(token, market):
+    # Returns (primeCash, fCash) claims of a liquidity token on the market
+    require(is_liquidity_token(token.assetType) and token.notional >= 0)
+    primeCash = div(mul(market.totalPrimeCash, token.notional), market.totalLiquidity)
+    fCash = div(mul(market.totalfCash, token.notional), market.totalLiquidity)
+    return (primeCash, fCash)
+
+
+def get_net_cash_group_value(
+    assets, cashGroup, blockTime, portfolioIndex, oracleRates, discountFactor=None
+):
+    # assets are PortfolioAsset tuples sorted by currency and maturity, returns the risk
+    # adjusted value in prime cash and the index of the first asset in the next currency.
+    # discountFactor(maturity, isPositive) may return discount factors cached by the caller.
+    if discountFactor is None:
+
+        def discountFactor(maturity, isPositive):
+            return get_risk_adjusted_discount(
+                cashGroup, 1 if isPositive else -1, maturity, blockTime, oracleRates
+            )
+
+    presentValueUnderlying = 0
+    j = portfolioIndex
+    while j < len(assets):
+        a = assets[j]
+        if a.assetType == FCASH_ASSET_TYPE:
+            if a.currencyId != cashGroup.currencyId:
+                break
+            if a.notional != 0:
+                presentValueUnderlying = add(
+                    presentValueUnderlying,
+                    apply_discount_factor(a.notional, discountFactor(a.maturity, a.notional > 0)),
+                )
+        j += 1
+
+    return (convert_from_underlying(cashGroup.primeRate, presentValueUnderlying), j)
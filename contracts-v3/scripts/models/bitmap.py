@@ -0,0 +1,48 @@
+from scripts.models.solidity import require
+
+# Python model of Bitmap. Bitmaps are ints (bytes32 values are converted), big-endian and one
+# indexed so bit 1 is the most significant bit.
+
+MSB = 1 << 255
+BITMAP_MASK = (1 << 256) - 1
+
+
+def to_bitmap(bitmap):
+    if isinstance(bitmap, int):
+        return bitmap
+    return int.from_bytes(bytes(bitmap), "big")
+
+
+def set_bit(bitmap, index, setOn):
+    require(1 <= index <= 256)
+    if setOn:
+        return to_bitmap(bitmap) | (MSB >> (index - 1))
+    return to_bitmap(bitmap) & ~(MSB >> (index - 1)) & BITMAP_MASK
+
+
+def is_bit_set(bitmap, index):
+    require(1 <= index <= 256)
+    return to_bitmap(bitmap) & (MSB >> (index - 1)) != 0
+
+
+def total_bits_set(bitmap):
+    return bin(to_bitmap(bitmap)).count("1")
+
+
+def get_msb(x):
+    # Zero indexed from the least significant bit
+    require(x != 0)
+    return x.bit_length() - 1
+
+
+def get_next_bit_num(bitmap):
+    bitmap = to_bitmap(bitmap)
+    if bitmap == 0:
+        return 0
+    return 255 - get_msb(bitmap) + 1
+
+
+def get_bit_nums(bitmap):
+    # All set bits in the order getNextBitNum visits them
+    bitmap = to_bitmap(bitmap)
+    return [i for i in range(1, 257) if bitmap & (MSB >> (i - 1))]
@@ -0,0 +1,158 @@
+from collections import namedtuple
+
+from scripts.models.date_time import get_market_index, get_reference_time, get_traded_market
+from scripts.models.prime_rate import PrimeRate
+from scripts.models.solidity import RATE_PRECISION, require
+
+# Python model of the CashGroup getters. Market.getOracleRate reads storage, so oracle rates are
+# passed in as a dict of market maturity to the oracle rate at blockTime, i.e. the oracleRate
+# field of getActiveMarketsAtBlockTime.
+
+CashGroupParameters = namedtuple(
+    "CashGroupParameters", ["currencyId", "maxMarketIndex", "primeRate", "data"]
+)
+
+FIVE_MINUTES = 300
+FIVE_BASIS_POINTS = RATE_PRECISION // 10000 * 5
+TWENTY_FIVE_BASIS_POINTS = RATE_PRECISION // 10000 * 25
+
+# Byte offsets of each parameter in the packed cash group data, counted from the right
+RATE_ORACLE_TIME_WINDOW = (31 - 30) * 8
+MAX_DISCOUNT_FACTOR = (31 - 29) * 8
+RESERVE_FEE_SHARE = (31 - 28) * 8
+DEBT_BUFFER = (31 - 27) * 8
+FCASH_HAIRCUT = (31 - 26) * 8
+MIN_ORACLE_RATE = (31 - 25) * 8
+LIQUIDATION_FCASH_HAIRCUT = (31 - 24) * 8
+LIQUIDATION_DEBT_BUFFER = (31 - 23) * 8
+MAX_ORACLE_RATE = (31 - 22) * 8
+
+# Offsets in CashGroupSettings field order, after maxMarketIndex
+SETTINGS_OFFSETS = [
+    RATE_ORACLE_TIME_WINDOW,
+    MAX_DISCOUNT_FACTOR,
+    RESERVE_FEE_SHARE,
+    DEBT_BUFFER,
+    FCASH_HAIRCUT,
+    MIN_ORACLE_RATE,
+    LIQUIDATION_FCASH_HAIRCUT,
+    LIQUIDATION_DEBT_BUFFER,
+    MAX_ORACLE_RATE,
+]
+
+
+def build_cash_group(cashGroup):
+    # Converts a CashGroupParameters tuple returned from a contract call
+    (currencyId, maxMarketIndex, primeRate, data) = cashGroup
+    if not isinstance(data, int):
+        data = int.from_bytes(bytes(data), "big")
+    return CashGroupParameters(currencyId, maxMarketIndex, PrimeRate(*primeRate), data)
+
+
+def pack_cash_group(settings):
+    # settings is a CashGroupSettings tuple, as returned by getCashGroup
+    data = settings[0]
+    for (offset, value) in zip(SETTINGS_OFFSETS, settings[1:]):
+        data |= value << offset
+    return data
+
+
+def _get_byte(cashGroup, offset):
+    return (cashGroup.data >> offset) & 0xFF
+
+
+def _get_25bps_value(cashGroup, offset):
+    return _get_byte(cashGroup, offset) * TWENTY_FIVE_BASIS_POINTS
+
+
+def get_min_oracle_rate(cashGroup):
+    return _get_25bps_value(cashGroup, MIN_ORACLE_RATE)
+
+
+def get_max_oracle_rate(cashGroup):
+    return _get_25bps_value(cashGroup, MAX_ORACLE_RATE)
+
+
+def get_fcash_haircut(cashGroup):
+    return _get_25bps_value(cashGroup, FCASH_HAIRCUT)
+
+
+def get_debt_buffer(cashGroup):
+    return _get_25bps_value(cashGroup, DEBT_BUFFER)
+
+
+def get_liquidation_fcash_haircut(cashGroup):
+    return _get_25bps_value(cashGroup, LIQUIDATION_FCASH_HAIRCUT)
+
+
+def get_liquidation_debt_buffer(cashGroup):
+    return _get_25bps_value(cashGroup, LIQUIDATION_DEBT_BUFFER)
+
+
+def get_max_discount_factor(cashGroup):
+    return RATE_PRECISION - _get_byte(cashGroup, MAX_DISCOUNT_FACTOR) * FIVE_BASIS_POINTS
+
+
+def get_reserve_fee_share(cashGroup):
+    return _get_byte(cashGroup, RESERVE_FEE_SHARE)
+
+
+def get_rate_oracle_time_window(cashGroup):
+    return _get_byte(cashGroup, RATE_ORACLE_TIME_WINDOW) * FIVE_MINUTES
+
+
+def interpolate_oracle_rate(shortMaturity, longMaturity, shortRate, longRate, assetMaturity):
+    require(shortMaturity < assetMaturity)
+    require(assetMaturity < longMaturity)
+
+    if longRate >= shortRate:
+        return (longRate - shortRate) * (assetMaturity - shortMaturity) // (
+            longMaturity - shortMaturity
+        ) + shortRate
+
+    rate = shortRate - (shortRate - longRate) * (assetMaturity - shortMaturity) // (
+        longMaturity - shortMaturity
+    )
+    require(rate >= 0)
+    return rate
+
+
+def _get_oracle_rate(oracleRates, maturity):
+    # Market.getOracleRate reverts on uninitialized markets
+    oracleRate = oracleRates.get(maturity, 0)
+    require(oracleRate > 0, "Market not initialized")
+    return oracleRate
+
+
+def calculate_oracle_rate(cashGroup, maturity, blockTime, oracleRates):
+    (marketIndex, idiosyncratic) = get_market_index(cashGroup.maxMarketIndex, maturity, blockTime)
+    if not idiosyncratic:
+        return _get_oracle_rate(oracleRates, maturity)
+
+    referenceTime = get_reference_time(blockTime)
+    longMaturity = referenceTime + get_traded_market(marketIndex)
+    longRate = _get_oracle_rate(oracleRates, longMaturity)
+
+    if marketIndex == 1:
+        # The short market is the annualized prime cash supply rate
+        shortMaturity = blockTime
+        shortRate = cashGroup.primeRate.oracleSupplyRate
+    else:
+        shortMaturity = referenceTime + get_traded_market(marketIndex - 1)
+        shortRate = _get_oracle_rate(oracleRates, shortMaturity)
+
+    return interpolate_oracle_rate(shortMaturity, longMaturity, shortRate, longRate, maturity)
+
+
+def calculate_risk_adjusted_fcash_oracle_rate(cashGroup, maturity, blockTime, oracleRates):
+    oracleRate = calculate_oracle_rate(cashGroup, maturity, blockTime, oracleRates)
+    return max(oracleRate + get_fcash_haircut(cashGroup), get_min_oracle_rate(cashGroup))
+
+
+def calculate_risk_adjusted_debt_oracle_rate(cashGroup, maturity, blockTime, oracleRates):
+    oracleRate = calculate_oracle_rate(cashGroup, maturity, blockTime, oracleRates)
+    debtBuffer = get_debt_buffer(cashGroup)
+    if oracleRate <= debtBuffer:
+        return 0
+
+    return min(oracleRate - debtBuffer, get_max_oracle_rate(cashGroup))
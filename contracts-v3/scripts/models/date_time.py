@@ -0,0 +1,130 @@
+from scripts.models.solidity import Revert, require
+
+# Python model of DateTime, see scripts/models/solidity.py for the integer semantics
+
+DAY = 86400
+WEEK = DAY * 6
+MONTH = WEEK * 5
+QUARTER = MONTH * 3
+YEAR = QUARTER * 4
+MAX_TRADED_MARKET_INDEX = 7
+
+MAX_DAY_OFFSET = 90
+MAX_WEEK_OFFSET = 360
+MAX_MONTH_OFFSET = 2160
+MAX_QUARTER_OFFSET = 7650
+WEEK_BIT_OFFSET = 90
+MONTH_BIT_OFFSET = 135
+QUARTER_BIT_OFFSET = 195
+MAX_BIT_NUM = 256
+
+TRADED_MARKETS = [
+    QUARTER,
+    2 * QUARTER,
+    YEAR,
+    2 * YEAR,
+    5 * YEAR,
+    10 * YEAR,
+    20 * YEAR,
+]
+
+
+def _bit_num_offset(bitNum):
+    # Returns (period, offset) where the bit's maturity is
+    #   blockTimeUTC0 - blockTimeUTC0 % period + offset
+    if bitNum <= WEEK_BIT_OFFSET:
+        return (DAY, bitNum * DAY)
+    if bitNum <= MONTH_BIT_OFFSET:
+        return (WEEK, MAX_DAY_OFFSET * DAY + (bitNum - WEEK_BIT_OFFSET) * WEEK)
+    if bitNum <= QUARTER_BIT_OFFSET:
+        return (MONTH, MAX_WEEK_OFFSET * DAY + (bitNum - MONTH_BIT_OFFSET) * MONTH)
+    return (QUARTER, MAX_MONTH_OFFSET * DAY + (bitNum - QUARTER_BIT_OFFSET) * QUARTER)
+
+
+# Day offset bounds, period and first bit of the week, month and quarter regions of a bitmap
+BIT_NUM_REGIONS = [
+    (MAX_DAY_OFFSET, MAX_WEEK_OFFSET, WEEK, WEEK_BIT_OFFSET),
+    (MAX_WEEK_OFFSET, MAX_MONTH_OFFSET, MONTH, MONTH_BIT_OFFSET),
+    (MAX_MONTH_OFFSET, MAX_QUARTER_OFFSET, QUARTER, QUARTER_BIT_OFFSET),
+]
+
+# Indexed by the one indexed bit number, index zero is unused
+BIT_NUM_OFFSETS = [None] + [_bit_num_offset(n) for n in range(1, MAX_BIT_NUM + 1)]
+
+
+def get_reference_time(blockTime):
+    require(blockTime >= QUARTER)
+    return blockTime - blockTime % QUARTER
+
+
+def get_time_utc0(time):
+    require(time >= DAY)
+    return time - time % DAY
+
+
+def get_traded_market(index):
+    require(1 <= index <= MAX_TRADED_MARKET_INDEX, "Invalid index")
+    return TRADED_MARKETS[index - 1]
+
+
+def get_market_index(maxMarketIndex, maturity, blockTime):
+    # Returns (marketIndex, idiosyncratic)
+    require(0 < maxMarketIndex <= MAX_TRADED_MARKET_INDEX)
+    tRef = get_reference_time(blockTime)
+
+    for i in range(1, maxMarketIndex + 1):
+        marketMaturity = tRef + get_traded_market(i)
+        if marketMaturity == maturity:
+            return (i, False)
+        if marketMaturity > maturity:
+            return (i, True)
+
+    raise Revert()
+
+
+def is_valid_market_maturity(maxMarketIndex, maturity, blockTime):
+    require(maxMarketIndex > 0, "CG: no markets listed")
+    require(maxMarketIndex <= MAX_TRADED_MARKET_INDEX, "CG: market index bound")
+    if maturity % QUARTER != 0:
+        return False
+
+    tRef = get_reference_time(blockTime)
+    return any(maturity == tRef + get_traded_market(i) for i in range(1, maxMarketIndex + 1))
+
+
+def is_valid_maturity(maxMarketIndex, maturity, blockTime):
+    maxMaturity = get_reference_time(blockTime) + get_traded_market(maxMarketIndex)
+    if maturity > maxMaturity:
+        return False
+
+    (_, isValid) = get_bit_num_from_maturity(blockTime, maturity)
+    return isValid
+
+
+def get_bit_num_from_maturity(blockTime, maturity):
+    # Returns (bitNum, isExact) relative to blockTime
+    blockTimeUTC0 = get_time_utc0(blockTime)
+    if maturity % DAY != 0 or blockTimeUTC0 >= maturity:
+        return (0, False)
+
+    daysOffset = (maturity - blockTimeUTC0) // DAY
+    if daysOffset <= MAX_DAY_OFFSET:
+        return (daysOffset, True)
+
+    for (minOffset, maxOffset, period, bitOffset) in BIT_NUM_REGIONS:
+        if daysOffset <= maxOffset:
+            # Days past the previous region plus the offset into the current period
+            offsetInDays = daysOffset - minOffset + (blockTimeUTC0 % period) // DAY
+            daysInPeriod = period // DAY
+            return (bitOffset + offsetInDays // daysInPeriod, offsetInDays % daysInPeriod == 0)
+
+    # Beyond the 20 year max maturity
+    return (MAX_BIT_NUM, False)
+
+
+def get_maturity_from_bit_num(blockTime, bitNum):
+    require(bitNum != 0)
+    require(bitNum <= MAX_BIT_NUM)
+    blockTimeUTC0 = get_time_utc0(blockTime)
+    (period, offset) = BIT_NUM_OFFSETS[bitNum]
+    return blockTimeUTC0 - blockTimeUTC0 % period + offset
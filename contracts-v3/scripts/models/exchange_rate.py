@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+from scripts.models.solidity import PERCENTAGE_DECIMALS, div, mul, require
+
+# Python model of ExchangeRate
+
+ETH_CURRENCY_ID = 1
+ETH_DECIMALS = 10 ** 18
+MIN_BUFFER_SCALE = 150
+BUFFER_SCALE = 10
+
+# Field order matches the ETHRate struct so chain return values can be passed in directly
+ETHRate = namedtuple(
+    "ETHRate", ["rateDecimals", "rate", "buffer", "haircut", "liquidationDiscount"]
+)
+
+
+def build_exchange_rate(currencyId, rateStorage, answer):
+    # rateStorage is an ETHRateStorage tuple and answer the rate oracle's latestRoundData rate
+    (_, rateDecimalPlaces, mustInvert, buffer, haircut, liquidationDiscount) = rateStorage
+    if currencyId == ETH_CURRENCY_ID:
+        rateDecimals = ETH_DECIMALS
+        rate = ETH_DECIMALS
+    else:
+        require(answer > 0)
+        rateDecimals = 10 ** rateDecimalPlaces
+        rate = div(mul(rateDecimals, rateDecimals), answer) if mustInvert else answer
+
+    if buffer > MIN_BUFFER_SCALE:
+        buffer = (buffer - MIN_BUFFER_SCALE) * BUFFER_SCALE + MIN_BUFFER_SCALE
+
+    return ETHRate(rateDecimals, rate, buffer, haircut, liquidationDiscount)
+
+
+def convert_to_eth(er, balance):
+    multiplier = er.haircut if balance > 0 else er.buffer
+    result = div(div(mul(mul(balance, er.rate), multiplier), PERCENTAGE_DECIMALS), er.rateDecimals)
+    return min(result, -1) if balance < 0 else result
+
+
+def convert_eth_to(er, balance):
+    return div(mul(balance, er.rateDecimals), er.rate)
+
+
+def exchange_rate(baseER, quoteER):
+    return div(mul(baseER.rate, quoteER.rateDecimals), quoteER.rate)
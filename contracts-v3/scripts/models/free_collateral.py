@@ -0,0 +1,311 @@
+from collections import namedtuple
+
+import numpy as np
+
+from scripts.models.asset_handler import (
+    PortfolioAsset,
+    get_net_cash_group_value,
+    get_risk_adjusted_discount,
+)
+from scripts.models.cash_group import CashGroupParameters, pack_cash_group
+from scripts.models.exchange_rate import ETHRate, convert_to_eth
+from scripts.models.interest_rate_curve import MarketParameters
+from scripts.models.prime_rate import PrimeRate, convert_to_underlying
+from scripts.models.solidity import PERCENTAGE_DECIMALS, Revert, add, div, mul, require
+
+# Python model of FreeCollateral.getFreeCollateralView over a snapshot of protocol state at a
+# single block time. Currency state (cash group, exchange rate, oracle rates and nToken value) is
+# loaded once and shared by every account, risk adjusted discount factors are computed once per
+# currency, maturity and sign and reused across the whole account set. Usage:
+#
+#   snapshot = load_snapshot(notional, accounts)
+#   results = snapshot.get_free_collateral_batch(snapshot.accounts)
+#
+# nTokenPrimePV is taken from nTokenPresentValueAssetDenominated rather than recalculated.
+
+ACTIVE_IN_PORTFOLIO = 0x8000
+ACTIVE_IN_BALANCES = 0x4000
+UNMASK_FLAGS = 0x3FFF
+PV_HAIRCUT_PERCENTAGE = 3
+
+CurrencyState = namedtuple(
+    "CurrencyState",
+    [
+        "cashGroup",
+        "ethRate",
+        # Market maturity to oracle rate at the snapshot block time
+        "oracleRates",
+        "nTokenPrimePV",
+        "nTokenTotalSupply",
+        "nTokenParameters",
+    ],
+)
+
+# Cash balances map currency id to (cashBalance, nTokenBalance) where the cash balance is the
+# signed prime cash value at the snapshot block time, as returned by getAccount
+AccountState = namedtuple(
+    "AccountState", ["account", "bitmapCurrencyId", "activeCurrencies", "balances", "portfolio"]
+)
+
+# Field order matches the LiquidationFactors struct
+LiquidationFactors = namedtuple(
+    "LiquidationFactors",
+    [
+        "account",
+        "netETHValue",
+        "localPrimeAvailable",
+        "collateralAssetAvailable",
+        "nTokenHaircutPrimeValue",
+        "nTokenParameters",
+        "localETHRate",
+        "collateralETHRate",
+        "localPrimeRate",
+        "collateralCashGroup",
+        "isCalculation",
+    ],
+)
+
+
+def get_active_currencies(activeCurrencies):
+    # Splits the bytes18 active currencies into (currencyId, flags) pairs
+    if not isinstance(activeCurrencies, int):
+        activeCurrencies = int.from_bytes(bytes(activeCurrencies), "big")
+
+    currencies = []
+    for i in range(9):
+        currencyBytes = (activeCurrencies >> (8 * 16 - 16 * i)) & 0xFFFF
+        if currencyBytes == 0:
+            break
+        currencies.append((currencyBytes & UNMASK_FLAGS, currencyBytes))
+    return currencies
+
+
+class FreeCollateralSnapshot:
+    def __init__(self, currencies, blockTime, accounts=()):
+        # currencies maps currency id to CurrencyState
+        self.currencies = currencies
+        self.blockTime = blockTime
+        self.accounts = list(accounts)
+        self._discountFactors = {}
+
+    def discount_factor(self, currencyId, maturity, isPositive):
+        key = (currencyId, maturity, isPositive)
+        if key not in self._discountFactors:
+            currency = self.currencies[currencyId]
+            self._discountFactors[key] = get_risk_adjusted_discount(
+                currency.cashGroup,
+                1 if isPositive else -1,
+                maturity,
+                self.blockTime,
+                currency.oracleRates,
+            )
+        return self._discountFactors[key]
+
+    def get_ntoken_haircut_prime_pv(self, currencyId, tokenBalance):
+        currency = self.currencies[currencyId]
+        haircut = bytes(currency.nTokenParameters)[PV_HAIRCUT_PERCENTAGE]
+        return div(
+            div(mul(mul(tokenBalance, currency.nTokenPrimePV), haircut), PERCENTAGE_DECIMALS),
+            currency.nTokenTotalSupply,
+        )
+
+    def get_net_cash_group_value(self, assets, currencyId, portfolioIndex):
+        currency = self.currencies[currencyId]
+        return get_net_cash_group_value(
+            assets,
+            currency.cashGroup,
+            self.blockTime,
+            portfolioIndex,
+            currency.oracleRates,
+            lambda maturity, isPositive: self.discount_factor(currencyId, maturity, isPositive),
+        )
+
+    def _net_eth_value(self, currencyId, netLocalAssetValue):
+        currency = self.currencies[currencyId]
+        return convert_to_eth(
+            currency.ethRate,
+            convert_to_underlying(currency.cashGroup.primeRate, netLocalAssetValue),
+        )
+
+    def get_currency_values(self, account):
+        # Returns (currencyId, netLocalAssetValue, nTokenHaircutPrimeValue, hasCashGroup) for each
+        # currency in the order that getFreeCollateralView values them
+        values = []
+        portfolio = [PortfolioAsset(*a) for a in account.portfolio]
+
+        if account.bitmapCurrencyId != 0:
+            currencyId = account.bitmapCurrencyId
+            (cashBalance, nTokenBalance) = account.balances.get(currencyId, (0, 0))
+            nTokenValue = 0
+            if nTokenBalance > 0:
+                nTokenValue = self.get_ntoken_haircut_prime_pv(currencyId, nTokenBalance)
+            (portfolioValue, _) = self.get_net_cash_group_value(portfolio, currencyId, 0)
+
+            netLocal = add(add(cashBalance, nTokenValue), portfolioValue)
+            values.append((currencyId, netLocal, nTokenValue, True))
+            portfolio = []
+
+        portfolioIndex = 0
+        for (currencyId, currencyBytes) in get_active_currencies(account.activeCurrencies):
+            require(currencyId != account.bitmapCurrencyId)
+            (netLocal, nTokenBalance) = (0, 0)
+            if currencyBytes & ACTIVE_IN_BALANCES:
+                (netLocal, nTokenBalance) = account.balances.get(currencyId, (0, 0))
+
+            nTokenValue = 0
+            hasCashGroup = currencyBytes & ACTIVE_IN_PORTFOLIO != 0 or nTokenBalance > 0
+            if hasCashGroup:
+                portfolioValue = 0
+                if (
+                    portfolioIndex < len(portfolio)
+                    and portfolio[portfolioIndex].currencyId == currencyId
+                ):
+                    (portfolioValue, portfolioIndex) = self.get_net_cash_group_value(
+                        portfolio, currencyId, portfolioIndex
+                    )
+
+                if nTokenBalance > 0:
+                    nTokenValue = self.get_ntoken_haircut_prime_pv(currencyId, nTokenBalance)
+                netLocal = add(add(netLocal, portfolioValue), nTokenValue)
+
+            values.append((currencyId, netLocal, nTokenValue, hasCashGroup))
+
+        return values
+
+    def get_free_collateral(self, account):
+        # Returns (netETHValue, netLocalAssetValues) like getFreeCollateralView
+        netETHValue = 0
+        netLocalAssetValues = []
+        for (currencyId, netLocal, _, _) in self.get_currency_values(account):
+            netLocalAssetValues.append(netLocal)
+            netETHValue = add(netETHValue, self._net_eth_value(currencyId, netLocal))
+
+        return (netETHValue, netLocalAssetValues)
+
+    def get_liquidation_factors(self, account, localCurrencyId, collateralCurrencyId=0):
+        # Mirrors FreeCollateral.getLiquidationFactors, collateralCurrencyId is zero for local
+        # currency liquidations
+        netETHValue = 0
+        localPrimeAvailable = 0
+        collateralAssetAvailable = 0
+        nTokenHaircutPrimeValue = 0
+        nTokenParameters = bytes(6)
+        (localETHRate, collateralETHRate, localPrimeRate) = (None, None, None)
+        collateralCashGroup = None
+
+        for (currencyId, netLocal, nTokenValue, hasCashGroup) in self.get_currency_values(
+            account
+        ):
+            currency = self.currencies[currencyId]
+            netETHValue = add(netETHValue, self._net_eth_value(currencyId, netLocal))
+            isBitmap = currencyId == account.bitmapCurrencyId
+
+            setLiquidationFactors = (
+                currencyId == localCurrencyId and collateralCurrencyId == 0
+            ) or (currencyId == collateralCurrencyId and not isBitmap)
+            if setLiquidationFactors and hasCashGroup:
+                collateralCashGroup = currency.cashGroup
+                nTokenHaircutPrimeValue = nTokenValue
+                nTokenParameters = currency.nTokenParameters
+
+            if currencyId == collateralCurrencyId and not isBitmap:
+                if collateralCashGroup is None:
+                    # Only the prime rate is set when the cash group is not loaded
+                    collateralCashGroup = CashGroupParameters(
+                        0, 0, currency.cashGroup.primeRate, 0
+                    )
+                collateralAssetAvailable = netLocal
+                collateralETHRate = currency.ethRate
+            elif currencyId == localCurrencyId:
+                localPrimeAvailable = netLocal
+                localETHRate = currency.ethRate
+                localPrimeRate = currency.cashGroup.primeRate
+
+        require(netETHValue < 0, "Sufficient collateral")
+        return LiquidationFactors(
+            account.account,
+            netETHValue,
+            localPrimeAvailable,
+            collateralAssetAvailable,
+            nTokenHaircutPrimeValue,
+            nTokenParameters,
+            localETHRate,
+            collateralETHRate,
+            localPrimeRate,
+            collateralCashGroup,
+            False,
+        )
+
+    def get_free_collateral_batch(self, accounts):
+        # Accounts that revert on chain are flagged in "reverted" with a zero net ETH value
+        netETHValue = np.zeros(len(accounts), dtype=object)
+        reverted = np.zeros(len(accounts), dtype=bool)
+        for (i, account) in enumerate(accounts):
+            try:
+                (netETHValue[i], _) = self.get_free_collateral(account)
+            except Revert:
+                reverted[i] = True
+
+        return {
+            "account": np.array([a.account for a in accounts], dtype=object),
+            "netETHValue": netETHValue,
+            "reverted": reverted,
+        }
+
+
+def load_cash_group(notional, currencyId, blockTime):
+    settings = notional.getCashGroup(currencyId)
+    (primeRate, *_) = notional.getPrimeFactors(currencyId, blockTime)
+    return CashGroupParameters(
+        currencyId, settings[0], PrimeRate(*primeRate), pack_cash_group(settings)
+    )
+
+
+def load_currency_state(notional, currencyId, blockTime):
+    cashGroup = load_cash_group(notional, currencyId, blockTime)
+    (_, _, ethRate, _) = notional.getCurrencyAndRates(currencyId)
+    markets = [
+        MarketParameters(*m) for m in notional.getActiveMarketsAtBlockTime(currencyId, blockTime)
+    ]
+
+    (nTokenPrimePV, totalSupply, parameters) = (0, 1, bytes(6))
+    nTokenAddress = notional.nTokenAddress(currencyId)
+    if int(nTokenAddress, 16) != 0:
+        (_, totalSupply, _, _, parameters, *_) = notional.getNTokenAccount(nTokenAddress)
+        nTokenPrimePV = notional.nTokenPresentValueAssetDenominated(currencyId)
+
+    return CurrencyState(
+        cashGroup,
+        ETHRate(*ethRate),
+        {m.maturity: m.oracleRate for m in markets},
+        nTokenPrimePV,
+        totalSupply,
+        bytes(parameters),
+    )
+
+
+def load_account_state(notional, account):
+    (context, balances, portfolio) = notional.getAccount(account)
+    return AccountState(
+        str(account),
+        context[3],
+        context[4],
+        {b[0]: (b[1], b[2]) for b in balances if b[0] != 0},
+        [PortfolioAsset(*a) for a in portfolio],
+    )
+
+
+def load_snapshot(notional, accounts, blockTime=None):
+    # Reads every listed currency and the given accounts at the latest block
+    from brownie import chain
+
+    if blockTime is None:
+        blockTime = chain[-1].timestamp
+
+    currencies = {
+        currencyId: load_currency_state(notional, currencyId, blockTime)
+        for currencyId in range(1, notional.getMaxCurrencyId() + 1)
+    }
+    return FreeCollateralSnapshot(
+        currencies, blockTime, [load_account_state(notional, a) for a in accounts]
+    )
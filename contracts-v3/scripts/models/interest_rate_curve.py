@@ -0,0 +1,370 @@
+from collections import namedtuple
+
+from scripts.models import abdk_math
+from scripts.models.cash_group import get_reserve_fee_share
+from scripts.models.prime_rate import convert_from_underlying, convert_to_underlying
+from scripts.models.solidity import (
+    BASIS_POINT,
+    PERCENTAGE_DECIMALS,
+    RATE_PRECISION,
+    Revert,
+    add,
+    div,
+    div_in_rate_precision,
+    mul,
+    mul_in_rate_precision,
+    neg,
+    require,
+    sub,
+    sub_no_neg,
+    to_uint,
+    uadd,
+    udiv,
+    udiv_in_rate_precision,
+    umul,
+    usub,
+)
+
+# Bit exact python model of InterestRateCurve. Functions raise Revert wherever the library
+# reverts, so results can be compared one to one against MockInterestRateCurve and MockMarket
+# in tests/internal/markets/test_interest_rate_curve_model.py. The model does not read storage,
+# interest rate parameters are passed in rather than loaded by currency and market index.
+
+YEAR = 86400 * 6 * 5 * 3 * 4
+FIVE_BASIS_POINTS = 5 * BASIS_POINT
+TWENTY_FIVE_BASIS_POINTS = 25 * BASIS_POINT
+ONE_HUNDRED_FIFTY_BASIS_POINTS = 150 * BASIS_POINT
+MAX_LOWER_INCREMENT = 150
+MAX_LOWER_INCREMENT_VALUE = 150 * 25 * BASIS_POINT
+RATE_PRECISION_64x64 = 0x3B9ACA000000000000000000
+SECANT_ITERATIONS = 250
+
+# Field order matches the InterestRateParameters struct
+InterestRateParameters = namedtuple(
+    "InterestRateParameters",
+    [
+        "kinkUtilization1",
+        "kinkUtilization2",
+        "kinkRate1",
+        "kinkRate2",
+        "maxRate",
+        "minFeeRate",
+        "maxFeeRate",
+        "feeRatePercent",
+    ],
+)
+MarketParameters = namedtuple(
+    "MarketParameters",
+    [
+        "storageSlot",
+        "maturity",
+        "totalfCash",
+        "totalPrimeCash",
+        "totalLiquidity",
+        "lastImpliedRate",
+        "oracleRate",
+        "previousTradeTime",
+    ],
+)
+
+
+def calculate_max_rate(maxRateByte):
+    if MAX_LOWER_INCREMENT < maxRateByte:
+        return (
+            MAX_LOWER_INCREMENT_VALUE
+            + (maxRateByte - MAX_LOWER_INCREMENT) * ONE_HUNDRED_FIFTY_BASIS_POINTS
+        )
+    return maxRateByte * TWENTY_FIVE_BASIS_POINTS
+
+
+def unpack_interest_rate_params(offset, data):
+    if isinstance(data, int):
+        data = data.to_bytes(32, "big")
+    data = bytes(data)
+
+    maxRate = calculate_max_rate(data[offset + 2])
+    return InterestRateParameters(
+        kinkUtilization1=data[offset] * RATE_PRECISION // PERCENTAGE_DECIMALS,
+        kinkUtilization2=data[offset + 1] * RATE_PRECISION // PERCENTAGE_DECIMALS,
+        kinkRate1=data[offset + 3] * maxRate // 256,
+        kinkRate2=data[offset + 4] * maxRate // 256,
+        maxRate=maxRate,
+        minFeeRate=data[offset + 5] * FIVE_BASIS_POINTS,
+        maxFeeRate=data[offset + 6] * TWENTY_FIVE_BASIS_POINTS,
+        feeRatePercent=data[offset + 7],
+    )
+
+
+def pack_interest_rate_params(settings):
+    # settings is an InterestRateCurveSettings tuple, as returned by get_interest_rate_curve
+    (kinkUtil1, kinkUtil2, kinkRate1, kinkRate2, maxRate, minFee, maxFee, feePercent) = settings
+    require(kinkUtil1 < kinkUtil2)
+    require(kinkUtil2 <= 100)
+    require(kinkRate1 < kinkRate2)
+    require(minFee * FIVE_BASIS_POINTS <= maxFee * TWENTY_FIVE_BASIS_POINTS)
+    require(feePercent < 100)
+
+    # Max rate is packed ahead of the kink rates
+    packed = [kinkUtil1, kinkUtil2, maxRate, kinkRate1, kinkRate2, minFee, maxFee, feePercent]
+    return int.from_bytes(bytes(packed), "big")
+
+
+def from_curve_settings(settings):
+    return unpack_interest_rate_params(0, pack_interest_rate_params(settings) << 192)
+
+
+def get_fcash_utilization(fCashToAccount, totalfCash, totalCashUnderlying):
+    require(totalfCash >= 0)
+    require(totalCashUnderlying >= 0)
+    return to_uint(
+        div_in_rate_precision(
+            sub_no_neg(totalfCash, fCashToAccount), add(totalCashUnderlying, totalfCash)
+        )
+    )
+
+
+def get_interest_rate(irParams, utilization):
+    require(irParams.maxRate > 0)
+    require(utilization <= RATE_PRECISION)
+
+    if utilization <= irParams.kinkUtilization1:
+        return udiv(umul(utilization, irParams.kinkRate1), irParams.kinkUtilization1)
+    elif utilization <= irParams.kinkUtilization2:
+        return (
+            udiv(
+                umul(
+                    utilization - irParams.kinkUtilization1,
+                    irParams.kinkRate2 - irParams.kinkRate1,
+                ),
+                irParams.kinkUtilization2 - irParams.kinkUtilization1,
+            )
+            + irParams.kinkRate1
+        )
+    else:
+        return (
+            udiv(
+                umul(
+                    utilization - irParams.kinkUtilization2,
+                    irParams.maxRate - irParams.kinkRate2,
+                ),
+                RATE_PRECISION - irParams.kinkUtilization2,
+            )
+            + irParams.kinkRate2
+        )
+
+
+def get_utilization_from_interest_rate(irParams, interestRate):
+    require(irParams.maxRate > 0)
+
+    if interestRate <= irParams.kinkRate1:
+        return udiv(umul(interestRate, irParams.kinkUtilization1), irParams.kinkRate1)
+    elif interestRate <= irParams.kinkRate2:
+        return (
+            udiv(
+                umul(
+                    interestRate - irParams.kinkRate1,
+                    irParams.kinkUtilization2 - irParams.kinkUtilization1,
+                ),
+                irParams.kinkRate2 - irParams.kinkRate1,
+            )
+            + irParams.kinkUtilization1
+        )
+    else:
+        return (
+            udiv(
+                umul(interestRate - irParams.kinkRate2, RATE_PRECISION - irParams.kinkUtilization2),
+                irParams.maxRate - irParams.kinkRate2,
+            )
+            + irParams.kinkUtilization2
+        )
+
+
+def get_post_fee_interest_rate(irParams, preFeeInterestRate, isBorrow):
+    feeRate = udiv(umul(preFeeInterestRate, irParams.feeRatePercent), PERCENTAGE_DECIMALS)
+    feeRate = max(feeRate, irParams.minFeeRate)
+    feeRate = min(feeRate, irParams.maxFeeRate)
+
+    if isBorrow:
+        return preFeeInterestRate + feeRate
+    return 0 if feeRate > preFeeInterestRate else preFeeInterestRate - feeRate
+
+
+def get_fcash_exchange_rate(interestRate, timeToMaturity):
+    expValue = abdk_math.from_uint(udiv(umul(interestRate, timeToMaturity), YEAR))
+    expValueScaled = abdk_math.div(expValue, RATE_PRECISION_64x64)
+    expResult = abdk_math.exp(expValueScaled)
+    expResultScaled = abdk_math.mul(expResult, RATE_PRECISION_64x64)
+
+    return abdk_math.to_int(expResultScaled)
+
+
+def update_rate_oracle(
+    lastUpdateTime, lastInterestRate, oracleRate, rateOracleTimeWindow, blockTime
+):
+    require(rateOracleTimeWindow > 0)
+    if lastUpdateTime > blockTime:
+        return lastInterestRate
+
+    timeDiff = usub(blockTime, lastUpdateTime)
+    if timeDiff > rateOracleTimeWindow:
+        return lastInterestRate
+
+    lastTradeWeight = udiv_in_rate_precision(timeDiff, rateOracleTimeWindow)
+    oracleWeight = usub(RATE_PRECISION, lastTradeWeight)
+    return udiv(
+        uadd(umul(lastInterestRate, lastTradeWeight), umul(oracleRate, oracleWeight)),
+        RATE_PRECISION,
+    )
+
+
+def _get_net_cash_amounts_underlying(
+    irParams, market, reserveFeeShare, totalCashUnderlying, fCashToAccount, timeToMaturity
+):
+    utilization = get_fcash_utilization(fCashToAccount, market.totalfCash, totalCashUnderlying)
+    if utilization > RATE_PRECISION:
+        return (0, 0, 0, 0)
+    preFeeInterestRate = get_interest_rate(irParams, utilization)
+
+    preFeeCashToAccount = neg(
+        div_in_rate_precision(
+            fCashToAccount, get_fcash_exchange_rate(preFeeInterestRate, timeToMaturity)
+        )
+    )
+    postFeeInterestRate = get_post_fee_interest_rate(
+        irParams, preFeeInterestRate, fCashToAccount < 0
+    )
+    postFeeCashToAccount = neg(
+        div_in_rate_precision(
+            fCashToAccount, get_fcash_exchange_rate(postFeeInterestRate, timeToMaturity)
+        )
+    )
+
+    require(postFeeCashToAccount <= preFeeCashToAccount)
+    fee = sub(preFeeCashToAccount, postFeeCashToAccount)
+    cashToReserve = div(mul(fee, reserveFeeShare), PERCENTAGE_DECIMALS)
+    netUnderlyingToMarket = neg(add(postFeeCashToAccount, cashToReserve))
+
+    return (postFeeCashToAccount, netUnderlyingToMarket, cashToReserve, postFeeInterestRate)
+
+
+def calculate_fcash_trade(
+    market, cashGroup, irParams, fCashToAccount, timeToMaturity, marketIndex, blockTime
+):
+    # Returns (newMarket, netPrimeCashToAccount, primeCashToReserve, postFeeInterestRate). The
+    # library updates the market in memory, here the updated market is returned instead and is
+    # the unchanged market when the trade fails.
+    require(marketIndex > 0)
+    if market.totalfCash <= fCashToAccount:
+        return (market, 0, 0, 0)
+
+    totalCashUnderlying = convert_to_underlying(cashGroup.primeRate, market.totalPrimeCash)
+    (
+        netUnderlyingToAccount,
+        netUnderlyingToMarket,
+        netUnderlyingToReserve,
+        postFeeInterestRate,
+    ) = _get_net_cash_amounts_underlying(
+        irParams,
+        market,
+        get_reserve_fee_share(cashGroup),
+        totalCashUnderlying,
+        fCashToAccount,
+        timeToMaturity,
+    )
+    if netUnderlyingToAccount == 0:
+        return (market, 0, 0, 0)
+
+    totalfCash = sub_no_neg(market.totalfCash, fCashToAccount)
+    totalCashUnderlying = add(totalCashUnderlying, netUnderlyingToMarket)
+    utilization = get_fcash_utilization(0, totalfCash, totalCashUnderlying)
+    if utilization > RATE_PRECISION:
+        return (market, 0, 0, 0)
+
+    newPreFeeImpliedRate = get_interest_rate(irParams, utilization)
+    if newPreFeeImpliedRate == 0:
+        return (market, 0, 0, 0)
+
+    netPrimeCashToMarket = convert_from_underlying(cashGroup.primeRate, netUnderlyingToMarket)
+    newMarket = market._replace(
+        totalfCash=totalfCash,
+        totalPrimeCash=add(market.totalPrimeCash, netPrimeCashToMarket),
+        lastImpliedRate=newPreFeeImpliedRate,
+        previousTradeTime=blockTime,
+    )
+    primeCashToReserve = convert_from_underlying(cashGroup.primeRate, netUnderlyingToReserve)
+    netPrimeCashToAccount = convert_from_underlying(cashGroup.primeRate, netUnderlyingToAccount)
+
+    return (newMarket, netPrimeCashToAccount, primeCashToReserve, postFeeInterestRate)
+
+
+def _calculate_post_fee_exchange_rate(
+    irParams, totalfCash, totalCashUnderlying, timeToMaturity, fCashToAccount
+):
+    preFeeInterestRate = get_interest_rate(
+        irParams, get_fcash_utilization(fCashToAccount, totalfCash, totalCashUnderlying)
+    )
+    postFeeInterestRate = get_post_fee_interest_rate(
+        irParams, preFeeInterestRate, fCashToAccount < 0
+    )
+    return get_fcash_exchange_rate(postFeeInterestRate, timeToMaturity)
+
+
+def _calculate_diff(
+    irParams,
+    totalfCash,
+    totalCashUnderlying,
+    fCashToAccount,
+    timeToMaturity,
+    netUnderlyingToAccount,
+):
+    exchangeRate = _calculate_post_fee_exchange_rate(
+        irParams, totalfCash, totalCashUnderlying, timeToMaturity, fCashToAccount
+    )
+    return add(fCashToAccount, mul_in_rate_precision(netUnderlyingToAccount, exchangeRate))
+
+
+def get_fcash_given_cash_amount(
+    irParams, totalfCash, netUnderlyingToAccount, totalCashUnderlying, timeToMaturity
+):
+    require(netUnderlyingToAccount != 0)
+    require(netUnderlyingToAccount <= totalCashUnderlying, "Over Market Limit")
+
+    currentfCashExchangeRate = _calculate_post_fee_exchange_rate(
+        irParams,
+        totalfCash,
+        totalCashUnderlying,
+        timeToMaturity,
+        -1 if netUnderlyingToAccount > 0 else 1,
+    )
+    if netUnderlyingToAccount < 0:
+        fCash_0 = neg(netUnderlyingToAccount)
+        fCash_1 = neg(mul_in_rate_precision(netUnderlyingToAccount, currentfCashExchangeRate))
+    else:
+        fCash_0 = neg(mul_in_rate_precision(netUnderlyingToAccount, currentfCashExchangeRate))
+        fCash_1 = neg(
+            mul_in_rate_precision(
+                netUnderlyingToAccount, get_fcash_exchange_rate(irParams.maxRate, timeToMaturity)
+            )
+        )
+
+    diff_0 = _calculate_diff(
+        irParams, totalfCash, totalCashUnderlying, fCash_0, timeToMaturity, netUnderlyingToAccount
+    )
+    for _ in range(SECANT_ITERATIONS):
+        # Unchecked subtraction in the library, the operands are bounded well within int256
+        fCashDelta = fCash_1 - fCash_0
+        if fCashDelta == 0:
+            return fCash_1
+        diff_1 = _calculate_diff(
+            irParams,
+            totalfCash,
+            totalCashUnderlying,
+            fCash_1,
+            timeToMaturity,
+            netUnderlyingToAccount,
+        )
+        fCash_n = sub(fCash_1, div(mul(diff_1, fCashDelta), sub(diff_1, diff_0)))
+        (fCash_1, fCash_0) = (fCash_n, fCash_1)
+        diff_0 = diff_1
+
+    raise Revert("No convergence")
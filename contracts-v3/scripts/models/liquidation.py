@@ -0,0 +1,215 @@
+from scripts.models.exchange_rate import convert_eth_to, exchange_rate
+from scripts.models.prime_rate import convert_from_underlying, convert_to_underlying
+from scripts.models.solidity import (
+    PERCENTAGE_DECIMALS,
+    div,
+    mul,
+    neg,
+    require,
+    sub,
+    sub_no_neg,
+)
+
+# Python model of LiquidationHelpers and the LiquidateCurrency calculations. Takes the
+# LiquidationFactors returned by FreeCollateralSnapshot.get_liquidation_factors along with the
+# liquidated account's stored balances in the relevant currency.
+
+DEFAULT_LIQUIDATION_PORTION = 40
+LIQUIDATION_HAIRCUT_PERCENTAGE = 0
+PV_HAIRCUT_PERCENTAGE = 3
+
+
+def calculate_liquidation_amount(liquidateAmountRequired, maxTotalBalance, userSpecifiedMaximum):
+    defaultAllowedAmount = div(
+        mul(maxTotalBalance, DEFAULT_LIQUIDATION_PORTION), PERCENTAGE_DECIMALS
+    )
+
+    result = liquidateAmountRequired
+    if liquidateAmountRequired > maxTotalBalance:
+        result = maxTotalBalance
+
+    if liquidateAmountRequired < defaultAllowedAmount:
+        result = defaultAllowedAmount
+
+    if userSpecifiedMaximum > 0 and result > userSpecifiedMaximum:
+        result = userSpecifiedMaximum
+
+    return result
+
+
+def calculate_local_liquidation_underlying_required(localPrimeAvailable, netETHValue, localETHRate):
+    multiple = localETHRate.haircut if localPrimeAvailable > 0 else localETHRate.buffer
+    # dev: cannot liquidate haircut asset
+    require(multiple > 0)
+
+    return div(mul(convert_eth_to(localETHRate, neg(netETHValue)), PERCENTAGE_DECIMALS), multiple)
+
+
+def calculate_cross_currency_factors(factors):
+    collateralDenominatedFC = convert_from_underlying(
+        factors.collateralCashGroup.primeRate,
+        convert_eth_to(factors.collateralETHRate, neg(factors.netETHValue)),
+    )
+    liquidationDiscount = max(
+        factors.collateralETHRate.liquidationDiscount, factors.localETHRate.liquidationDiscount
+    )
+
+    return (collateralDenominatedFC, liquidationDiscount)
+
+
+def calculate_local_to_purchase(
+    factors, liquidationDiscount, collateralUnderlyingPresentValue, collateralBalanceToSell
+):
+    localUnderlyingFromLiquidator = div(
+        div(
+            mul(
+                mul(collateralUnderlyingPresentValue, PERCENTAGE_DECIMALS),
+                factors.localETHRate.rateDecimals,
+            ),
+            exchange_rate(factors.localETHRate, factors.collateralETHRate),
+        ),
+        liquidationDiscount,
+    )
+
+    localAssetFromLiquidator = convert_from_underlying(
+        factors.localPrimeRate, localUnderlyingFromLiquidator
+    )
+    maxLocalAsset = neg(factors.localPrimeAvailable)
+
+    if localAssetFromLiquidator > maxLocalAsset:
+        collateralBalanceToSell = div(
+            mul(collateralBalanceToSell, maxLocalAsset), localAssetFromLiquidator
+        )
+        localAssetFromLiquidator = maxLocalAsset
+
+    return (collateralBalanceToSell, localAssetFromLiquidator)
+
+
+def _get_ntoken_haircuts(factors):
+    params = bytes(factors.nTokenParameters)
+    return (params[LIQUIDATION_HAIRCUT_PERCENTAGE], params[PV_HAIRCUT_PERCENTAGE])
+
+
+def calculate_local_currency_liquidation(factors, nTokenBalance, maxNTokenLiquidation=0):
+    # Returns (localPrimeCashFromLiquidator, nTokensToLiquidator) like
+    # calculateLocalCurrencyLiquidation
+    require(factors.localPrimeAvailable != 0)
+    primeBenefitRequired = convert_from_underlying(
+        factors.localPrimeRate,
+        calculate_local_liquidation_underlying_required(
+            factors.localPrimeAvailable, factors.netETHValue, factors.localETHRate
+        ),
+    )
+
+    (netPrimeCashFromLiquidator, nTokensToLiquidate) = (0, 0)
+    if factors.nTokenHaircutPrimeValue > 0:
+        (liquidationHaircut, pvHaircut) = _get_ntoken_haircuts(factors)
+        # dev: haircut percentage underflow
+        require(liquidationHaircut > pvHaircut)
+        nTokensToLiquidate = div(
+            mul(mul(primeBenefitRequired, nTokenBalance), pvHaircut),
+            mul(factors.nTokenHaircutPrimeValue, liquidationHaircut - pvHaircut),
+        )
+        nTokensToLiquidate = calculate_liquidation_amount(
+            nTokensToLiquidate, nTokenBalance, maxNTokenLiquidation
+        )
+
+        netPrimeCashFromLiquidator = div(
+            div(
+                mul(mul(nTokensToLiquidate, liquidationHaircut), factors.nTokenHaircutPrimeValue),
+                pvHaircut,
+            ),
+            nTokenBalance,
+        )
+
+    return (netPrimeCashFromLiquidator, nTokensToLiquidate)
+
+
+def _calculate_collateral_to_raise(factors, maxCollateralLiquidation):
+    (collateralDenominatedFC, liquidationDiscount) = calculate_cross_currency_factors(factors)
+
+    denominator = sub(
+        div(mul(factors.localETHRate.buffer, PERCENTAGE_DECIMALS), liquidationDiscount),
+        factors.collateralETHRate.haircut,
+    )
+    # dev: negative denominator
+    require(denominator > 0)
+
+    requiredCollateralPrimeCash = div(
+        mul(collateralDenominatedFC, PERCENTAGE_DECIMALS), denominator
+    )
+    requiredCollateralPrimeCash = calculate_liquidation_amount(
+        requiredCollateralPrimeCash, factors.collateralAssetAvailable, maxCollateralLiquidation
+    )
+    collateralUnderlyingPresentValue = convert_to_underlying(
+        factors.collateralCashGroup.primeRate, requiredCollateralPrimeCash
+    )
+
+    return calculate_local_to_purchase(
+        factors, liquidationDiscount, collateralUnderlyingPresentValue, requiredCollateralPrimeCash
+    )
+
+
+def _calculate_collateral_ntoken_transfer(
+    factors, nTokenBalance, collateralPrimeRemaining, maxNTokenLiquidation
+):
+    (liquidationHaircut, pvHaircut) = _get_ntoken_haircuts(factors)
+    nTokensToLiquidate = div(
+        mul(mul(collateralPrimeRemaining, nTokenBalance), pvHaircut),
+        mul(factors.nTokenHaircutPrimeValue, liquidationHaircut),
+    )
+
+    if maxNTokenLiquidation > 0 and nTokensToLiquidate > maxNTokenLiquidation:
+        nTokensToLiquidate = maxNTokenLiquidation
+
+    if nTokensToLiquidate > nTokenBalance:
+        nTokensToLiquidate = nTokenBalance
+
+    collateralPrimeRemaining = sub_no_neg(
+        collateralPrimeRemaining,
+        div(
+            div(
+                mul(mul(nTokensToLiquidate, factors.nTokenHaircutPrimeValue), liquidationHaircut),
+                pvHaircut,
+            ),
+            nTokenBalance,
+        ),
+    )
+
+    return (collateralPrimeRemaining, nTokensToLiquidate)
+
+
+def calculate_collateral_currency_liquidation(
+    factors, cashBalance, nTokenBalance, maxCollateralLiquidation=0, maxNTokenLiquidation=0
+):
+    # Returns (localPrimeCashFromLiquidator, collateralPrimeCash, collateralNTokens) like
+    # calculateCollateralCurrencyLiquidation, cashBalance and nTokenBalance are the stored
+    # collateral currency balances of the liquidated account
+    require(factors.localPrimeAvailable < 0, "No local debt")
+    require(factors.collateralAssetAvailable > 0, "No collateral")
+
+    (requiredCollateralPrimeCash, localPrimeCashFromLiquidator) = _calculate_collateral_to_raise(
+        factors, maxCollateralLiquidation
+    )
+
+    netCashChange = 0
+    nTokensToLiquidate = 0
+    collateralPrimeRemaining = requiredCollateralPrimeCash
+    if cashBalance > 0:
+        if cashBalance >= collateralPrimeRemaining:
+            netCashChange = neg(collateralPrimeRemaining)
+            collateralPrimeRemaining = 0
+        else:
+            netCashChange = neg(cashBalance)
+            collateralPrimeRemaining = sub_no_neg(collateralPrimeRemaining, cashBalance)
+
+    if collateralPrimeRemaining > 0 and factors.nTokenHaircutPrimeValue > 0:
+        (collateralPrimeRemaining, nTokensToLiquidate) = _calculate_collateral_ntoken_transfer(
+            factors, nTokenBalance, collateralPrimeRemaining, maxNTokenLiquidation
+        )
+
+    if collateralPrimeRemaining > 0:
+        # Remaining collateral is left on the account as a prime cash debt
+        netCashChange = sub(netCashChange, collateralPrimeRemaining)
+
+    return (localPrimeCashFromLiquidator, neg(netCashChange), nTokensToLiquidate)
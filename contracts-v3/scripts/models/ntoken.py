@@ -0,0 +1,313 @@
+from collections import namedtuple
+
+import numpy as np
+
+from scripts.models.asset_handler import (
+    PortfolioAsset,
+    get_cash_claims,
+    get_present_fcash_value,
+    get_risk_adjusted_present_fcash_value,
+)
+from scripts.models.cash_group import (
+    build_cash_group,
+    calculate_oracle_rate,
+    get_rate_oracle_time_window,
+)
+from scripts.models.date_time import (
+    MAX_TRADED_MARKET_INDEX,
+    QUARTER,
+    get_bit_num_from_maturity,
+    get_maturity_from_bit_num,
+    get_reference_time,
+    get_traded_market,
+)
+from scripts.models.interest_rate_curve import MarketParameters, update_rate_oracle
+from scripts.models.prime_rate import convert_from_underlying
+from scripts.models.solidity import Revert, add, div, mul, require
+
+# Python model of nTokenCalculations. An nToken is valued from its loaded portfolio and the stored
+# market states for its current settlement date, so PV and redemption amounts can be computed at
+# any number of block times without a chain. Usage:
+#
+#   nToken = load_ntoken(notional, currencyId)
+#   pv = get_ntoken_prime_pv(nToken, blockTime)
+#   values = project_ntoken_values(nToken, blockTimes, nTokensToRedeem=100e8)
+#
+# ifCash assets are held by maturity rather than as a bitmap, the idiosyncratic residuals are the
+# maturities that getNTokenifCashBits would leave set.
+
+# Field order matches the nTokenPortfolio struct with the portfolio state replaced by its stored
+# liquidity tokens, followed by the storage the calculations read
+NTokenPortfolio = namedtuple(
+    "NTokenPortfolio",
+    [
+        "cashGroup",
+        "liquidityTokens",
+        "totalSupply",
+        "cashBalance",
+        "lastInitializedTime",
+        "parameters",
+        "tokenAddress",
+        # Maturity to ifCash notional held by the nToken
+        "ifCash",
+        # Maturity to stored MarketParameters at the nToken's next settle time
+        "markets",
+    ],
+)
+
+
+def build_ntoken(nToken, ifCashAssets, markets):
+    # Converts an nTokenPortfolio tuple returned from a contract call, ifCashAssets are
+    # PortfolioAsset tuples and markets are stored (not oracle updated) MarketParameters
+    (cashGroup, portfolioState, totalSupply, cashBalance, *_) = nToken
+    (lastInitializedTime, parameters, tokenAddress) = nToken[4:]
+    return NTokenPortfolio(
+        build_cash_group(cashGroup),
+        [PortfolioAsset(*a) for a in portfolioState[0]],
+        totalSupply,
+        cashBalance,
+        lastInitializedTime,
+        bytes(parameters),
+        str(tokenAddress),
+        {a[1]: a[3] for a in ifCashAssets if a[3] != 0},
+        {m[1]: MarketParameters(*m) for m in markets},
+    )
+
+
+def load_ntoken(notional, currencyId, blockTime=None):
+    # Markets are read through getMarket, which updates the oracle rate to the latest block. The
+    # stored oracle rate is only used within the rate oracle time window of the last trade so
+    # values are exact at later block times once that window has passed.
+    from brownie import chain
+
+    from scripts.models.free_collateral import load_cash_group
+
+    if blockTime is None:
+        blockTime = chain[-1].timestamp
+
+    tokenAddress = notional.nTokenAddress(currencyId)
+    account = notional.getNTokenAccount(tokenAddress)
+    (liquidityTokens, ifCashAssets) = notional.getNTokenPortfolio(tokenAddress)
+    settlementDate = get_reference_time(account["lastInitializedTime"]) + QUARTER
+
+    return NTokenPortfolio(
+        load_cash_group(notional, currencyId, blockTime),
+        [PortfolioAsset(*a) for a in liquidityTokens],
+        account["totalSupply"],
+        account["cashBalance"],
+        account["lastInitializedTime"],
+        bytes(account["nTokenParameters"]),
+        str(tokenAddress),
+        {a[1]: a[3] for a in ifCashAssets if a[3] != 0},
+        {
+            a[1]: MarketParameters(*notional.getMarket(currencyId, a[1], settlementDate))
+            for a in liquidityTokens
+        },
+    )
+
+
+def get_next_settle_time(nToken):
+    if nToken.lastInitializedTime == 0:
+        return 0
+    return get_reference_time(nToken.lastInitializedTime) + QUARTER
+
+
+def load_market(nToken, marketIndex, blockTime):
+    # Mirrors CashGroup.loadMarket, markets past the nToken's settlement date are uninitialized
+    cashGroup = nToken.cashGroup
+    require(1 <= marketIndex <= cashGroup.maxMarketIndex, "Invalid market")
+    maturity = get_reference_time(blockTime) + get_traded_market(marketIndex)
+
+    market = MarketParameters(0, maturity, 0, 0, 0, 0, 0, 0)
+    if get_reference_time(blockTime) + QUARTER == get_next_settle_time(nToken):
+        market = nToken.markets.get(maturity, market)
+
+    return market._replace(
+        oracleRate=update_rate_oracle(
+            market.previousTradeTime,
+            market.lastImpliedRate,
+            market.oracleRate,
+            get_rate_oracle_time_window(cashGroup),
+            blockTime,
+        )
+    )
+
+
+def get_oracle_rates(nToken, blockTime):
+    # Market maturity to oracle rate at blockTime, as read by CashGroup.calculateOracleRate
+    markets = [
+        load_market(nToken, i, blockTime) for i in range(1, nToken.cashGroup.maxMarketIndex + 1)
+    ]
+    return {m.maturity: m.oracleRate for m in markets}
+
+
+def get_ntoken_ifcash_maturities(nToken, blockTime):
+    # Mirrors getNTokenifCashBits
+    maxMarketIndex = nToken.cashGroup.maxMarketIndex
+    if maxMarketIndex <= 2:
+        return []
+
+    tRef = get_reference_time(blockTime)
+    lastInitializedTime = nToken.lastInitializedTime
+    if tRef == lastInitializedTime:
+        # ACTIVE_MARKETS_MASK clears every traded market
+        activeMarkets = {
+            tRef + get_traded_market(i) for i in range(1, MAX_TRADED_MARKET_INDEX + 1)
+        }
+    else:
+        # Bits are cleared relative to lastInitializedTime, an active market that does not fall
+        # on an exact bit clears the maturity it rounds down to
+        activeMarkets = set()
+        for i in range(1, maxMarketIndex + 1):
+            (bitNum, _) = get_bit_num_from_maturity(
+                lastInitializedTime, tRef + get_traded_market(i)
+            )
+            activeMarkets.add(get_maturity_from_bit_num(lastInitializedTime, bitNum))
+
+    return sorted(m for m in nToken.ifCash.keys() if m not in activeMarkets)
+
+
+def get_ifcash_present_value(nToken, maturities, blockTime, riskAdjusted, oracleRates=None):
+    # Mirrors BitmapAssetsHandler.getNetPresentValueFromBitmap, returns underlying
+    if oracleRates is None:
+        oracleRates = get_oracle_rates(nToken, blockTime)
+
+    totalValueUnderlying = 0
+    for maturity in maturities:
+        notional = nToken.ifCash.get(maturity, 0)
+        if maturity <= blockTime:
+            pv = notional
+        elif riskAdjusted:
+            pv = get_risk_adjusted_present_fcash_value(
+                nToken.cashGroup, notional, maturity, blockTime, oracleRates
+            )
+        else:
+            oracleRate = calculate_oracle_rate(nToken.cashGroup, maturity, blockTime, oracleRates)
+            pv = get_present_fcash_value(notional, maturity, blockTime, oracleRate)
+        totalValueUnderlying = add(totalValueUnderlying, pv)
+
+    return totalValueUnderlying
+
+
+def get_ifcash_residual_prime_pv(nToken, blockTime):
+    maturities = get_ntoken_ifcash_maturities(nToken, blockTime)
+    if len(maturities) == 0:
+        return 0
+
+    return convert_from_underlying(
+        nToken.cashGroup.primeRate, get_ifcash_present_value(nToken, maturities, blockTime, False)
+    )
+
+
+def get_ntoken_market_value(nToken, blockTime, useOracleRate=True):
+    # Returns (totalPrimeValue, netfCash) like getNTokenMarketValue
+    totalPrimeValue = 0
+    netfCash = []
+    for (i, liquidityToken) in enumerate(nToken.liquidityTokens):
+        market = load_market(nToken, i + 1, blockTime)
+        (primeCashClaim, fCashClaim) = get_cash_claims(liquidityToken, market)
+        netfCash.append(add(fCashClaim, nToken.ifCash.get(liquidityToken.maturity, 0)))
+
+        rate = market.oracleRate if useOracleRate else market.lastImpliedRate
+        netPrimeValueInMarket = add(
+            primeCashClaim,
+            convert_from_underlying(
+                nToken.cashGroup.primeRate,
+                get_present_fcash_value(netfCash[i], liquidityToken.maturity, blockTime, rate),
+            ),
+        )
+        totalPrimeValue = add(totalPrimeValue, netPrimeValueInMarket)
+
+    return (totalPrimeValue, netfCash)
+
+
+def get_ntoken_prime_pv(nToken, blockTime):
+    nextSettleTime = get_next_settle_time(nToken)
+    if nextSettleTime <= blockTime:
+        # Values the liquidity tokens one second before they settle, see getNTokenPrimePV
+        blockTime = nextSettleTime - 1
+
+    (totalOracleValueInMarkets, _) = get_ntoken_market_value(nToken, blockTime, True)
+    ifCashResidualPrimePV = get_ifcash_residual_prime_pv(nToken, blockTime)
+    return add(add(totalOracleValueInMarkets, ifCashResidualPrimePV), nToken.cashBalance)
+
+
+def get_ntoken_prime_pv_for_minting(nToken, blockTime):
+    # Returns (nTokenOracleValue, nTokenSpotValue)
+    (totalOracleValueInMarkets, _) = get_ntoken_market_value(nToken, blockTime, True)
+    (totalSpotValueInMarkets, _) = get_ntoken_market_value(nToken, blockTime, False)
+    ifCashResidualPrimePV = get_ifcash_residual_prime_pv(nToken, blockTime)
+
+    return (
+        add(add(totalOracleValueInMarkets, ifCashResidualPrimePV), nToken.cashBalance),
+        add(add(totalSpotValueInMarkets, ifCashResidualPrimePV), nToken.cashBalance),
+    )
+
+
+def get_liquidity_token_withdraw(nToken, nTokensToRedeem, blockTime, ifCashMaturities=None):
+    # Returns (tokensToWithdraw, netfCash). ifCashMaturities stands in for the ifCashBits argument,
+    # by default they are the idiosyncratic maturities at blockTime as in nTokenRedeemAction.
+    if ifCashMaturities is None:
+        ifCashMaturities = get_ntoken_ifcash_maturities(nToken, blockTime)
+
+    if len(ifCashMaturities) == 0:
+        tokensToWithdraw = [
+            div(mul(t.notional, nTokensToRedeem), nToken.totalSupply)
+            for t in nToken.liquidityTokens
+        ]
+        return (tokensToWithdraw, [0] * len(tokensToWithdraw))
+
+    (totalPrimeValueInMarkets, netfCash) = get_ntoken_market_value(nToken, blockTime, True)
+    underlyingPV = get_ifcash_present_value(nToken, ifCashMaturities, blockTime, True)
+    totalPortfolioAssetValue = add(
+        totalPrimeValueInMarkets, convert_from_underlying(nToken.cashGroup.primeRate, underlyingPV)
+    )
+
+    tokensToWithdraw = []
+    for (i, liquidityToken) in enumerate(nToken.liquidityTokens):
+        totalTokens = liquidityToken.notional
+        tokens = mul(mul(totalTokens, nTokensToRedeem), totalPortfolioAssetValue)
+        tokens = div(div(tokens, totalPrimeValueInMarkets), nToken.totalSupply)
+        tokensToWithdraw.append(tokens)
+        netfCash[i] = div(mul(netfCash[i], tokens), totalTokens)
+
+    return (tokensToWithdraw, netfCash)
+
+
+def _call(method, *args):
+    try:
+        return method(*args)
+    except Revert:
+        return None
+
+
+def project_ntoken_values(nToken, blockTimes, primeRates=None, nTokensToRedeem=None):
+    # Values the nToken over an array of block times. By default every point uses the loaded
+    # prime rate, as getNTokenPV does, primeRates (e.g. the "primeRate" output of
+    # project_prime_rates) must have the same shape as blockTimes. Values that revert on chain are
+    # None, e.g. minting and redemption once the markets are past settlement. Redemption amounts
+    # are only returned when nTokensToRedeem is set.
+    blockTimes = np.asarray(blockTimes).astype(object)
+    keys = ["primePV", "oracleValue", "spotValue", "ifCashResidualPV"]
+    if nTokensToRedeem is not None:
+        keys += ["tokensToWithdraw", "netfCash"]
+
+    results = {k: np.full(blockTimes.shape, None, dtype=object) for k in keys}
+    for i in np.ndindex(blockTimes.shape):
+        blockTime = int(blockTimes[i])
+        point = nToken
+        if primeRates is not None:
+            point = nToken._replace(cashGroup=nToken.cashGroup._replace(primeRate=primeRates[i]))
+
+        results["primePV"][i] = _call(get_ntoken_prime_pv, point, blockTime)
+        results["ifCashResidualPV"][i] = _call(get_ifcash_residual_prime_pv, point, blockTime)
+        minting = _call(get_ntoken_prime_pv_for_minting, point, blockTime)
+        if minting is not None:
+            (results["oracleValue"][i], results["spotValue"][i]) = minting
+
+        if nTokensToRedeem is not None:
+            withdraw = _call(get_liquidity_token_withdraw, point, nTokensToRedeem, blockTime)
+            if withdraw is not None:
+                (results["tokensToWithdraw"][i], results["netfCash"][i]) = withdraw
+
+    return results
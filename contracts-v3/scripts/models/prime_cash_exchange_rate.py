@@ -0,0 +1,194 @@
+from collections import namedtuple
+
+import numpy as np
+
+from scripts.models.interest_rate_curve import (
+    YEAR,
+    get_interest_rate,
+    get_post_fee_interest_rate,
+)
+from scripts.models.prime_rate import PrimeRate
+from scripts.models.solidity import (
+    RATE_PRECISION,
+    SCALAR_PRECISION,
+    require,
+    to_int,
+    uadd,
+    udiv,
+    udiv_in_rate_precision,
+    udiv_in_scalar_precision,
+    umul,
+    umul_in_rate_precision,
+    umul_in_scalar_precision,
+    usub,
+)
+
+# Python model of the interest accrual in PrimeCashExchangeRate. Like the InterestRateCurve
+# model nothing is read from storage: prime cash factors come from getPrimeCashFactors, the
+# prime cash curve is passed in as InterestRateParameters and the total underlying value held
+# by the protocol (getTotalUnderlyingView) is an argument. When it is omitted the underlying
+# value is held flat, i.e. no interest is earned on external money markets.
+#
+# project_prime_rates evaluates the view over a grid of future block times, e.g.
+#   project_prime_rates(irParams, factors, factors.lastAccrueTime + np.arange(366) * 86400)
+
+# Field order matches the PrimeCashFactors struct so chain return values can be passed in directly
+PrimeCashFactors = namedtuple(
+    "PrimeCashFactors",
+    [
+        "lastAccrueTime",
+        "totalPrimeSupply",
+        "totalPrimeDebt",
+        "oracleSupplyRate",
+        "lastTotalUnderlyingValue",
+        "underlyingScalar",
+        "supplyScalar",
+        "debtScalar",
+        "rateOracleTimeWindow",
+    ],
+)
+
+
+def get_prime_interest_rates(irParams, factors):
+    # Returns (annualDebtRatePreFee, annualDebtRatePostFee, annualSupplyRate)
+    utilization = 0
+    if factors.totalPrimeSupply > 0:
+        utilization = udiv_in_rate_precision(
+            umul(factors.totalPrimeDebt, factors.debtScalar),
+            umul(factors.totalPrimeSupply, factors.supplyScalar),
+        )
+
+    annualDebtRatePreFee = get_interest_rate(irParams, utilization)
+    annualDebtRatePostFee = 0
+    if utilization > 0:
+        annualDebtRatePostFee = get_post_fee_interest_rate(irParams, annualDebtRatePreFee, True)
+
+    annualSupplyRate = 0
+    if factors.totalPrimeSupply > 0:
+        annualSupplyRate = umul_in_rate_precision(annualDebtRatePreFee, utilization)
+
+    return (annualDebtRatePreFee, annualDebtRatePostFee, annualSupplyRate)
+
+
+def _accrue_scalar(scalar, annualRate, scaledTimeSinceLastAccrue):
+    return umul_in_scalar_precision(
+        scalar, uadd(SCALAR_PRECISION, umul(annualRate, scaledTimeSinceLastAccrue) // YEAR)
+    )
+
+
+def _get_scalar_increase(irParams, blockTime, prior):
+    # Returns (debtScalarWithFee, newSupplyScalar, primeSupplyToReserve, annualSupplyRate)
+    (annualDebtRatePreFee, annualDebtRatePostFee, annualSupplyRate) = get_prime_interest_rates(
+        irParams, prior
+    )
+    scaledTimeSinceLastAccrue = umul(RATE_PRECISION, usub(blockTime, prior.lastAccrueTime))
+
+    debtScalarWithFee = _accrue_scalar(
+        prior.debtScalar, annualDebtRatePostFee, scaledTimeSinceLastAccrue
+    )
+    newSupplyScalar = _accrue_scalar(
+        prior.supplyScalar, annualSupplyRate, scaledTimeSinceLastAccrue
+    )
+
+    if annualDebtRatePreFee == annualDebtRatePostFee:
+        return (debtScalarWithFee, newSupplyScalar, 0, annualSupplyRate)
+
+    debtScalarNoFee = _accrue_scalar(
+        prior.debtScalar, annualDebtRatePreFee, scaledTimeSinceLastAccrue
+    )
+    debtScalarIncrease = usub(debtScalarWithFee, debtScalarNoFee)
+    primeSupplyToReserve = udiv(umul(prior.totalPrimeDebt, debtScalarIncrease), newSupplyScalar)
+
+    return (debtScalarWithFee, newSupplyScalar, primeSupplyToReserve, annualSupplyRate)
+
+
+def _update_prime_cash_scalars(irParams, prior, currentUnderlyingValue, blockTime):
+    # Returns the accrued factors and the prime supply minted to the reserve
+    (debtScalar, supplyScalar, primeSupplyToReserve, _) = _get_scalar_increase(
+        irParams, blockTime, prior
+    )
+
+    underlyingInterestRate = 0
+    if prior.lastTotalUnderlyingValue > 0:
+        # Reverts if the underlying value has decreased
+        underlyingInterestRate = udiv_in_scalar_precision(
+            usub(currentUnderlyingValue, prior.lastTotalUnderlyingValue),
+            prior.lastTotalUnderlyingValue,
+        )
+
+    factors = prior._replace(
+        debtScalar=debtScalar,
+        supplyScalar=supplyScalar,
+        totalPrimeSupply=uadd(prior.totalPrimeSupply, primeSupplyToReserve),
+        underlyingScalar=umul_in_scalar_precision(
+            prior.underlyingScalar, uadd(SCALAR_PRECISION, underlyingInterestRate)
+        ),
+        lastTotalUnderlyingValue=currentUnderlyingValue,
+        lastAccrueTime=blockTime,
+    )
+
+    return (factors, primeSupplyToReserve)
+
+
+def _to_prime_rate(factors):
+    return PrimeRate(
+        to_int(umul(factors.supplyScalar, factors.underlyingScalar)),
+        to_int(umul(factors.debtScalar, factors.underlyingScalar)),
+        factors.oracleSupplyRate,
+    )
+
+
+def get_prime_cash_rate_view(irParams, factors, blockTime, currentUnderlyingValue=None):
+    # Returns (PrimeRate, PrimeCashFactors) like buildPrimeRateView
+    factors = PrimeCashFactors(*factors)
+    if currentUnderlyingValue is None:
+        currentUnderlyingValue = factors.lastTotalUnderlyingValue
+
+    if factors.lastAccrueTime < blockTime:
+        (factors, _) = _update_prime_cash_scalars(
+            irParams, factors, currentUnderlyingValue, blockTime
+        )
+    else:
+        require(factors.lastAccrueTime == blockTime)
+
+    return (_to_prime_rate(factors), factors)
+
+
+def project_prime_rates(irParams, factors, blockTimes, underlyingValues=None, accrue=False):
+    # Projects prime rates over an array of block times, underlyingValues is broadcast against
+    # blockTimes. By default each point is a view from the given factors, as if nothing accrues
+    # in between. With accrue=True block times must be increasing and each point accrues from
+    # the previous one, as if an account transacted at every point.
+    factors = PrimeCashFactors(*factors)
+    blockTimes = np.asarray(blockTimes).astype(object)
+    if underlyingValues is None:
+        underlyingValues = factors.lastTotalUnderlyingValue
+    underlyingValues = np.broadcast_to(
+        np.asarray(underlyingValues).astype(object), blockTimes.shape
+    )
+
+    if accrue:
+        primeRates = np.empty(blockTimes.shape, dtype=object)
+        projected = np.empty(blockTimes.shape, dtype=object)
+        for i in np.ndindex(blockTimes.shape):
+            (primeRates[i], factors) = get_prime_cash_rate_view(
+                irParams, factors, int(blockTimes[i]), underlyingValues[i]
+            )
+            projected[i] = factors
+    else:
+        (primeRates, projected) = np.frompyfunc(
+            lambda t, u: get_prime_cash_rate_view(irParams, factors, int(t), u), 2, 2
+        )(blockTimes, underlyingValues)
+
+    def field(values, name):
+        return np.frompyfunc(lambda v: getattr(v, name), 1, 1)(values)
+
+    return {
+        "primeRate": primeRates,
+        "supplyFactor": field(primeRates, "supplyFactor"),
+        "debtFactor": field(primeRates, "debtFactor"),
+        "underlyingScalar": field(projected, "underlyingScalar"),
+        "supplyScalar": field(projected, "supplyScalar"),
+        "debtScalar": field(projected, "debtScalar"),
+        "totalPrimeSupply": field(projected, "totalPrimeSupply"),
+    }
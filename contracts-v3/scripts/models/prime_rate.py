@@ -0,0 +1,46 @@
+from collections import namedtuple
+
+from scripts.models.solidity import DOUBLE_SCALAR_PRECISION, div, mul, require, sub
+
+# Python model of PrimeRateLib, see scripts/models/solidity.py for the integer semantics
+
+# Field order matches the PrimeRate struct so chain return values can be passed in directly
+PrimeRate = namedtuple("PrimeRate", ["supplyFactor", "debtFactor", "oracleSupplyRate"])
+
+
+def convert_from_storage(pr, storedCashBalance):
+    if storedCashBalance >= 0:
+        return storedCashBalance
+    return div(mul(storedCashBalance, pr.debtFactor), pr.supplyFactor)
+
+
+def convert_to_storage_value(pr, signedPrimeSupplyValueToStore):
+    if signedPrimeSupplyValueToStore >= 0:
+        return signedPrimeSupplyValueToStore
+    # Rounds debt up by one unit in favor of the protocol
+    return sub(div(mul(signedPrimeSupplyValueToStore, pr.supplyFactor), pr.debtFactor), 1)
+
+
+def convert_to_underlying(pr, primeCashBalance):
+    result = div(mul(primeCashBalance, pr.supplyFactor), DOUBLE_SCALAR_PRECISION)
+    return min(result, -1) if primeCashBalance < 0 else result
+
+
+def convert_from_underlying(pr, underlyingBalance):
+    result = div(mul(underlyingBalance, DOUBLE_SCALAR_PRECISION), pr.supplyFactor)
+    return min(result, -1) if underlyingBalance < 0 else result
+
+
+def convert_debt_storage_to_underlying(pr, debtStorage):
+    require(debtStorage < 1)
+    if debtStorage == 0:
+        return 0
+    return sub(div(mul(debtStorage, pr.debtFactor), DOUBLE_SCALAR_PRECISION), 1)
+
+
+def convert_underlying_to_debt_storage(pr, underlying):
+    # Dust balances are floored at zero
+    if 0 <= underlying < 10:
+        return 0
+    require(underlying < 0)
+    return sub(div(mul(underlying, DOUBLE_SCALAR_PRECISION), pr.debtFactor), 1)
@@ -0,0 +1,123 @@
+# Integer semantics shared by the python models of the Solidity libraries. Reverts are raised as
+# Revert so that callers can compare them against a reverting transaction or call.
+
+INT256_MIN = -(2 ** 255)
+INT256_MAX = 2 ** 255 - 1
+UINT256_MAX = 2 ** 256 - 1
+
+RATE_PRECISION = 10 ** 9
+PERCENTAGE_DECIMALS = 100
+SCALAR_PRECISION = 10 ** 18
+DOUBLE_SCALAR_PRECISION = 10 ** 36
+BASIS_POINT = RATE_PRECISION // 10000
+
+
+class Revert(Exception):
+    pass
+
+
+def require(condition, message=""):
+    if not condition:
+        raise Revert(message)
+
+
+def tdiv(a, b):
+    # Solidity integer division truncates towards zero, python floors
+    require(b != 0)
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+# SafeInt256
+
+
+def mul(a, b):
+    c = a * b
+    require(INT256_MIN <= c <= INT256_MAX)
+    return c
+
+
+def div(a, b):
+    require(not (b == -1 and a == INT256_MIN))
+    return tdiv(a, b)
+
+
+def add(x, y):
+    z = x + y
+    require(INT256_MIN <= z <= INT256_MAX)
+    return z
+
+
+def sub(x, y):
+    z = x - y
+    require(INT256_MIN <= z <= INT256_MAX)
+    return z
+
+
+def neg(x):
+    return mul(-1, x)
+
+
+def sub_no_neg(x, y):
+    z = sub(x, y)
+    require(z >= 0)
+    return z
+
+
+def div_in_rate_precision(x, y):
+    return div(mul(x, RATE_PRECISION), y)
+
+
+def mul_in_rate_precision(x, y):
+    return div(mul(x, y), RATE_PRECISION)
+
+
+def to_uint(x):
+    require(x >= 0)
+    return x
+
+
+def to_int(x):
+    require(x <= INT256_MAX)
+    return x
+
+
+# SafeUint256
+
+
+def umul(a, b):
+    c = a * b
+    require(c <= UINT256_MAX)
+    return c
+
+
+def udiv(a, b):
+    require(b > 0)
+    return a // b
+
+
+def uadd(a, b):
+    c = a + b
+    require(c <= UINT256_MAX)
+    return c
+
+
+def usub(a, b):
+    require(b <= a)
+    return a - b
+
+
+def udiv_in_rate_precision(x, y):
+    return udiv(umul(x, RATE_PRECISION), y)
+
+
+def umul_in_rate_precision(x, y):
+    return udiv(umul(x, y), RATE_PRECISION)
+
+
+def udiv_in_scalar_precision(x, y):
+    return udiv(umul(x, SCALAR_PRECISION), y)
+
+
+def umul_in_scalar_precision(x, y):
+    return udiv(umul(x, y), SCALAR_PRECISION)
@@ -0,0 +1,258 @@
+import numpy as np
+
+from scripts.models.cash_group import get_reserve_fee_share
+from scripts.models.interest_rate_curve import (
+    YEAR,
+    MarketParameters,
+    calculate_fcash_trade,
+    get_fcash_given_cash_amount,
+)
+from scripts.models.prime_rate import convert_to_underlying
+from scripts.models.solidity import (
+    DOUBLE_SCALAR_PRECISION,
+    PERCENTAGE_DECIMALS,
+    RATE_PRECISION,
+    Revert,
+)
+
+# Evaluates the fCash trade curve for many points in a single call. Inputs are broadcast
+# against each other so a whole curve can be requested with one array argument, e.g.
+#   calculate_trades(irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity,
+#                    np.linspace(-1e14, 1e14, 10_000, dtype=np.int64))
+# irParams and cashGroup may be a single tuple or an array of tuples, one per point, to
+# evaluate several markets or currencies at once.
+#
+# exact=True runs the bit exact model in scripts/models/interest_rate_curve.py over object
+# arrays and returns python ints. exact=False uses float64 vectorized math which is orders of
+# magnitude faster but drifts from the contracts by rounding. Failed trades return zero in
+# both modes, like calculatefCashTrade.
+
+SECANT_ITERATIONS = 250
+
+
+def _object_array(value):
+    # A single parameter tuple is wrapped so numpy broadcasts it, a list holds one per point
+    if isinstance(value, tuple):
+        array = np.empty((), dtype=object)
+        array[()] = value
+        return array
+
+    array = np.empty(len(value), dtype=object)
+    for (i, v) in enumerate(value):
+        array[i] = v
+    return array
+
+
+def _int_array(value):
+    return np.asarray(value).astype(object)
+
+
+def _field(params, name):
+    return np.vectorize(lambda p: float(getattr(p, name)), otypes=[np.float64])(params)
+
+
+def _exact_trade(irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, fCashToAccount):
+    market = MarketParameters(0, 0, int(totalfCash), int(totalPrimeCash), 0, 0, 0, 0)
+    try:
+        (newMarket, cashToAccount, cashToReserve, postFeeRate) = calculate_fcash_trade(
+            market, cashGroup, irParams, int(fCashToAccount), int(timeToMaturity), 1, 0
+        )
+    except Revert:
+        return (0, 0, 0, 0)
+
+    if cashToAccount == 0:
+        return (0, 0, 0, 0)
+    return (cashToAccount, cashToReserve, postFeeRate, newMarket.lastImpliedRate)
+
+
+def _exact_fcash(irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, netCash):
+    try:
+        return get_fcash_given_cash_amount(
+            irParams,
+            int(totalfCash),
+            int(netCash),
+            convert_to_underlying(cashGroup.primeRate, int(totalPrimeCash)),
+            int(timeToMaturity),
+        )
+    except Revert:
+        return 0
+
+
+_exactTrade = np.frompyfunc(_exact_trade, 6, 4)
+_exactfCash = np.frompyfunc(_exact_fcash, 6, 1)
+
+
+class _FloatCurve:
+    # Float64 version of the interest rate curve with every parameter as a broadcastable array
+    def __init__(self, irParams, cashGroup):
+        params = _object_array(irParams)
+        groups = _object_array(cashGroup)
+        for name in (
+            "kinkUtilization1",
+            "kinkUtilization2",
+            "kinkRate1",
+            "kinkRate2",
+            "maxRate",
+            "minFeeRate",
+            "maxFeeRate",
+            "feeRatePercent",
+        ):
+            setattr(self, name, _field(params, name))
+        self.supplyFactor = np.vectorize(
+            lambda g: float(g.primeRate.supplyFactor), otypes=[np.float64]
+        )(groups)
+        self.reserveFeeShare = np.vectorize(
+            lambda g: float(get_reserve_fee_share(g)), otypes=[np.float64]
+        )(groups)
+
+    def to_underlying(self, primeCash):
+        return primeCash * self.supplyFactor / DOUBLE_SCALAR_PRECISION
+
+    def to_prime_cash(self, underlying):
+        return underlying * DOUBLE_SCALAR_PRECISION / self.supplyFactor
+
+    def utilization(self, fCashToAccount, totalfCash, totalCashUnderlying):
+        return (totalfCash - fCashToAccount) * RATE_PRECISION / (totalCashUnderlying + totalfCash)
+
+    def interest_rate(self, utilization):
+        k1 = utilization * self.kinkRate1 / self.kinkUtilization1
+        k2 = (utilization - self.kinkUtilization1) * (self.kinkRate2 - self.kinkRate1) / (
+            self.kinkUtilization2 - self.kinkUtilization1
+        ) + self.kinkRate1
+        k3 = (utilization - self.kinkUtilization2) * (self.maxRate - self.kinkRate2) / (
+            RATE_PRECISION - self.kinkUtilization2
+        ) + self.kinkRate2
+        return np.where(
+            utilization <= self.kinkUtilization1,
+            k1,
+            np.where(utilization <= self.kinkUtilization2, k2, k3),
+        )
+
+    def post_fee_rate(self, preFeeRate, isBorrow):
+        feeRate = preFeeRate * self.feeRatePercent / PERCENTAGE_DECIMALS
+        feeRate = np.minimum(np.maximum(feeRate, self.minFeeRate), self.maxFeeRate)
+        return np.where(isBorrow, preFeeRate + feeRate, np.maximum(preFeeRate - feeRate, 0))
+
+    def exchange_rate(self, interestRate, timeToMaturity):
+        return np.exp(interestRate * timeToMaturity / YEAR / RATE_PRECISION) * RATE_PRECISION
+
+    def post_fee_exchange_rate(self, fCashToAccount, totalfCash, totalCash, timeToMaturity):
+        preFeeRate = self.interest_rate(self.utilization(fCashToAccount, totalfCash, totalCash))
+        postFeeRate = self.post_fee_rate(preFeeRate, fCashToAccount < 0)
+        return self.exchange_rate(postFeeRate, timeToMaturity)
+
+
+def _float_trade(curve, totalfCash, totalPrimeCash, timeToMaturity, fCashToAccount):
+    totalCashUnderlying = curve.to_underlying(totalPrimeCash)
+    utilization = curve.utilization(fCashToAccount, totalfCash, totalCashUnderlying)
+    valid = (totalfCash > fCashToAccount) & (utilization <= RATE_PRECISION)
+    utilization = np.minimum(utilization, RATE_PRECISION)
+
+    preFeeRate = curve.interest_rate(utilization)
+    postFeeRate = curve.post_fee_rate(preFeeRate, fCashToAccount < 0)
+    preFeeExchangeRate = curve.exchange_rate(preFeeRate, timeToMaturity)
+    postFeeExchangeRate = curve.exchange_rate(postFeeRate, timeToMaturity)
+    preFeeCash = -fCashToAccount * RATE_PRECISION / preFeeExchangeRate
+    postFeeCash = -fCashToAccount * RATE_PRECISION / postFeeExchangeRate
+    cashToReserve = (preFeeCash - postFeeCash) * curve.reserveFeeShare / PERCENTAGE_DECIMALS
+    cashToMarket = -(postFeeCash + cashToReserve)
+
+    # Utilization after the trade must also be under 100%
+    newUtilization = curve.utilization(
+        0, totalfCash - fCashToAccount, totalCashUnderlying + cashToMarket
+    )
+    valid &= (newUtilization <= RATE_PRECISION) & (postFeeCash != 0)
+    impliedRate = curve.interest_rate(np.minimum(newUtilization, RATE_PRECISION))
+    valid &= impliedRate > 0
+
+    def masked(x):
+        return np.where(valid, x, 0.0)
+
+    return (
+        masked(curve.to_prime_cash(postFeeCash)),
+        masked(curve.to_prime_cash(cashToReserve)),
+        masked(postFeeRate),
+        masked(impliedRate),
+    )
+
+
+def _float_fcash(curve, totalfCash, totalPrimeCash, timeToMaturity, netCash):
+    totalCashUnderlying = curve.to_underlying(totalPrimeCash)
+    valid = (netCash != 0) & (netCash <= totalCashUnderlying)
+
+    # Same initial guesses as getfCashGivenCashAmount
+    currentRate = curve.post_fee_exchange_rate(
+        np.where(netCash > 0, -1.0, 1.0), totalfCash, totalCashUnderlying, timeToMaturity
+    )
+    maxRate = curve.exchange_rate(curve.maxRate, timeToMaturity)
+    fCash_0 = np.where(netCash < 0, -netCash, -netCash * currentRate / RATE_PRECISION)
+    fCash_1 = -netCash * np.where(netCash < 0, currentRate, maxRate) / RATE_PRECISION
+
+    def diff(fCash):
+        # Keeps guesses inside the curve's domain, the exact model reverts outside of it
+        fCash = np.minimum(fCash, totalfCash)
+        rate = curve.post_fee_exchange_rate(fCash, totalfCash, totalCashUnderlying, timeToMaturity)
+        return fCash + netCash * rate / RATE_PRECISION
+
+    diff_0 = diff(fCash_0)
+    for _ in range(SECANT_ITERATIONS):
+        delta = fCash_1 - fCash_0
+        converged = np.abs(delta) < 1
+        if np.all(converged | ~valid):
+            break
+        diff_1 = diff(fCash_1)
+        denominator = np.where(diff_1 == diff_0, 1.0, diff_1 - diff_0)
+        fCash_n = np.where(converged, fCash_1, fCash_1 - diff_1 * delta / denominator)
+        (fCash_1, fCash_0, diff_0) = (fCash_n, fCash_1, diff_1)
+
+    return np.where(valid, fCash_1, 0.0)
+
+
+def calculate_trades(
+    irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, fCashToAccount, exact=True
+):
+    # Returns arrays of prime cash to the account, prime cash to the reserve, the post fee
+    # interest rate and the market's new implied rate for every fCash amount
+    if exact:
+        results = _exactTrade(
+            _object_array(irParams),
+            _object_array(cashGroup),
+            _int_array(totalfCash),
+            _int_array(totalPrimeCash),
+            _int_array(timeToMaturity),
+            _int_array(fCashToAccount),
+        )
+    else:
+        results = _float_trade(
+            _FloatCurve(irParams, cashGroup),
+            np.asarray(totalfCash, dtype=np.float64),
+            np.asarray(totalPrimeCash, dtype=np.float64),
+            np.asarray(timeToMaturity, dtype=np.float64),
+            np.asarray(fCashToAccount, dtype=np.float64),
+        )
+
+    names = ("primeCashToAccount", "primeCashToReserve", "postFeeRate", "impliedRate")
+    return dict(zip(names, results))
+
+
+def calculate_fcash_given_cash(
+    irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, netCash, exact=True
+):
+    # Returns the fCash amount for each net underlying cash amount to the account
+    if exact:
+        return _exactfCash(
+            _object_array(irParams),
+            _object_array(cashGroup),
+            _int_array(totalfCash),
+            _int_array(totalPrimeCash),
+            _int_array(timeToMaturity),
+            _int_array(netCash),
+        )
+
+    return _float_fcash(
+        _FloatCurve(irParams, cashGroup),
+        np.asarray(totalfCash, dtype=np.float64),
+        np.asarray(totalPrimeCash, dtype=np.float64),
+        np.asarray(timeToMaturity, dtype=np.float64),
+        np.asarray(netCash, dtype=np.float64),
+    )
@@ -1,49 +1,210 @@
+import hashlib
 import json
 import os
-from subprocess import CalledProcessError, check_output
+import re
+from concurrent.futures import ProcessPoolExecutor
 
+# Counts lines, code, comments, branch complexity and functions of every Solidity file under
+# contracts/ and prints them as Markdown tables. Results are cached per file by the hash of its
+# contents in build/stats-cache.json, so re-runs only scan files that have changed. Usage:
+#
+#   python scripts/stats.py
+#
+# Complexity follows the scc checks for JavaScript that were used to count Solidity before:
+# branch keywords and boolean operators found in code, not in comments or strings.
 
-def get_code_stats():
+SOURCE_DIR = "contracts"
+CACHE_FILE = os.path.join("build", "stats-cache.json")
+# Bump when the scanner changes so cached results are discarded
+CACHE_VERSION = 1
+MAX_WORKERS = 8
+
+COMPLEXITY = re.compile(r"(?<![\w.])(?:for|if|switch|while|else)[ (]|(?:\|\||&&|!=|==) ")
+FUNCTION = re.compile(r"\bfunction\s+\w+")
+DECLARATION = re.compile(r"^\s*(?:abstract\s+)?(contract|library|interface)\s+(\w+)")
+
+
+def _split_line(line, inComment):
+    # Returns the code on the line with comments and string contents removed, whether the line
+    # has a comment and whether a block comment is still open at the end of it
+    code = []
+    hasComment = inComment
+    quote = None
+    i = 0
+    while i < len(line):
+        c = line[i]
+        pair = line[i : i + 2]
+        if inComment:
+            if pair == "*/":
+                inComment = False
+                i += 2
+                continue
+        elif quote is not None:
+            if c == "\\":
+                i += 1
+            elif c == quote:
+                quote = None
+                code.append(c)
+        elif pair == "//":
+            hasComment = True
+            break
+        elif pair == "/*":
+            hasComment = True
+            inComment = True
+            i += 2
+            continue
+        else:
+            if c == '"' or c == "'":
+                quote = c
+            code.append(c)
+        i += 1
+
+    return ("".join(code), hasComment, inComment)
+
+
+def scan_source(source):
+    lines = source.splitlines()
+    stats = {"Lines": len(lines), "Code": 0, "Comment": 0, "Blank": 0, "Complexity": 0}
+    declarations = []
+    inComment = False
+    depth = 0
+    for line in lines:
+        (code, hasComment, inComment) = _split_line(line, inComment)
+        if code.strip() != "":
+            stats["Code"] += 1
+        elif hasComment:
+            stats["Comment"] += 1
+        else:
+            stats["Blank"] += 1
+            continue
+
+        stats["Complexity"] += len(COMPLEXITY.findall(code))
+        declaration = DECLARATION.match(code) if depth == 0 else None
+        if declaration is not None:
+            declarations.append({"Kind": declaration[1], "Name": declaration[2], "Functions": 0})
+        if depth <= 1 and len(declarations) > 0:
+            # Functions declared directly in the body of the last contract or library
+            declarations[-1]["Functions"] += len(FUNCTION.findall(code))
+        depth += code.count("{") - code.count("}")
+
+    stats["Functions"] = sum(d["Functions"] for d in declarations)
+    stats["Declarations"] = declarations
+    return stats
+
+
+def _load_cache(cacheFile):
     try:
-        out = check_output(
-            ["scc", "--by-file", "--count-as", "sol:js", "--format", "json", "contracts"]
-        )
-        outJson = json.loads(out)
-    except CalledProcessError as e:
-        print(e.cmd)
-        print(e.output)
+        with open(cacheFile, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache["files"] if cache.get("version") == CACHE_VERSION else {}
+
+
+def _write_cache(cacheFile, files):
+    os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+    tmpPath = "{}.{}.tmp".format(cacheFile, os.getpid())
+    with open(tmpPath, "w") as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f)
+    os.replace(tmpPath, cacheFile)
+
+
+def get_source_files(sourceDir=SOURCE_DIR):
+    paths = []
+    for (root, _, files) in os.walk(sourceDir):
+        paths.extend(os.path.join(root, f) for f in files if f.endswith(".sol"))
+    return sorted(paths)
+
 
-    solidityFiles = [lang for lang in outJson if lang["Name"] == "JavaScript"][0]
-    # pythonFiles = [lang for lang in outJson if lang["Name"] == "Python"][0]
+def get_file_stats(sourceDir=SOURCE_DIR, cacheFile=CACHE_FILE, maxWorkers=MAX_WORKERS):
+    # Returns {path: stats}, only files whose contents are not in the cache are scanned
+    sources = {}
+    for path in get_source_files(sourceDir):
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        sources[path] = (hashlib.sha256(source.encode("utf-8")).hexdigest(), source)
+
+    cache = _load_cache(cacheFile)
+    missing = {h: s for (h, s) in sources.values() if h not in cache}
+    if len(missing) > 1 and maxWorkers > 1:
+        with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+            scanned = executor.map(scan_source, missing.values(), chunksize=8)
+            cache.update(zip(missing.keys(), scanned))
+    else:
+        cache.update((h, scan_source(s)) for (h, s) in missing.items())
+
+    # Entries for contents that no longer exist are dropped
+    files = {h: cache[h] for (h, _) in sources.values()}
+    if len(missing) > 0 or len(files) != len(cache):
+        _write_cache(cacheFile, files)
+
+    return {path: cache[h] for (path, (h, _)) in sources.items()}
+
+
+def get_module(path):
+    (directory, _) = os.path.split(path)
+    module = os.path.split(directory)[1]
+    if module == "internal" or module == "external":
+        (subpath, _) = os.path.split(module)
+        if subpath != "":
+            module = subpath
+    return module
+
+
+def print_table(header, alignments, rows):
+    print("|", "|".join(header), "|")
+    print("|", "|".join(alignments), "|")
+    for line in rows:
+        print("|", "|".join(line), "|")
+
+
+def get_code_stats(sourceDir=SOURCE_DIR, cacheFile=CACHE_FILE):
+    fileStats = get_file_stats(sourceDir, cacheFile)
 
     header = ["Module", "File", "Code", "Comments", "Total Lines", "Complexity / Line"]
     alignments = [":-----", ":----", "----:", "---:", "---:", "---:"]
     solidityTableLines = []
-    for f in solidityFiles["Files"]:
-        (path, _) = os.path.split(f["Location"])
-        module = os.path.split(path)[1]
+    # Function counts of every library and action contract
+    declarationLines = []
+    for (path, f) in fileStats.items():
+        module = get_module(path)
         if module == "mocks":
             continue
-        elif module == "internal" or module == "external":
-            (subpath, _) = os.path.split(module)
-            if subpath != "":
-                module = subpath
 
+        complexity = f["Complexity"] / f["Code"] * 100 if f["Code"] > 0 else 0
         solidityTableLines.append(
             [
                 module.capitalize(),
-                f["Filename"],
+                os.path.basename(path),
                 str(f["Code"]),
                 str(f["Comment"]),
                 str(f["Lines"]),
-                "{:0.1f}".format(f["Complexity"] / f["Code"] * 100),
+                "{:0.1f}".format(complexity),
             ]
         )
 
-    print("|", "|".join(header), "|")
-    print("|", "|".join(alignments), "|")
-    for line in sorted(solidityTableLines):
-        print("|", "|".join(line), "|")
+        for d in f["Declarations"]:
+            if d["Kind"] == "library":
+                kind = "Library"
+            elif d["Kind"] == "contract" and module == "actions":
+                kind = "Action"
+            else:
+                continue
+            declarationLines.append([kind, module.capitalize(), d["Name"], str(d["Functions"])])
+
+    print_table(header, alignments, sorted(solidityTableLines))
+    print()
+    print_table(
+        ["Type", "Module", "Name", "Functions"],
+        [":---", ":-----", ":---", "----:"],
+        sorted(declarationLines),
+    )
+    return fileStats
+
+
+def main():
+    get_code_stats()
 
 
-get_code_stats()
+if __name__ == "__main__":
+    main()
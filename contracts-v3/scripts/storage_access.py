@@ -0,0 +1,239 @@
+import json
+from collections import defaultdict
+
+from brownie.network.state import _find_contract
+from scripts.gas_profiler import CALL_OPS, CREATE_OPS, call_target, get_trace, stack_value
+
+# Counts cold and warm SLOAD / SSTORE operations per storage slot for every transaction logged
+# by gas_stats.py and maps each slot back to the LibStorage structure it belongs to. Run with:
+#   brownie run scripts/storage_access.py
+# The report is written to storage_access.json, slots that are read more than once in the same
+# transaction are listed under "repeatedReads" for each action.
+
+# Memory is required to recover the keccak preimages of mapping slots
+TRACE_OPTIONS = {"disableStorage": True, "disableMemory": False}
+OUTPUT_FILE = "storage_access.json"
+
+# Must match LibStorage.StorageId, this enum is append only
+STORAGE_SLOT_BASE = 1000000
+STORAGE_IDS = [
+    "Unused",
+    "AccountStorage",
+    "nTokenContext",
+    "nTokenAddress",
+    "nTokenDeposit",
+    "nTokenInitialization",
+    "Balance",
+    "Token",
+    "SettlementRate_deprecated",
+    "CashGroup",
+    "Market",
+    "AssetsBitmap",
+    "ifCashBitmap",
+    "PortfolioArray",
+    "nTokenTotalSupply_deprecated",
+    "AssetRate_deprecated",
+    "ExchangeRate",
+    "nTokenTotalSupply",
+    "SecondaryIncentiveRewarder",
+    "LendingPool",
+    "VaultConfig",
+    "VaultState",
+    "VaultAccount",
+    "VaultBorrowCapacity",
+    "VaultSecondaryBorrow",
+    "VaultSettledAssets_deprecated",
+    "VaultAccountSecondaryDebtShare",
+    "ActiveInterestRateParameters",
+    "NextInterestRateParameters",
+    "PrimeCashFactors",
+    "PrimeSettlementRates",
+    "PrimeCashHoldingsOracles",
+    "TotalfCashDebtOutstanding",
+    "pCashAddress",
+    "pDebtAddress",
+    "pCashTransferAllowance",
+    "RebalancingTargets",
+    "RebalancingContext",
+    "StoredTokenBalances",
+]
+# Largest struct or fixed size array held in a single mapping value (PortfolioArray holds
+# MAX_PORTFOLIO_ASSETS structs of two slots each)
+MAX_VALUE_SLOTS = 16
+
+
+def _memory_bytes(step):
+    return bytes.fromhex("".join(w[2:] if w.startswith("0x") else w for w in step["memory"]))
+
+
+def _format_key(key):
+    if 2 ** 32 < key < 2 ** 160:
+        return "0x{:040x}".format(key)
+    return str(key)
+
+
+class SlotResolver:
+    def __init__(self):
+        # Maps a keccak output to the (key, parent slot) of a mapping lookup
+        self.preimages = {}
+
+    def record_sha3(self, step, nextStep):
+        (offset, length) = (stack_value(step, 1), stack_value(step, 2))
+        if length != 64:
+            return
+        data = _memory_bytes(step)[offset : offset + 64]
+        self.preimages[stack_value(nextStep, 1)] = (
+            int.from_bytes(data[:32], "big"),
+            int.from_bytes(data[32:], "big"),
+        )
+
+    def resolve(self, slot):
+        keys = []
+        valueOffset = 0
+        while True:
+            if STORAGE_SLOT_BASE <= slot < STORAGE_SLOT_BASE + len(STORAGE_IDS):
+                structure = STORAGE_IDS[slot - STORAGE_SLOT_BASE]
+                break
+            elif slot < STORAGE_SLOT_BASE:
+                structure = "StorageLayout[{}]".format(slot)
+                break
+
+            # Struct members and fixed size arrays are stored at consecutive slots from the
+            # hashed mapping slot
+            for i in range(MAX_VALUE_SLOTS):
+                if slot - i in self.preimages:
+                    (key, slot) = self.preimages[slot - i]
+                    keys.insert(0, _format_key(key))
+                    if len(keys) == 1:
+                        valueOffset = i
+                    break
+            else:
+                return ("<unknown>", "0x{:064x}".format(slot))
+
+        label = structure + "".join("[{}]".format(k) for k in keys)
+        if valueOffset > 0:
+            label += "+{}".format(valueOffset)
+        return (structure, label)
+
+
+class _Frame:
+    def __init__(self, storageAddress):
+        self.storageAddress = storageAddress
+        # Slots first accessed in this frame, these become cold again if the frame reverts
+        self.warmed = []
+
+
+def _contract_name(address):
+    contract = _find_contract(address)
+    return contract._name if contract is not None else address
+
+
+def analyze_trace(structLogs, rootAddress, notionalAddress):
+    resolver = SlotResolver()
+    accessed = set()
+    frames = [_Frame(rootAddress)]
+    accesses = []
+
+    for (i, step) in enumerate(structLogs):
+        frame = frames[-1]
+        nextStep = structLogs[i + 1] if i + 1 < len(structLogs) else None
+        op = step["op"]
+
+        if op in ("SHA3", "KECCAK256") and nextStep is not None:
+            resolver.record_sha3(step, nextStep)
+        elif op in ("SLOAD", "SSTORE"):
+            slot = stack_value(step, 1)
+            accessKey = (frame.storageAddress, slot)
+            isCold = accessKey not in accessed
+            if isCold:
+                accessed.add(accessKey)
+                frame.warmed.append(accessKey)
+            accesses.append((op, frame.storageAddress, slot, isCold))
+
+        if nextStep is not None and nextStep["depth"] > step["depth"]:
+            if op in ("DELEGATECALL", "CALLCODE"):
+                frames.append(_Frame(frame.storageAddress))
+            elif op in CALL_OPS:
+                frames.append(_Frame(call_target(step)))
+            elif op in CREATE_OPS:
+                frames.append(_Frame(None))
+        elif nextStep is not None and nextStep["depth"] < step["depth"] and len(frames) > 1:
+            child = frames.pop()
+            if op == "REVERT":
+                for k in child.warmed:
+                    accessed.discard(k)
+            else:
+                frames[-1].warmed.extend(child.warmed)
+
+    report = {
+        "structures": defaultdict(lambda: {"SLOAD": [0, 0], "SSTORE": [0, 0]}),
+        "slots": defaultdict(lambda: {"SLOAD": [0, 0], "SSTORE": [0, 0]}),
+    }
+    for (op, address, slot, isCold) in accesses:
+        if address == notionalAddress:
+            (structure, label) = resolver.resolve(slot)
+        else:
+            name = _contract_name(address)
+            (structure, label) = (name, "{}[{}]".format(name, slot))
+
+        # Counts are stored as [cold, warm]
+        report["structures"][structure][op][0 if isCold else 1] += 1
+        report["slots"][label][op][0 if isCold else 1] += 1
+
+    return {
+        "structures": dict(report["structures"]),
+        "slots": dict(report["slots"]),
+        "repeatedReads": {
+            label: sum(counts["SLOAD"])
+            for (label, counts) in report["slots"].items()
+            if sum(counts["SLOAD"]) > 1
+        },
+    }
+
+
+def analyze_transaction(txn, notionalAddress):
+    rootAddress = txn.receiver if txn.receiver is not None else txn.contract_address
+    return analyze_trace(get_trace(txn.txid, TRACE_OPTIONS), rootAddress, notionalAddress)
+
+
+def print_summary(results):
+    print("| Action | Structure | SLOAD cold | SLOAD warm | SSTORE cold | SSTORE warm |")
+    print("| :--- | :--- | ---: | ---: | ---: | ---: |")
+    for (action, result) in sorted(results.items()):
+        for (structure, counts) in sorted(result["structures"].items()):
+            print(
+                "| {} | {} | {} | {} | {} | {} |".format(
+                    action, structure, *counts["SLOAD"], *counts["SSTORE"]
+                )
+            )
+
+
+def main():
+    from scripts import gas_stats
+
+    results = {}
+    context = {}
+    environment = gas_stats.environment
+
+    def capture_environment(accounts):
+        context["env"] = environment(accounts)
+        return context["env"]
+
+    def analyze_hook(key, txnCold, txnWarm):
+        notionalAddress = context["env"].notional.address
+        cases = (
+            [("cold", txnCold)]
+            if txnCold == txnWarm
+            else [("cold", txnCold), ("warm", txnWarm)]
+        )
+        for (case, txn) in cases:
+            results["{}.{}".format(key, case)] = analyze_transaction(txn, notionalAddress)
+
+    gas_stats.environment = capture_environment
+    gas_stats.GAS_LOG_HOOKS.append(analyze_hook)
+    gas_stats.main()
+
+    with open(OUTPUT_FILE, "w") as f:
+        json.dump(results, f, sort_keys=True, indent=4)
+
+    print_summary(results)
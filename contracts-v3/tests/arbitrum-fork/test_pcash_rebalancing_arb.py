@@ -4,7 +4,7 @@ import brownie
 from brownie import ZERO_ADDRESS, accounts
 from brownie import interface, interface, ERC4626HoldingsOracle, MockERC4626
 from brownie.network.state import Chain
-from scripts.mainnet.V3Environment import getEnvironment
+from scripts.mainnet.V3Environment import getCachedEnvironment
 
 chain = Chain()
 
@@ -16,7 +16,7 @@ def run_around_tests():
 
 @pytest.fixture(scope="module", autouse=True)
 def v3env(accounts):
-    return getEnvironment(accounts, "v3.arbitrum-one.json")
+    return getCachedEnvironment(accounts, "v3.arbitrum-one.json")
 
 def rebalance_currency(v3env, currencyId, waToken):
     if currencyId == 1:
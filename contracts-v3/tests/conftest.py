@@ -1,5 +1,122 @@
+import json
+import os
+from collections import defaultdict
+
 import pytest
 
+pytest_plugins = ["tests.rpc_profiler"]
+
+# Running with xdist (brownie test -n 4): brownie launches a separate node for each worker on
+# the configured port plus the worker number, and module fixtures deploy their own contracts
+# on each worker. Whole modules are assigned to workers up front by their recorded durations,
+# run with --record-durations to update them.
+DURATIONS_FILE = os.path.join(os.path.dirname(__file__), "durations.json")
+
+_moduleDurations = defaultdict(float)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--record-durations",
+        action="store_true",
+        default=False,
+        help="Update tests/durations.json with the test module durations of this run",
+    )
+    parser.addoption(
+        "--exhaustive",
+        action="store_true",
+        default=False,
+        help="Run offline model tests over their full input space instead of a sample",
+    )
+
+
+def _module(nodeid):
+    return nodeid.split("::")[0]
+
+
+def load_durations():
+    try:
+        with open(DURATIONS_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def assign_modules(weights, numWorkers):
+    # Longest processing time first, ties are broken by name so every worker computes the same
+    # assignment from the same collection
+    loads = [0] * numWorkers
+    assignment = {}
+    for module in sorted(weights.keys(), key=lambda m: (-weights[m], m)):
+        i = loads.index(min(loads))
+        assignment[module] = i
+        loads[i] += weights[module]
+
+    return assignment
+
+
+def module_weights(nodeids):
+    testCounts = defaultdict(int)
+    for nodeid in nodeids:
+        testCounts[_module(nodeid)] += 1
+
+    # Modules without a recorded duration are weighted by the average time per test
+    durations = {m: d for (m, d) in load_durations().items() if m in testCounts}
+    recordedTests = sum(testCounts[m] for m in durations.keys())
+    perTest = sum(durations.values()) / recordedTests if recordedTests > 0 else 1
+    return {m: durations.get(m, n * perTest) for (m, n) in testCounts.items()}
+
+
+def pytest_xdist_make_scheduler(config, log):
+    if config.getvalue("dist") not in ("load", "loadscope"):
+        return None
+
+    from xdist.scheduler import LoadScopeScheduling
+
+    class ModuleShardScheduling(LoadScopeScheduling):
+        # Each scope is the set of modules assigned to one worker, so every worker receives a
+        # single unit of work
+        assignment = None
+
+        def _split_scope(self, nodeid):
+            if self.assignment is None:
+                weights = module_weights(self.collection)
+                self.assignment = assign_modules(weights, len(self.nodes))
+            return "shard{}".format(self.assignment[_module(nodeid)])
+
+    return ModuleShardScheduling(config, log)
+
+
+def pytest_runtest_logreport(report):
+    # Includes setup, so the module fixture deployments are attributed to their module
+    _moduleDurations[_module(report.nodeid)] += report.duration
+
+
+def pytest_collection_finish(session):
+    # Brownie connects after this hook, attaching to the ganache node launched from the
+    # environment cache (see scripts/env_cache.py)
+    if len(session.items) == 0:
+        return
+
+    from brownie._config import CONFIG
+    from scripts.env_cache import launch_session_node
+
+    launch_session_node(CONFIG.argv["network"] or CONFIG.settings["networks"]["default"])
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session):
+    from scripts.env_cache import stop_session_node
+
+    stop_session_node()
+    if hasattr(session.config, "workerinput") or not session.config.getoption("record_durations"):
+        return
+
+    durations = load_durations()
+    durations.update({m: round(d, 2) for (m, d) in _moduleDurations.items()})
+    with open(DURATIONS_FILE, "w") as f:
+        json.dump(durations, f, sort_keys=True, indent=4)
+
 
 @pytest.fixture(scope="module", autouse=True)
 def shared_setup(module_isolation):
@@ -17,6 +17,7 @@ from brownie.test import strategy
 from eth_abi.packed import encode_abi_packed
 from scripts.config import CurrencyDefaults, nTokenDefaults
 from scripts.deployment import TestEnvironment
+from scripts.env_cache import cached_environment
 from tests.constants import (
     BALANCE_FLAG_INT,
     CASH_GROUP_PARAMETERS,
@@ -426,6 +427,13 @@ def _enable_cash_group(currencyId, env, accounts, initialCash):
 
 
 def initialize_environment(accounts):
+    # Restored from a state snapshot when one exists for the current build, see env_cache.py
+    return cached_environment(
+        "initialize_environment", lambda: _initialize_environment(accounts), accounts[0]
+    )
+
+
+def _initialize_environment(accounts):
     chain = Chain()
     env = TestEnvironment(accounts[0])
     env.enableCurrency("DAI", CurrencyDefaults)
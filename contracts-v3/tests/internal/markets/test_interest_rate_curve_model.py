@@ -0,0 +1,216 @@
+import brownie
+import numpy as np
+import pytest
+from brownie import Contract
+from brownie.network import Rpc
+from brownie.network.state import Chain
+from brownie.test import given, strategy
+from scripts.models.cash_group import CashGroupParameters, build_cash_group
+from scripts.models.interest_rate_curve import (
+    MarketParameters,
+    calculate_fcash_trade,
+    from_curve_settings,
+    get_fcash_given_cash_amount,
+    get_interest_rate,
+    get_post_fee_interest_rate,
+    get_utilization_from_interest_rate,
+)
+from scripts.models.prime_rate import PrimeRate
+from scripts.models.solidity import Revert
+from scripts.models.trade_curve import calculate_fcash_given_cash, calculate_trades
+from tests.constants import (
+    CASH_GROUP_PARAMETERS,
+    MARKETS,
+    RATE_PRECISION,
+    SECONDS_IN_DAY,
+    SETTLEMENT_DATE,
+    START_TIME,
+    ZERO_ADDRESS,
+)
+from tests.helpers import get_interest_rate_curve, get_market_state
+
+chain = Chain()
+
+
+def assert_model_matches(chainCall, modelCall):
+    # The model must revert exactly when the contract reverts
+    try:
+        expected = modelCall()
+    except Revert:
+        with brownie.reverts():
+            chainCall()
+        return None
+
+    assert chainCall() == expected
+    return expected
+
+
+@pytest.mark.market
+class TestInterestRateCurveModel:
+    @pytest.fixture(scope="module", autouse=True)
+    def market(self, MockMarket, MockSettingsLib, UnderlyingHoldingsOracle, accounts):
+        settingsLib = MockSettingsLib.deploy({"from": accounts[0]})
+        market = MockMarket.deploy(settingsLib, {"from": accounts[0]})
+        mock = Contract.from_abi(
+            "mock", market.address, MockSettingsLib.abi + market.abi, owner=accounts[0]
+        )
+        oracle = UnderlyingHoldingsOracle.deploy(mock.address, ZERO_ADDRESS, {"from": accounts[0]})
+
+        # 100_000e18 ETH
+        Rpc().backend._request(
+            "evm_setAccountBalance",
+            [mock.address, "0x00000000000000000000000000000000000000000000152d02c7e14af6800000"],
+        )
+        mock.initPrimeCashCurve(
+            1, 100_000e8, 0, get_interest_rate_curve(), oracle, True, {"from": accounts[0]}
+        )
+        mock.setCashGroup(1, CASH_GROUP_PARAMETERS)
+
+        return mock
+
+    @pytest.fixture(scope="module", autouse=True)
+    def curve(self, MockInterestRateCurve, accounts):
+        return accounts[0].deploy(MockInterestRateCurve)
+
+    @pytest.fixture(autouse=True)
+    def isolation(self, fn_isolation):
+        pass
+
+    @given(
+        kinkUtilization1=strategy("uint8", min_value=1, max_value=98),
+        kinkRate1=strategy("uint8", min_value=1, max_value=254),
+        maxRateUnits=strategy("uint8", min_value=1),
+        feeRatePercent=strategy("uint8", max_value=99),
+        utilization=strategy("uint", max_value=1.01e9),
+        isBorrow=strategy("bool"),
+    )
+    def test_interest_rates(
+        self,
+        curve,
+        kinkUtilization1,
+        kinkRate1,
+        maxRateUnits,
+        feeRatePercent,
+        utilization,
+        isBorrow,
+    ):
+        settings = get_interest_rate_curve(
+            kinkUtilization1=kinkUtilization1,
+            kinkUtilization2=kinkUtilization1 + 1,
+            kinkRate1=kinkRate1,
+            kinkRate2=kinkRate1 + 1,
+            maxRateUnits=maxRateUnits,
+            feeRatePercent=feeRatePercent,
+        )
+        curve.setNextInterestRateParameters(1, 1, settings)
+        curve.setActiveInterestRateParameters(1)
+        irParams = from_curve_settings(settings)
+        assert curve.getActiveInterestRateParameters(1, 1) == irParams
+
+        def model():
+            preFee = get_interest_rate(irParams, utilization)
+            return (preFee, get_post_fee_interest_rate(irParams, preFee, isBorrow))
+
+        rates = assert_model_matches(
+            lambda: curve.getInterestRates(1, 1, isBorrow, utilization), model
+        )
+        if rates is not None:
+            assert_model_matches(
+                lambda: curve.getUtilizationFromInterestRate(1, 1, rates[0]),
+                lambda: get_utilization_from_interest_rate(irParams, rates[0]),
+            )
+
+    @given(
+        fCashAmount=strategy("int", min_value=-100_000e8, max_value=100_000e8),
+        totalfCash=strategy("int", min_value=1e8, max_value=1_000_000e8),
+        totalPrimeCash=strategy("int", min_value=1e8, max_value=1_000_000e8),
+        days=strategy("uint", min_value=1, max_value=360),
+    )
+    def test_calculate_trade(self, market, fCashAmount, totalfCash, totalPrimeCash, days):
+        settings = get_interest_rate_curve()
+        market.setInterestRateParameters(1, 1, settings)
+        marketState = get_market_state(
+            MARKETS[0], totalfCash=totalfCash, totalPrimeCash=totalPrimeCash
+        )
+        market.setMarketStorage(1, SETTLEMENT_DATE, marketState)
+        marketState = market.buildMarket(1, MARKETS[0], START_TIME, True, 1)
+        cashGroup = market.buildCashGroupView(1)
+        timeToMaturity = days * SECONDS_IN_DAY
+
+        try:
+            (newMarket, netPrimeCash, primeCashToReserve, _) = calculate_fcash_trade(
+                MarketParameters(*marketState),
+                build_cash_group(cashGroup),
+                from_curve_settings(settings),
+                fCashAmount,
+                timeToMaturity,
+                1,
+                chain.time(),
+            )
+        except Revert:
+            with brownie.reverts():
+                market.calculateTrade(marketState, cashGroup, fCashAmount, timeToMaturity, 1)
+            return
+
+        (chainMarket, chainPrimeCash, chainReserve) = market.calculateTrade(
+            marketState, cashGroup, fCashAmount, timeToMaturity, 1
+        )
+        assert chainPrimeCash == netPrimeCash
+        assert chainReserve == primeCashToReserve
+        # Previous trade time is block.timestamp of the call and is not compared
+        assert chainMarket[:7] == newMarket[:7]
+
+    @given(
+        utilization=strategy(
+            "uint", min_value=0.05 * RATE_PRECISION, max_value=0.95 * RATE_PRECISION
+        ),
+        netCashAmount=strategy("int", min_value=-100_000e8, max_value=100_000e8),
+        days=strategy("uint", min_value=1, max_value=360),
+    )
+    def test_fcash_given_cash_amount(self, market, utilization, netCashAmount, days):
+        settings = get_interest_rate_curve()
+        market.setInterestRateParameters(1, 1, settings)
+        totalfCash = 10_000_000 * 10 ** 8
+        totalCashUnderlying = totalfCash * (RATE_PRECISION - utilization) // utilization
+        timeToMaturity = days * SECONDS_IN_DAY
+
+        assert_model_matches(
+            lambda: market.getfCashAmountGivenCashAmount(
+                1, totalfCash, totalCashUnderlying, netCashAmount, 1, timeToMaturity
+            ),
+            lambda: get_fcash_given_cash_amount(
+                from_curve_settings(settings),
+                totalfCash,
+                netCashAmount,
+                totalCashUnderlying,
+                timeToMaturity,
+            ),
+        )
+
+
+def test_trade_curve_matches_model():
+    irParams = from_curve_settings(get_interest_rate_curve())
+    cashGroup = CashGroupParameters(1, 7, PrimeRate(10 ** 36, 10 ** 36, 0), 50 << 24)
+    (totalfCash, totalPrimeCash, timeToMaturity) = (10 ** 14, 10 ** 14, 90 * SECONDS_IN_DAY)
+    fCash = np.linspace(-5e13, 5e13, 101).astype(np.int64)
+
+    exact = calculate_trades(irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, fCash)
+    fast = calculate_trades(
+        irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, fCash, exact=False
+    )
+    market = MarketParameters(0, 0, totalfCash, totalPrimeCash, 0, 0, 0, 0)
+    for (i, f) in enumerate(fCash):
+        (_, cash, _, _) = calculate_fcash_trade(
+            market, cashGroup, irParams, int(f), timeToMaturity, 1, 0
+        )
+        assert exact["primeCashToAccount"][i] == cash
+        assert pytest.approx(fast["primeCashToAccount"][i], rel=1e-6, abs=100) == cash
+
+    cash = np.linspace(-5e13, 5e13, 11).astype(np.int64)
+    exactfCash = calculate_fcash_given_cash(
+        irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, cash
+    )
+    fastfCash = calculate_fcash_given_cash(
+        irParams, cashGroup, totalfCash, totalPrimeCash, timeToMaturity, cash, exact=False
+    )
+    assert np.allclose(exactfCash.astype(np.float64), fastfCash, rtol=1e-6, atol=100)
@@ -0,0 +1,165 @@
+import random
+
+import pytest
+from brownie.network.contract import Contract
+from scripts.models.bitmap import (
+    get_bit_nums,
+    get_next_bit_num,
+    is_bit_set,
+    set_bit,
+    total_bits_set,
+)
+from scripts.models.date_time import (
+    DAY,
+    MAX_BIT_NUM,
+    MAX_QUARTER_OFFSET,
+    QUARTER,
+    get_bit_num_from_maturity,
+    get_market_index,
+    get_maturity_from_bit_num,
+    get_reference_time,
+    get_traded_market,
+    is_valid_market_maturity,
+    is_valid_maturity,
+)
+from scripts.models.solidity import Revert
+from tests.constants import START_TIME_TREF
+
+# The bit layout only depends on the block time's day within the quarter, which also fixes its
+# day within the week and month. By default a sample of days is checked offline, run with
+# --exhaustive to check every day of the quarter against every maturity up to the last bit.
+SAMPLED_DAYS = 10
+DIFFERENTIAL_SAMPLES = 25
+
+
+@pytest.fixture(scope="module")
+def exhaustive(request):
+    return request.config.getoption("exhaustive")
+
+
+def get_block_times(exhaustive):
+    days = range(QUARTER // DAY)
+    if not exhaustive:
+        days = random.sample(days, SAMPLED_DAYS)
+
+    # Bit numbers are relative to midnight, so the time of day must not change the layout
+    return [START_TIME_TREF + d * DAY + s for d in days for s in [0, random.randint(1, DAY - 1)]]
+
+
+def test_bit_num_layout(exhaustive):
+    random.seed(17)
+    for blockTime in get_block_times(exhaustive):
+        blockTimeUTC0 = blockTime - blockTime % DAY
+        maturities = [get_maturity_from_bit_num(blockTime, b) for b in range(1, MAX_BIT_NUM + 1)]
+        assert maturities[0] == blockTimeUTC0 + DAY
+        assert all(m1 < m2 for (m1, m2) in zip(maturities, maturities[1:]))
+
+        bitNum = 0
+        for days in range(0, MAX_QUARTER_OFFSET + 2 * QUARTER // DAY):
+            maturity = blockTimeUTC0 + days * DAY
+            if bitNum < MAX_BIT_NUM and maturities[bitNum] == maturity:
+                bitNum += 1
+                expected = (bitNum, True)
+            elif days == 0:
+                expected = (0, False)
+            elif days > MAX_QUARTER_OFFSET:
+                expected = (MAX_BIT_NUM, False)
+            else:
+                # Maturities between bits round down to the previous bit
+                expected = (bitNum, False)
+
+            assert get_bit_num_from_maturity(blockTime, maturity) == expected
+            # Maturities must fall on midnight
+            assert get_bit_num_from_maturity(blockTime, maturity + 1) == (0, False)
+
+
+def test_valid_maturities(exhaustive):
+    random.seed(19)
+    for blockTime in get_block_times(exhaustive):
+        tRef = get_reference_time(blockTime)
+        for maxMarketIndex in range(1, 8):
+            maxMaturity = tRef + get_traded_market(maxMarketIndex)
+            markets = [tRef + get_traded_market(i) for i in range(1, maxMarketIndex + 1)]
+            for bitNum in range(1, MAX_BIT_NUM + 1):
+                maturity = get_maturity_from_bit_num(blockTime, bitNum)
+                assert is_valid_maturity(maxMarketIndex, maturity, blockTime) == (
+                    maturity <= maxMaturity
+                )
+                assert is_valid_market_maturity(maxMarketIndex, maturity, blockTime) == (
+                    maturity in markets
+                )
+
+            for (i, maturity) in enumerate(markets):
+                assert get_market_index(maxMarketIndex, maturity, blockTime) == (i + 1, False)
+                assert get_market_index(maxMarketIndex, maturity - DAY, blockTime) == (i + 1, True)
+
+            with pytest.raises(Revert):
+                get_market_index(maxMarketIndex, maxMaturity + DAY, blockTime)
+
+
+def test_bitmap_helpers(exhaustive):
+    random.seed(23)
+    for _ in range(10_000 if exhaustive else 500):
+        bitmap = random.getrandbits(256) & random.getrandbits(256)
+        bitstring = "{:0256b}".format(bitmap)
+        bitNums = [i + 1 for (i, b) in enumerate(bitstring) if b == "1"]
+
+        assert get_bit_nums(bitmap) == bitNums
+        assert total_bits_set(bitmap) == len(bitNums)
+        assert get_next_bit_num(bitmap) == (bitNums[0] if bitNums else 0)
+
+        index = random.randint(1, 256)
+        assert is_bit_set(bitmap, index) == (index in bitNums)
+        assert is_bit_set(set_bit(bitmap, index, True), index)
+        assert not is_bit_set(set_bit(bitmap, index, False), index)
+        assert total_bits_set(set_bit(bitmap, index, False)) == len(bitNums) - (index in bitNums)
+
+
+class TestDateTimeDifferential:
+    @pytest.fixture(scope="module", autouse=True)
+    def dateTime(self, MockCashGroup, MockSettingsLib, accounts):
+        settings = MockSettingsLib.deploy({"from": accounts[0]})
+        mock = MockCashGroup.deploy(settings, {"from": accounts[0]})
+        return Contract.from_abi(
+            "mock", mock.address, MockSettingsLib.abi + mock.abi, owner=accounts[0]
+        )
+
+    @pytest.fixture(scope="module", autouse=True)
+    def mockBitmap(self, MockBitmap, accounts):
+        return accounts[0].deploy(MockBitmap)
+
+    def test_date_time_matches_mock(self, dateTime):
+        random.seed(29)
+        for _ in range(DIFFERENTIAL_SAMPLES):
+            blockTime = START_TIME_TREF + random.randint(0, 4 * QUARTER)
+            maturity = blockTime - blockTime % DAY + random.randint(0, 7700) * DAY
+            bitNum = random.randint(1, MAX_BIT_NUM)
+            maxMarketIndex = random.randint(1, 7)
+
+            assert dateTime.getBitNumFromMaturity(blockTime, maturity) == (
+                get_bit_num_from_maturity(blockTime, maturity)
+            )
+            assert dateTime.getMaturityFromBitNum(blockTime, bitNum) == (
+                get_maturity_from_bit_num(blockTime, bitNum)
+            )
+            assert dateTime.isValidMaturity(maxMarketIndex, maturity, blockTime) == (
+                is_valid_maturity(maxMarketIndex, maturity, blockTime)
+            )
+            assert dateTime.isValidMarketMaturity(maxMarketIndex, maturity, blockTime) == (
+                is_valid_market_maturity(maxMarketIndex, maturity, blockTime)
+            )
+
+    def test_bitmap_matches_mock(self, mockBitmap):
+        random.seed(31)
+        for _ in range(DIFFERENTIAL_SAMPLES):
+            bitmap = random.getrandbits(256) & random.getrandbits(256)
+            bitmapBytes = bitmap.to_bytes(32, "big")
+            index = random.randint(1, 256)
+            setOn = random.choice([True, False])
+
+            assert mockBitmap.isBitSet(bitmapBytes, index) == is_bit_set(bitmap, index)
+            assert int(mockBitmap.setBit(bitmapBytes, index, setOn).hex(), 16) == set_bit(
+                bitmap, index, setOn
+            )
+            assert mockBitmap.totalBitsSet(bitmapBytes) == total_bits_set(bitmap)
+            assert mockBitmap.getNextBitNum(bitmapBytes) == get_next_bit_num(bitmap)
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+from brownie.convert.datatypes import HexString
+from brownie.network.state import Chain
+from scripts.models.ntoken import (
+    build_ntoken,
+    get_liquidity_token_withdraw,
+    get_ntoken_market_value,
+    get_ntoken_prime_pv,
+    project_ntoken_values,
+)
+from tests.constants import MARKETS, SECONDS_IN_QUARTER, SETTLEMENT_DATE, START_TIME_TREF
+from tests.helpers import get_bitmap_from_bitlist, get_fcash_token
+from tests.internal.liquidation.liquidation_helpers import ValuationMock
+
+chain = Chain()
+nineMonth = START_TIME_TREF + 3 * SECONDS_IN_QUARTER
+
+
+def set_ifcash_residual(mock, currencyId, notional):
+    tokenAddress = mock.getNTokenAddress(currencyId)
+    # Bitmap assets are read and written through the nToken's account context
+    mock.setAccountContext(
+        tokenAddress, (START_TIME_TREF, "0x00", 0, currencyId, HexString(0, "bytes18"), False)
+    )
+    ifCash = get_fcash_token(0, currencyId=currencyId, maturity=nineMonth, notional=notional)
+    mock.setBitmapAssets(tokenAddress, [ifCash])
+
+
+def load_model(mock, currencyId):
+    nToken = mock.getNToken(currencyId)
+    tokenAddress = mock.getNTokenAddress(currencyId)
+    markets = [mock.getMarket(currencyId, m, SETTLEMENT_DATE) for m in MARKETS[0:3]]
+    return (nToken, build_ntoken(nToken, mock.getBitmapAssets(tokenAddress), markets))
+
+
+@pytest.mark.valuation
+class TestNTokenModel:
+    @pytest.fixture(scope="module", autouse=True)
+    def freeCollateral(self, MockFreeCollateral, accounts):
+        return ValuationMock(accounts[0], MockFreeCollateral)
+
+    @pytest.fixture(scope="module", autouse=True)
+    def nTokenRedeem(self, MockNTokenRedeem, accounts):
+        return ValuationMock(accounts[0], MockNTokenRedeem)
+
+    @pytest.fixture(autouse=True)
+    def isolation(self, fn_isolation):
+        pass
+
+    def test_ntoken_pv_matches_view(self, freeCollateral):
+        mock = freeCollateral.mock
+        random.seed(11)
+        blockTimes = [START_TIME_TREF + random.randint(0, SECONDS_IN_QUARTER) for _ in range(5)]
+        # Past settlement the nToken is valued one second before the next settle time
+        blockTimes.append(START_TIME_TREF + SECONDS_IN_QUARTER + 3600)
+
+        for currencyId in range(1, 5):
+            set_ifcash_residual(mock, currencyId, random.randint(-50_000e8, 50_000e8))
+            (_, model) = load_model(mock, currencyId)
+
+            values = project_ntoken_values(model, blockTimes)
+            for (i, blockTime) in enumerate(blockTimes):
+                pv = mock.getNTokenPV(currencyId, blockTime)
+                assert get_ntoken_prime_pv(model, blockTime) == pv
+                assert values["primePV"][i] == pv
+
+            assert values["oracleValue"][-1] is None
+
+    def test_market_value_and_withdraw_match_chain(self, nTokenRedeem):
+        mock = nTokenRedeem.mock
+        set_ifcash_residual(mock, 1, 20_000e8)
+        (nToken, model) = load_model(mock, 1)
+        bitmapList = ["0"] * 256
+        bitmapList[119] = "1"  # Set the nine month to 1
+        bitmap = get_bitmap_from_bitlist(bitmapList)
+
+        for blockTime in [START_TIME_TREF, START_TIME_TREF + 30 * 86400, SETTLEMENT_DATE - 1]:
+            (totalValue, netfCash) = mock.getNTokenMarketValue(nToken, blockTime)
+            assert get_ntoken_market_value(model, blockTime) == (totalValue, list(netfCash))
+
+            (tokens, netfCash) = mock.getLiquidityTokenWithdraw(nToken, 5_000e8, blockTime, 0)
+            assert get_liquidity_token_withdraw(model, 5_000e8, blockTime, []) == (
+                list(tokens),
+                list(netfCash),
+            )
+
+            (tokens, netfCash) = mock.getLiquidityTokenWithdraw(nToken, 5_000e8, blockTime, bitmap)
+            assert get_liquidity_token_withdraw(model, 5_000e8, blockTime) == (
+                list(tokens),
+                list(netfCash),
+            )
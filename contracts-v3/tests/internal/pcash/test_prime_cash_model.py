@@ -0,0 +1,108 @@
+import math
+
+import brownie
+import pytest
+from brownie import Contract
+from brownie.network import Rpc
+from brownie.test import given, strategy
+from scripts.models.interest_rate_curve import from_curve_settings
+from scripts.models.prime_cash_exchange_rate import (
+    get_prime_cash_rate_view,
+    get_prime_interest_rates,
+    project_prime_rates,
+)
+from scripts.models.prime_rate import (
+    PrimeRate,
+    convert_debt_storage_to_underlying,
+    convert_from_storage,
+    convert_from_underlying,
+    convert_to_storage_value,
+    convert_to_underlying,
+    convert_underlying_to_debt_storage,
+)
+from scripts.models.solidity import Revert
+from tests.constants import RATE_PRECISION, SECONDS_IN_DAY, SECONDS_IN_YEAR, ZERO_ADDRESS
+from tests.helpers import get_interest_rate_curve
+
+
+class TestPrimeCashModel:
+    @pytest.fixture(autouse=True)
+    def isolation(self, fn_isolation):
+        pass
+
+    @pytest.fixture(scope="module", autouse=True)
+    def mock(self, MockPrimeCash, MockSettingsLib, accounts):
+        settingsLib = MockSettingsLib.deploy({"from": accounts[0]})
+        mock = MockPrimeCash.deploy(settingsLib, {"from": accounts[0]})
+        # 100_000e18 ETH
+        Rpc().backend._request(
+            "evm_setAccountBalance",
+            [mock.address, "0x00000000000000000000000000000000000000000000152d02c7e14af6800000"],
+        )
+
+        return Contract.from_abi(
+            "mock", mock.address, MockSettingsLib.abi + mock.abi, owner=accounts[0]
+        )
+
+    @pytest.fixture(scope="module", autouse=True)
+    def oracle(self, UnderlyingHoldingsOracle, mock, accounts):
+        return UnderlyingHoldingsOracle.deploy(mock.address, ZERO_ADDRESS, {"from": accounts[0]})
+
+    def init_curve(self, mock, oracle, utilization, **kwargs):
+        settings = get_interest_rate_curve(**kwargs)
+        debt = math.floor(100_000e8 * (utilization / (RATE_PRECISION - utilization)))
+        txn = mock.initPrimeCashCurve(1, 100_000e8, debt, settings, oracle, True)
+        return (txn, from_curve_settings(settings))
+
+    @given(
+        offset=strategy("uint", max_value=SECONDS_IN_YEAR),
+        utilization=strategy("uint", max_value=0.99e9),
+        feeRatePercent=strategy("uint8", max_value=99),
+    )
+    def test_prime_rate_view(self, mock, oracle, offset, utilization, feeRatePercent):
+        (txn, irParams) = self.init_curve(mock, oracle, utilization, feeRatePercent=feeRatePercent)
+        factors = mock.getPrimeCashFactors(1)
+        assert mock.getPrimeInterestRates(1) == get_prime_interest_rates(irParams, factors)
+
+        (pr, viewFactors) = mock.buildPrimeRateView(1, txn.timestamp + offset)
+        (modelRate, modelFactors) = get_prime_cash_rate_view(
+            irParams, factors, txn.timestamp + offset, viewFactors["lastTotalUnderlyingValue"]
+        )
+        assert pr == modelRate
+        assert viewFactors == modelFactors
+
+    @given(utilization=strategy("uint", min_value=0.01e9, max_value=0.99e9))
+    def test_accrued_projection_matches_stateful(self, mock, oracle, utilization):
+        (txn, irParams) = self.init_curve(mock, oracle, utilization)
+        factors = mock.getPrimeCashFactors(1)
+        blockTimes = [txn.timestamp + d * SECONDS_IN_DAY for d in (1, 7, 30, 90)]
+        projected = project_prime_rates(
+            irParams, factors, blockTimes, factors["lastTotalUnderlyingValue"], accrue=True
+        )
+
+        for (blockTime, pr) in zip(blockTimes, projected["primeRate"]):
+            assert mock.buildPrimeRateStateful(1, blockTime).return_value == pr
+
+    @given(
+        balance=strategy("int", min_value=-1_000_000e8, max_value=1_000_000e8),
+        supplyFactor=strategy("uint", min_value=1e34, max_value=1e38),
+        debtPremium=strategy("uint", max_value=1e37),
+    )
+    def test_conversions(self, mock, balance, supplyFactor, debtPremium):
+        pr = PrimeRate(supplyFactor, supplyFactor + debtPremium, 0)
+        for (chainCall, modelCall) in [
+            (mock.convertToUnderlying, convert_to_underlying),
+            (mock.convertFromUnderlying, convert_from_underlying),
+            (mock.convertFromStorage, convert_from_storage),
+            (mock.convertToStorageValue, convert_to_storage_value),
+            (mock.convertDebtStorageToUnderlying, convert_debt_storage_to_underlying),
+            (mock.convertUnderlyingToDebtStorage, convert_underlying_to_debt_storage),
+        ]:
+            try:
+                expected = modelCall(pr, balance)
+            except Revert:
+                with brownie.reverts():
+                    chainCall(pr, balance)
+                continue
+
+            assert chainCall(pr, balance) == expected
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+from brownie import MockAggregator
+from brownie.network.contract import Contract
+from brownie.network.state import Chain
+from scripts.models.cash_group import build_cash_group
+from scripts.models.exchange_rate import build_exchange_rate
+from scripts.models.free_collateral import (
+    AccountState,
+    CurrencyState,
+    FreeCollateralSnapshot,
+)
+from scripts.models.interest_rate_curve import MarketParameters
+from tests.constants import START_TIME_TREF
+from tests.helpers import get_fcash_token, get_portfolio_array
+from tests.internal.liquidation.liquidation_helpers import ValuationMock
+
+chain = Chain()
+
+
+def load_mock_snapshot(mock, accounts, blockTime):
+    currencies = {}
+    for currencyId in range(1, 5):
+        rateStorage = mock.getETHRate(currencyId)
+        aggregator = Contract.from_abi("agg", rateStorage[0], MockAggregator.abi)
+        markets = [MarketParameters(*m) for m in mock.getActiveMarkets(currencyId)]
+        nToken = mock.getNToken(currencyId)
+        currencies[currencyId] = CurrencyState(
+            build_cash_group(mock.buildCashGroupView(currencyId)),
+            build_exchange_rate(currencyId, rateStorage, aggregator.latestAnswer()),
+            {m.maturity: m.oracleRate for m in markets},
+            mock.getNTokenPV(currencyId, blockTime),
+            nToken["totalSupply"],
+            bytes(nToken["parameters"]),
+        )
+
+    accountStates = []
+    for account in accounts:
+        context = mock.getAccountContext(account)
+        balances = {}
+        for currencyId in range(1, 5):
+            (cashBalance, nTokenBalance, _, _) = mock.getBalance(account, currencyId, blockTime)
+            balances[currencyId] = (cashBalance, nTokenBalance)
+        portfolio = (
+            mock.getBitmapAssets(account) if context[3] != 0 else mock.getPortfolio(account)
+        )
+        accountStates.append(
+            AccountState(account.address, context[3], context[4], balances, portfolio)
+        )
+
+    return FreeCollateralSnapshot(currencies, blockTime, accountStates)
+
+
+@pytest.mark.valuation
+class TestFreeCollateralModel:
+    @pytest.fixture(scope="module", autouse=True)
+    def freeCollateral(self, MockFreeCollateral, accounts):
+        return ValuationMock(accounts[0], MockFreeCollateral)
+
+    @pytest.fixture(autouse=True)
+    def isolation(self, fn_isolation):
+        pass
+
+    def test_free_collateral_matches_view(self, freeCollateral, accounts):
+        mock = freeCollateral.mock
+        random.seed(7)
+        for account in accounts[1:7]:
+            for currency in range(1, 4):
+                mock.setBalance(
+                    account,
+                    currency,
+                    random.randint(-100_000e8, 100_000e8),
+                    random.randint(0, 100_000e8),
+                )
+            assets = get_portfolio_array(
+                4, [(1, 3), (2, 3), (3, 3)], sorted=True, noLiquidity=True
+            )
+            mock.setPortfolio(account, ([], assets, 0, 0))
+
+        for account in accounts[7:9]:
+            freeCollateral.enableBitmapForAccount(account, 2, START_TIME_TREF)
+            mock.setBalance(account, 2, random.randint(-100_000e8, 100_000e8), 0)
+            mock.setBalance(account, 3, random.randint(0, 100_000e8), random.randint(0, 100e8))
+            assets = []
+            for bitNum in random.sample(range(1, 130), 5):
+                maturity = mock.getMaturityFromBitNum(START_TIME_TREF, bitNum)
+                notional = random.randint(-500_000e8, 500_000e8)
+                assets.append(
+                    get_fcash_token(0, maturity=maturity, notional=notional, currencyId=2)
+                )
+            mock.setBitmapAssets(account, assets)
+
+        chain.mine(1)
+        blockTime = chain[-1].timestamp
+        snapshot = load_mock_snapshot(mock, accounts[1:9], blockTime)
+        results = snapshot.get_free_collateral_batch(snapshot.accounts)
+        assert not results["reverted"].any()
+
+        for (i, account) in enumerate(accounts[1:9]):
+            (fc, netLocal) = mock.getFreeCollateralView(account, blockTime)
+            (modelFC, modelNetLocal) = snapshot.get_free_collateral(snapshot.accounts[i])
+            assert modelFC == fc
+            assert results["netETHValue"][i] == fc
+            # Unused entries in the chain's fixed size array are zero
+            assert list(netLocal) == modelNetLocal + [0] * (len(netLocal) - len(modelNetLocal))
@@ -5,7 +5,7 @@ import math
 from brownie import Wei, ZERO_ADDRESS, accounts, Contract, interface, FlashLiquidator
 from brownie.network.state import Chain
 from brownie.convert import to_bytes
-from scripts.mainnet.V3Environment import V3Environment
+from scripts.mainnet.V3Environment import getCachedEnvironment
 from tests.helpers import get_balance_action, get_balance_trade_action
 
 chain = Chain()
@@ -18,7 +18,7 @@ def run_around_tests():
     
 @pytest.fixture(scope="module", autouse=True)
 def v3env(accounts):
-    return V3Environment(accounts)
+    return getCachedEnvironment(accounts, "v2.mainnet.json", True, True)
 
 def underlyingPrecision(env, currencyId):
     if (currencyId == 1):
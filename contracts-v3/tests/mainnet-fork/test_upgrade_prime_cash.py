@@ -6,13 +6,13 @@ from brownie.network import Chain
 from brownie.convert.datatypes import Wei
 from tests.helpers import get_balance_action
 from scripts.deployment import deployArtifact
-from scripts.mainnet.V3Environment import V3Environment
+from scripts.mainnet.V3Environment import getCachedEnvironment
 
 chain = Chain()
 
 @pytest.fixture(scope="module", autouse=True)
 def v3env(accounts):
-    return V3Environment(accounts)
+    return getCachedEnvironment(accounts, "v2.mainnet.json", True, True)
 
 @pytest.fixture(autouse=True)
 def isolation(fn_isolation):
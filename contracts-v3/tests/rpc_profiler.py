@@ -0,0 +1,177 @@
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import pytest
+
+# Counts and times every JSON-RPC request made to the node by each test and by each line of
+# project code that triggered it, to separate tests that are slow because of round trips from
+# tests that are slow because of EVM execution. Enabled with:
+#   brownie test tests/internal --rpc-profile
+# Writes rpc_profile.json and prints the worst tests and call sites at the end of the run. Under
+# xdist every worker sends its counts back to the controller, which merges them into one report.
+
+OUTPUT_FILE = "rpc_profile.json"
+SUMMARY_LIMIT = 15
+SESSION = "<session>"
+
+_projectRoot = os.getcwd() + os.sep
+_thisFile = os.path.abspath(__file__)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--rpc-profile",
+        action="store_true",
+        default=False,
+        help="Count and time RPC requests per test and per call site",
+    )
+
+
+def _call_site():
+    # First frame in project code, skipping this file and anything installed in site-packages
+    frame = sys._getframe(2)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_projectRoot) and path != _thisFile and "site-packages" not in path:
+            return "{}:{} {}".format(
+                path[len(_projectRoot) :], frame.f_lineno, frame.f_code.co_name
+            )
+        frame = frame.f_back
+    return "<external>"
+
+
+class RpcProfiler:
+    def __init__(self):
+        self.currentTest = SESSION
+        # Maps test nodeid or call site -> method -> [count, seconds]
+        self.tests = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        self.sites = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        self.testDurations = {}
+        self.provider = None
+
+    def wrap_provider(self):
+        from brownie.network import web3
+
+        provider = web3.provider
+        if provider is None or provider is self.provider:
+            return
+        makeRequest = provider.make_request
+
+        def make_request(method, params):
+            start = time.perf_counter()
+            try:
+                return makeRequest(method, params)
+            finally:
+                elapsed = time.perf_counter() - start
+                for stats in (self.tests[self.currentTest], self.sites[_call_site()]):
+                    stats[method][0] += 1
+                    stats[method][1] += elapsed
+
+        provider.make_request = make_request
+        self.provider = provider
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        # Brownie connects during session start, the provider is wrapped on first use and again
+        # whenever it is replaced
+        self.wrap_provider()
+        self.currentTest = item.nodeid
+        start = time.perf_counter()
+        yield
+        self.testDurations[item.nodeid] = time.perf_counter() - start
+        self.currentTest = SESSION
+
+    def _ranked(self, stats, key):
+        rows = []
+        for (name, methods) in stats.items():
+            row = {
+                key: name,
+                "calls": sum(c for (c, _) in methods.values()),
+                "rpcTime": sum(t for (_, t) in methods.values()),
+                "methods": {
+                    m: {"calls": c, "time": round(t, 4)} for (m, (c, t)) in sorted(methods.items())
+                },
+            }
+            if name in self.testDurations:
+                row["duration"] = round(self.testDurations[name], 4)
+                row["otherTime"] = round(max(row["duration"] - row["rpcTime"], 0), 4)
+            rows.append(row)
+
+        rows.sort(key=lambda r: -r["rpcTime"])
+        for row in rows:
+            row["rpcTime"] = round(row["rpcTime"], 4)
+        return rows
+
+    def report(self):
+        totals = defaultdict(lambda: [0, 0.0])
+        for methods in self.tests.values():
+            for (m, (c, t)) in methods.items():
+                totals[m][0] += c
+                totals[m][1] += t
+
+        return {
+            "methods": {
+                m: {"calls": c, "time": round(t, 4)}
+                for (m, (c, t)) in sorted(totals.items(), key=lambda x: -x[1][1])
+            },
+            "tests": self._ranked(self.tests, "test"),
+            "callSites": self._ranked(self.sites, "site"),
+        }
+
+    def toData(self):
+        # Plain containers so the counts can be sent from xdist workers to the controller
+        return {
+            "tests": {n: dict(methods) for (n, methods) in self.tests.items()},
+            "sites": {n: dict(methods) for (n, methods) in self.sites.items()},
+            "testDurations": self.testDurations,
+        }
+
+    def merge(self, data):
+        for (attr, stats) in (("tests", self.tests), ("sites", self.sites)):
+            for (name, methods) in data[attr].items():
+                for (m, (c, t)) in methods.items():
+                    stats[name][m][0] += c
+                    stats[name][m][1] += t
+        self.testDurations.update(data["testDurations"])
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        workerOutput = getattr(node, "workeroutput", {})
+        if "rpcProfile" in workerOutput:
+            self.merge(workerOutput["rpcProfile"])
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(session.config, "workerinput"):
+            session.config.workeroutput["rpcProfile"] = self.toData()
+            return
+
+        with open(OUTPUT_FILE, "w") as f:
+            json.dump(self.report(), f, indent=4)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        report = self.report()
+        tr = terminalreporter
+        tr.section("rpc profile")
+        tr.write_line("{:<28} {:>10} {:>10}".format("method", "calls", "seconds"))
+        for (m, s) in report["methods"].items():
+            tr.write_line("{:<28} {:>10} {:>10.2f}".format(m, s["calls"], s["time"]))
+
+        for (title, rows, key) in (
+            ("tests", report["tests"], "test"),
+            ("call sites", report["callSites"], "site"),
+        ):
+            tr.write_line("")
+            tr.write_line("slowest {} by rpc time".format(title))
+            for row in rows[:SUMMARY_LIMIT]:
+                tr.write_line(
+                    "{:>8.2f}s {:>7} calls  {}".format(row["rpcTime"], row["calls"], row[key])
+                )
+        tr.write_line("full report written to {}".format(OUTPUT_FILE))
+
+
+def pytest_configure(config):
+    if config.getoption("rpc_profile"):
+        config.pluginmanager.register(RpcProfiler(), "rpc-profiler")
@@ -0,0 +1,158 @@
+import math
+
+import pytest
+from brownie import ZERO_ADDRESS, FlashLiquidator, MockAaveFlashLender
+from brownie.network.state import Chain
+from liquidation_fixtures import *
+from scripts.config import nTokenDefaults
+from scripts.liquidation_scanner import (
+    COLLATERAL_CURRENCY,
+    LOCAL_CURRENCY,
+    get_flash_liquidation_args,
+    load_tokens,
+    scan_liquidations,
+)
+from scripts.models.free_collateral import load_snapshot
+from tests.helpers import get_balance_trade_action
+
+chain = Chain()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def weth(MockWETH, accounts):
+    return MockWETH.deploy({"from": accounts[9]})
+
+
+@pytest.fixture(scope="module", autouse=True)
+def flashLender(weth, env, accounts):
+    lender = MockAaveFlashLender.deploy(weth.address, accounts[0], {"from": accounts[0]})
+    env.token["DAI"].transfer(lender.address, 100_000e18, {"from": accounts[0]})
+    return lender
+
+
+@pytest.fixture(scope="module", autouse=True)
+def flashLiquidator(weth, env, flashLender, accounts):
+    liquidator = FlashLiquidator.deploy(
+        env.notional.address,
+        flashLender.address,
+        weth.address,
+        ZERO_ADDRESS,
+        accounts[0],
+        ZERO_ADDRESS,
+        False,
+        {"from": accounts[0]},
+    )
+    liquidator.enableCurrencies([1, 2, 3], {"from": accounts[0]})
+    return liquidator
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    pass
+
+
+def setup_local_currency_liquidation(env, account, currencyId):
+    decimals = env.notional.getCurrency(currencyId)["underlyingToken"]["decimals"]
+    action = get_balance_trade_action(
+        currencyId,
+        "DepositUnderlying",
+        [{"tradeActionType": "Borrow", "marketIndex": 1, "notional": 100e8, "maxSlippage": 0}],
+        depositActionAmount=27 * decimals,
+        withdrawEntireCashBalance=False,
+    )
+    env.notional.batchBalanceAndTradeAction(account, [action], {"from": account})
+
+    action = get_balance_trade_action(
+        currencyId,
+        "ConvertCashToNToken",
+        [],
+        depositActionAmount=env.notional.getAccountBalance(currencyId, account)[0],
+        withdrawEntireCashBalance=False,
+    )
+    env.notional.batchBalanceAndTradeAction(account, [action], {"from": account})
+
+    tokenDefaults = nTokenDefaults["Collateral"]
+    tokenDefaults[1] = 75
+    env.notional.updateTokenCollateralParameters(currencyId, *(tokenDefaults))
+
+
+def setup_collateral_currency_liquidation(env, account):
+    # ETH collateral against a DAI borrow, then the ETH price drops
+    env.notional.depositUnderlyingToken(account, 1, 1e18, {"from": account, "value": 1e18})
+    (fc, _) = env.notional.getFreeCollateral(account)
+    oracle = env.ethOracle["DAI"]
+    maxBorrow = fc * 1e18 / oracle.latestAnswer()
+    buffer = env.notional.getRateStorage(2)["ethRate"]["buffer"]
+
+    action = get_balance_trade_action(
+        2,
+        "None",
+        [
+            {
+                "tradeActionType": "Borrow",
+                "marketIndex": 1,
+                "notional": math.floor(maxBorrow * 95 / buffer),
+                "maxSlippage": 0,
+            }
+        ],
+        withdrawEntireCashBalance=True,
+        redeemToUnderlying=True,
+    )
+    env.notional.batchBalanceAndTradeAction(account, [action], {"from": account})
+    oracle.setAnswer(math.floor(oracle.latestAnswer() * 1.10))
+
+
+def test_scanner_ranks_all_liquidations(env, accounts):
+    setup_local_currency_liquidation(env, accounts[2], 2)
+    setup_collateral_currency_liquidation(env, accounts[3])
+    chain.mine(1)
+
+    snapshot = load_snapshot(env.notional, accounts[1:5])
+    candidates = scan_liquidations(snapshot)
+    assert {c.account for c in candidates} == {accounts[2].address, accounts[3].address}
+    assert [c.expectedProfitETH for c in candidates] == sorted(
+        [c.expectedProfitETH for c in candidates], reverse=True
+    )
+
+    for c in candidates:
+        assert c.netETHValue == pytest.approx(
+            env.notional.getFreeCollateral(c.account)[0], rel=1e-5
+        )
+
+        if c.liquidationType == LOCAL_CURRENCY:
+            (localPrimeCash, nTokens) = env.notional.calculateLocalCurrencyLiquidation.call(
+                c.account, c.localCurrencyId, 0
+            )
+            assert c.localPrimeCash == pytest.approx(localPrimeCash, rel=1e-5)
+            assert c.nTokens == pytest.approx(nTokens, rel=1e-5)
+        else:
+            assert c.liquidationType == COLLATERAL_CURRENCY
+            (
+                localPrimeCash,
+                collateralPrimeCash,
+                nTokens,
+            ) = env.notional.calculateCollateralCurrencyLiquidation.call(
+                c.account, c.localCurrencyId, c.collateralCurrencyId, 0, 0
+            )
+            assert c.localPrimeCash == pytest.approx(localPrimeCash, rel=1e-5)
+            assert c.collateralPrimeCash == pytest.approx(collateralPrimeCash, rel=1e-5)
+            assert c.nTokens == pytest.approx(nTokens, rel=1e-5)
+
+
+def test_flash_liquidation_calldata(env, weth, flashLiquidator, accounts):
+    setup_local_currency_liquidation(env, accounts[2], 2)
+    chain.mine(1)
+
+    snapshot = load_snapshot(env.notional, [accounts[2]])
+    (candidate,) = scan_liquidations(snapshot)
+    assert candidate.liquidationType == LOCAL_CURRENCY
+    fcBefore = env.notional.getFreeCollateral(accounts[2])
+
+    args = get_flash_liquidation_args(candidate, load_tokens(env.notional), weth.address)
+    txn = flashLiquidator.flashLoan(*args, {"from": accounts[0]})
+
+    assert txn.events["LiquidateLocalCurrency"]["liquidated"] == accounts[2]
+    assert txn.events["LiquidateLocalCurrency"]["netLocalFromLiquidator"] == pytest.approx(
+        candidate.localPrimeCash, rel=1e-5
+    )
+    assert env.notional.getFreeCollateral(accounts[2])[0] > fcBefore[0]
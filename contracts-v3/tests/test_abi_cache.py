@@ -0,0 +1,49 @@
+import json
+import os
+
+import scripts.abi_cache as abi_cache
+from scripts.abi_cache import load_abi, write_abi
+
+ABI = [{"type": "function", "name": "owner", "inputs": [], "outputs": []}]
+
+
+def reset_process_cache():
+    # Simulates a new process reading the same cache directory
+    abi_cache._index = None
+    abi_cache._abis.clear()
+
+
+def test_load_abi_from_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "Notional.json")
+    cacheDir = str(tmp_path / "cache")
+    assert write_abi(path, ABI)
+    assert not write_abi(path, ABI)
+
+    assert load_abi(path, cacheDir=cacheDir) == ABI
+    assert len([f for f in os.listdir(cacheDir) if f.endswith(".pickle")]) == 1
+
+    # Another process loads the pickle without parsing the file
+    reset_process_cache()
+    parsed = []
+    jsonLoad = json.load
+    monkeypatch.setattr(json, "load", lambda f: parsed.append(f.name) or jsonLoad(f))
+    assert load_abi(path, cacheDir=cacheDir) == ABI
+    assert parsed == [os.path.join(cacheDir, "index.json")]
+
+
+def test_load_abi_invalidated_by_content(tmp_path):
+    path = str(tmp_path / "Artifact.json")
+    cacheDir = str(tmp_path / "cache")
+    with open(path, "w") as f:
+        json.dump({"abi": ABI, "bytecode": "0x00"}, f)
+    assert load_abi(path, "abi", cacheDir=cacheDir) == ABI
+
+    updated = ABI + [{"type": "event", "name": "Transfer", "inputs": []}]
+    with open(path, "w") as f:
+        json.dump({"abi": updated, "bytecode": "0x00"}, f)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    reset_process_cache()
+    assert load_abi(path, "abi", cacheDir=cacheDir) == updated
+    assert len([f for f in os.listdir(cacheDir) if f.endswith(".pickle")]) == 2
@@ -0,0 +1,86 @@
+import pytest
+from scripts.deployers import deploy_scheduler
+from scripts.deployers.deploy_scheduler import DeployScheduler
+
+
+class Eth:
+    def __init__(self):
+        self.nonce = 0
+
+    def get_transaction_count(self, address, block="latest"):
+        return self.nonce
+
+
+class Web3:
+    def __init__(self):
+        self.eth = Eth()
+
+
+class Deployer:
+    address = "0x00000000000000000000000000000000000000D1"
+
+
+class Tx:
+    def __init__(self, txid):
+        self.txid = txid
+
+
+class Deployed:
+    def __init__(self, address):
+        self.address = address
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    fakeWeb3 = Web3()
+    monkeypatch.setattr(deploy_scheduler, "web3", fakeWeb3)
+    libMap = {}
+    monkeypatch.setattr(
+        deploy_scheduler, "update_lib_map", lambda n, a, defer: libMap.__setitem__(n, a)
+    )
+
+    deployed = []
+    waves = []
+    scheduler = DeployScheduler(
+        Deployer(),
+        onDeployed=lambda node, d: deployed.append(node.name),
+        onWave=lambda: waves.append(dict(scheduler.addresses)),
+        maxRetries=0,
+    )
+    scheduler.libMap = libMap
+    scheduler.deployed = deployed
+    scheduler.waves = waves
+
+    def broadcast(node, nonce):
+        if node.name == "BroadcastFails":
+            raise Exception("rejected")
+        fakeWeb3.eth.nonce += 1
+        return Tx("0x{}".format(node.name))
+
+    def confirm(node, tx):
+        if node.name == "Reverts":
+            raise Exception("{} deployment reverted".format(node.name))
+        return Deployed("0x{}".format(node.name))
+
+    scheduler._broadcast = broadcast
+    scheduler._confirm = confirm
+    return scheduler
+
+
+def test_successes_recorded_before_failures_raised(scheduler):
+    scheduler.add("BroadcastFails", "artifacts/A.json", "actions")
+    scheduler.add("Lib", "artifacts/Lib.json", "libs")
+    scheduler.add("Reverts", "artifacts/B.json", "actions")
+    scheduler.add("Views", "artifacts/Views.json", "actions")
+
+    with pytest.raises(Exception) as e:
+        scheduler.run()
+
+    assert "BroadcastFails: rejected" in str(e.value)
+    assert "Reverts: Reverts deployment reverted" in str(e.value)
+    # Every confirmed deployment of the wave is recorded and checkpointed
+    assert scheduler.addresses == {"Lib": "0xLib", "Views": "0xViews"}
+    assert scheduler.libMap == {"Lib": "0xLib"}
+    assert scheduler.deployed == ["Lib", "Views"]
+    assert scheduler.waves == [{"Lib": "0xLib", "Views": "0xViews"}]
+    assert set(scheduler.nodes.keys()) == {"BroadcastFails", "Reverts"}
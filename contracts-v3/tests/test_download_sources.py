@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from scripts.download_sources import (
+    TokenBucket,
+    build_existing_hashes,
+    fetch_sources,
+    get_contract_hashes,
+)
+
+SOURCES = {
+    "contracts/external/Views.sol": "contract Views {}\r\n",
+    "contracts/internal/Lib.sol": "library Lib {}\n",
+    "interfaces/IViews.sol": "interface IViews {}\n",
+}
+
+
+def get_explorer_response(name):
+    sources = {k: {"content": v} for (k, v) in SOURCES.items()}
+    standardJson = {"language": "Solidity", "sources": sources}
+    return {
+        "status": "1",
+        "message": "OK",
+        # The explorer wraps standard json input in an extra set of braces
+        "result": [
+            {
+                "SourceCode": "{" + json.dumps(standardJson) + "}",
+                "ContractName": name,
+                "ConstructorArguments": "",
+            }
+        ],
+    }
+
+
+class Explorer:
+    def __init__(self) -> None:
+        self.requests = Counter()
+        self.rateLimited = set()
+        self.stalled = set()
+
+    def respond(self, address):
+        self.requests[address] += 1
+        if address in self.stalled:
+            self.stalled.remove(address)
+            time.sleep(1)
+        if address in self.rateLimited:
+            self.rateLimited.remove(address)
+            return {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+        return get_explorer_response(address)
+
+
+@pytest.fixture
+def explorer():
+    state = Explorer()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            address = parse_qs(urlparse(self.path).query)["address"][0]
+            body = json.dumps(state.respond(address)).encode("utf8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.apiUrl = "http://127.0.0.1:{}/api?address={{}}&apikey={{}}".format(server.server_port)
+    yield state
+    server.shutdown()
+
+
+def get_contracts(n):
+    return {"Contract{}".format(i): "0x{:040x}".format(i) for i in range(n)}
+
+
+def test_fetch_sources_caches_by_code_hash(explorer, tmp_path):
+    contracts = get_contracts(20)
+    codeHashes = {a: "0x01" for a in contracts.values()}
+
+    def fetch():
+        return fetch_sources(
+            contracts,
+            getCodeHash=lambda a: codeHashes[a],
+            apiUrl=explorer.apiUrl,
+            token="token",
+            cacheDir=str(tmp_path),
+            rate=100,
+        )
+
+    sources = fetch()
+    assert sources.keys() == contracts.keys()
+    assert sources["Contract3"]["result"][0]["ContractName"] == contracts["Contract3"]
+    assert sum(explorer.requests.values()) == 20
+
+    # Cached responses are served from disk
+    assert fetch() == sources
+    assert sum(explorer.requests.values()) == 20
+
+    # A redeployment changes the code hash and is fetched again
+    codeHashes[contracts["Contract7"]] = "0x02"
+    fetch()
+    assert sum(explorer.requests.values()) == 21
+    assert explorer.requests[contracts["Contract7"]] == 2
+
+
+def test_fetch_sources_retries_rate_limit(explorer, tmp_path):
+    contracts = get_contracts(3)
+    explorer.rateLimited.add(contracts["Contract1"])
+    sources = fetch_sources(
+        contracts,
+        getCodeHash=lambda a: "0x01",
+        apiUrl=explorer.apiUrl,
+        token="token",
+        cacheDir=str(tmp_path),
+        rate=100,
+    )
+
+    assert sources["Contract1"]["status"] == "1"
+    assert explorer.requests[contracts["Contract1"]] == 2
+    # Failed responses are not cached
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_fetch_sources_retries_stalled_request(explorer, tmp_path):
+    contracts = get_contracts(2)
+    explorer.stalled.add(contracts["Contract0"])
+    sources = fetch_sources(
+        contracts,
+        getCodeHash=lambda a: "0x01",
+        apiUrl=explorer.apiUrl,
+        token="token",
+        cacheDir=str(tmp_path),
+        rate=100,
+        timeout=0.2,
+    )
+
+    assert sources["Contract0"]["status"] == "1"
+    assert explorer.requests[contracts["Contract0"]] == 2
+
+
+def test_token_bucket_limits_rate():
+    limiter = TokenBucket(50, capacity=5)
+    start = time.monotonic()
+    for _ in range(20):
+        limiter.acquire()
+    # The first five calls use the initial capacity, the rest are spaced at the rate
+    assert time.monotonic() - start >= 15 / 50 * 0.9
+
+
+def test_contract_hashes_against_build():
+    resp = get_explorer_response("Views")
+    viewsHash = hashlib.sha1("contract Views {}\n".encode("utf8")).hexdigest()
+
+    (hashes, results) = get_contract_hashes(
+        resp, "Views", {"contracts/external/Views.sol": viewsHash}
+    )
+    assert hashes["contracts/external/Views.sol"] == viewsHash
+    assert results == {
+        "contracts/external/Views.sol": "match",
+        "contracts/internal/Lib.sol": "not found",
+        "interfaces/IViews.sol": "ignored",
+    }
+
+    (_, results) = get_contract_hashes(resp, "Views", {"contracts/external/Views.sol": "00"})
+    assert results["contracts/external/Views.sol"] == "mismatch"
+
+
+def write_artifact(path, sourcePath, source):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"sourcePath": sourcePath, "source": source}, f)
+
+
+def test_build_hashes_cached_by_mtime(tmp_path, capsys):
+    buildDir = str(tmp_path / "build")
+    cachePath = str(tmp_path / "build_hashes.json")
+    viewsPath = os.path.join(buildDir, "contracts", "Views.json")
+    write_artifact(viewsPath, "contracts/external/Views.sol", "contract Views {}")
+    write_artifact(os.path.join(buildDir, "contracts", "Lib.json"), "contracts/Lib.sol", "library")
+    # Deployment maps and interfaces are not build artifacts
+    os.makedirs(os.path.join(buildDir, "deployments"))
+    with open(os.path.join(buildDir, "deployments", "map.json"), "w") as f:
+        json.dump({}, f)
+
+    hashes = build_existing_hashes(buildDir, cachePath)
+    assert hashes == {
+        "contracts/external/Views.sol": hashlib.sha1(b"contract Views {}").hexdigest(),
+        "contracts/Lib.sol": hashlib.sha1(b"library").hexdigest(),
+    }
+    assert capsys.readouterr().out.count(".json") == 2
+
+    # Unchanged artifacts are read from the cache
+    assert build_existing_hashes(buildDir, cachePath) == hashes
+    assert capsys.readouterr().out == ""
+
+    write_artifact(viewsPath, "contracts/external/Views.sol", "contract Views { uint x; }")
+    stat = os.stat(viewsPath)
+    os.utime(viewsPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    updated = build_existing_hashes(buildDir, cachePath)
+    assert capsys.readouterr().out.strip() == viewsPath
+    assert updated["contracts/external/Views.sol"] == (
+        hashlib.sha1(b"contract Views { uint x; }").hexdigest()
+    )
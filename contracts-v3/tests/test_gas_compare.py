@@ -0,0 +1,48 @@
+from scripts.gas_compare import compare_gas, format_markdown
+
+
+def _statuses(rows):
+    return {(r["key"], r["case"]): r["status"] for r in rows}
+
+
+def test_regression_needs_both_budgets():
+    baseline = {"a": {"cold": 100_000, "warm": 10_000}, "b": {"cold": 1_000_000, "warm": 1_000}}
+    new = {"a": {"cold": 100_600, "warm": 10_400}, "b": {"cold": 1_006_000, "warm": 1_400}}
+    statuses = _statuses(compare_gas(baseline, new, 500, 0.01))
+
+    assert statuses[("a", "cold")] == "ok"
+    assert statuses[("a", "warm")] == "ok"
+    assert statuses[("b", "cold")] == "ok"
+    assert statuses[("b", "warm")] == "ok"
+
+    new["a"]["cold"] = 102_000
+    new["b"]["warm"] = 300
+    statuses = _statuses(compare_gas(baseline, new, 500, 0.01))
+    assert statuses[("a", "cold")] == "regression"
+    assert statuses[("b", "warm")] == "improvement"
+
+
+def test_zero_baseline():
+    baseline = {"a": {"cold": 0, "warm": 0}}
+    new = {"a": {"cold": 50_000, "warm": 0}}
+    rows = compare_gas(baseline, new, 500, 0.01)
+    statuses = _statuses(rows)
+
+    assert statuses[("a", "cold")] == "regression"
+    assert statuses[("a", "warm")] == "ok"
+    assert rows[0]["relDelta"] == float("inf")
+    assert "+inf%" in format_markdown(rows)
+
+    new["a"]["cold"] = 400
+    assert _statuses(compare_gas(baseline, new, 500, 0.01))[("a", "cold")] == "ok"
+
+
+def test_new_and_missing_keys():
+    baseline = {"a": {"cold": 100, "warm": 100}, "b": {"cold": 100, "warm": None}}
+    new = {"b": {"cold": 100, "warm": 100}, "c": {"cold": 100, "warm": 100}}
+    statuses = _statuses(compare_gas(baseline, new, 500, 0.01))
+
+    assert statuses[("a", "cold")] == "missing"
+    assert statuses[("b", "warm")] == "new"
+    assert statuses[("c", "cold")] == "new"
+    assert statuses[("b", "cold")] == "ok"
@@ -0,0 +1,72 @@
+import pytest
+from scripts.initializers.governance_batcher import (
+    GovernanceCall,
+    encode_multisend,
+    get_listing_calls,
+    pack_batches,
+    to_safe_batch,
+)
+
+NOTIONAL = "0x1344A36A1B56144C3Bc62E7757377D288fDE0369"
+TRADING_MODULE = "0xBf6B9c5608D520469d8c4BD1E24F850497AF0Bb8"
+
+
+def get_calls(n):
+    return [GovernanceCall(NOTIONAL, 0, "0x{:08x}".format(i), "call{}".format(i)) for i in range(n)]
+
+
+def test_pack_batches_preserves_order():
+    calls = get_calls(6)
+    batches = pack_batches(calls, [4, 4, 4, 9, 1, 10], maxBatchGas=10)
+    assert [[c.label for c in b] for b in batches] == [
+        ["call0", "call1"],
+        ["call2"],
+        ["call3", "call4"],
+        ["call5"],
+    ]
+
+    assert pack_batches(calls, [1] * 6, maxBatchGas=10) == [calls]
+    with pytest.raises(Exception):
+        pack_batches(calls, [1, 11, 1, 1, 1, 1], maxBatchGas=10)
+
+
+def test_encode_multisend():
+    calls = [
+        GovernanceCall(NOTIONAL, 0, "0xabcdef", "listCurrency"),
+        GovernanceCall(TRADING_MODULE, 5, "0x", "transfer"),
+    ]
+    encoded = bytes.fromhex(encode_multisend(calls)[2:])
+    assert encoded[:4].hex() == "8d80ff0a"
+    assert int.from_bytes(encoded[4:36], "big") == 32
+
+    length = int.from_bytes(encoded[36:68], "big")
+    packed = encoded[68 : 68 + length]
+    assert length == (85 + 3) + 85
+    assert len(encoded[4:]) % 32 == 0
+    assert encoded[68 + length :] == b"\x00" * (len(encoded) - 68 - length)
+
+    # operation, to, value, data length and data for each call
+    assert packed[0] == 0
+    assert packed[1:21].hex() == NOTIONAL[2:].lower()
+    assert int.from_bytes(packed[53:85], "big") == 3
+    assert packed[85:88].hex() == "abcdef"
+    assert packed[89:109].hex() == TRADING_MODULE[2:].lower()
+    assert int.from_bytes(packed[109:141], "big") == 5
+    assert int.from_bytes(packed[141:173], "big") == 0
+
+
+def test_safe_batch_format():
+    calls = get_calls(2)
+    batch = to_safe_batch(calls, 42161)
+    assert batch["chainId"] == "42161"
+    assert batch["meta"]["description"] == "call0, call1"
+    assert [t["data"] for t in batch["transactions"]] == ["0x00000000", "0x00000001"]
+    assert all(t["to"] == NOTIONAL and t["value"] == "0" for t in batch["transactions"])
+
+
+def test_listing_requires_oracles():
+    with pytest.raises(Exception, match="DAI has no ethOracle or pCashOracle"):
+        get_listing_calls(None, "DAI", 2, token={"baseOracle": TRADING_MODULE})
+
+    with pytest.raises(Exception, match="UNI has no pCashOracle"):
+        get_listing_calls(None, "UNI", 9, token={"ethOracle": NOTIONAL, "pCashOracle": ""})
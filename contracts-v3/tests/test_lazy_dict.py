@@ -0,0 +1,37 @@
+import pytest
+from scripts.common import LazyDict
+
+
+def test_values_built_once_on_access():
+    calls = []
+
+    def factory(key):
+        return lambda: calls.append(key) or key * 2
+
+    d = LazyDict({"a": 1}, {"b": factory("b"), "c": factory("c")})
+    assert len(d) == 3
+    assert "c" in d and "z" not in d
+    assert calls == []
+
+    assert d["b"] == "bb"
+    assert d["b"] == "bb"
+    assert calls == ["b"]
+    assert sorted(d.keys()) == ["a", "b", "c"]
+
+    with pytest.raises(KeyError):
+        d["z"]
+
+
+def test_set_and_delete():
+    d = LazyDict()
+    d.setLazy(1, lambda: "lazy")
+    d[1] = "eager"
+    assert d[1] == "eager"
+
+    d.setLazy(1, lambda: "lazy")
+    assert dict(d) == {1: "lazy"}
+
+    del d[1]
+    assert len(d) == 0
+    with pytest.raises(KeyError):
+        del d[1]
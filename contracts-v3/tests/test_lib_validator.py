@@ -0,0 +1,89 @@
+import pytest
+from scripts.deployers.lib_validator import (
+    diff_links,
+    fetch_lib_info,
+    format_diff,
+    get_expected_links,
+    validate_lib_links,
+)
+
+LIBS = {
+    "FreeCollateralExternal": "0x00000000000000000000000000000000000000F1",
+    "MigrateIncentives": "0x00000000000000000000000000000000000000F2",
+    "SettleAssetsExternal": "0x00000000000000000000000000000000000000F3",
+}
+LIB_INFO_ABI = [{"type": "function", "name": "getLibInfo", "inputs": [], "outputs": []}]
+
+
+class Container:
+    def __init__(self, libs):
+        # Link markers as they appear in unlinked brownie bytecode
+        self.bytecode = "6080" + "".join("__{}{}6080".format(l, "_" * (38 - len(l))) for l in libs)
+
+
+class Deployed:
+    def __init__(self, libInfo, abi=LIB_INFO_ABI):
+        self.libInfo = libInfo
+        self.abi = abi
+
+    def getLibInfo(self):
+        return self.libInfo
+
+
+def test_expected_links_from_bytecode():
+    containers = {
+        "Views": Container(["MigrateIncentives", "FreeCollateralExternal"]),
+        "TreasuryAction": Container([]),
+    }
+    assert get_expected_links(containers, LIBS) == {
+        "Views": {
+            "FreeCollateralExternal": LIBS["FreeCollateralExternal"],
+            "MigrateIncentives": LIBS["MigrateIncentives"],
+        }
+    }
+
+
+def test_diff_links():
+    expected = {
+        "Views": {"FreeCollateralExternal": LIBS["FreeCollateralExternal"]},
+        "ERC1155Action": {
+            "FreeCollateralExternal": LIBS["FreeCollateralExternal"],
+            "SettleAssetsExternal": LIBS["SettleAssetsExternal"],
+        },
+        "VaultAction": {"TradingAction": None},
+    }
+    contracts = {
+        # A single library is returned as an address
+        "Views": Deployed(LIBS["FreeCollateralExternal"].lower()),
+        "ERC1155Action": Deployed(
+            (
+                LIBS["FreeCollateralExternal"],
+                LIBS["MigrateIncentives"],
+                LIBS["SettleAssetsExternal"],
+            )
+        ),
+        "VaultAction": Deployed(None, abi=[]),
+    }
+    mismatches = diff_links(expected, fetch_lib_info(contracts, useMulticall=False))
+    settleAssets = LIBS["SettleAssetsExternal"]
+    assert mismatches == [
+        ("ERC1155Action", "SettleAssetsExternal", settleAssets, LIBS["MigrateIncentives"]),
+        ("ERC1155Action", None, None, LIBS["SettleAssetsExternal"]),
+        ("VaultAction", None, [None], None),
+    ]
+
+    diff = format_diff(mismatches).splitlines()
+    assert diff[0] == "  ERC1155Action"
+    assert diff[1] == "-   SettleAssetsExternal {}".format(LIBS["SettleAssetsExternal"])
+    assert diff[2] == "+   SettleAssetsExternal {}".format(LIBS["MigrateIncentives"])
+    assert diff[3] == "+   unexpected library {}".format(LIBS["SettleAssetsExternal"])
+    assert diff[6] == "+   getLibInfo() not found"
+
+
+def test_validate_lib_links():
+    containers = {"Views": Container(["FreeCollateralExternal", "MigrateIncentives"])}
+    linked = (LIBS["FreeCollateralExternal"], LIBS["MigrateIncentives"])
+    assert validate_lib_links(containers, {"Views": Deployed(linked)}, LIBS, False) == []
+
+    with pytest.raises(Exception, match="MigrateIncentives"):
+        validate_lib_links(containers, {"Views": Deployed(linked[:1])}, LIBS, False)
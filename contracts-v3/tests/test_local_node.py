@@ -0,0 +1,42 @@
+from scripts import local_node
+from scripts.local_node import LocalNode
+
+
+class Config:
+    networks = {
+        "mainnet": {"host": "https://eth-mainnet.alchemyapi.io/v2/$ALCHEMY_KEY", "chainid": 1},
+        "mainnet-fork": {
+            "cmd": "npx ganache",
+            "cmd_settings": {"fork": "mainnet", "fork_block": 17536127, "accounts": 10},
+        },
+    }
+
+
+def test_fork_network_resolved_to_host(monkeypatch):
+    monkeypatch.setattr(local_node, "CONFIG", Config)
+    monkeypatch.setenv("ALCHEMY_KEY", "key")
+
+    settings = local_node.get_cmd_settings("mainnet-fork")
+    assert settings["fork"] == "https://eth-mainnet.alchemyapi.io/v2/key"
+    assert settings["chain_id"] == 1
+    # The network config itself is not modified
+    assert Config.networks["mainnet-fork"]["cmd_settings"]["fork"] == "mainnet"
+
+
+def test_ganache_fork_args(monkeypatch):
+    monkeypatch.setattr(local_node, "CONFIG", Config)
+    monkeypatch.setenv("ALCHEMY_KEY", "key")
+
+    settings = local_node.get_cmd_settings("mainnet-fork")
+    node = LocalNode(8546, "ganache", "/tmp/db", settings, "npx ganache")
+    args = node._ganache_args()
+    assert args[:4] == ["npx", "ganache", "--server.port", "8546"]
+
+    def flag(name):
+        return args[args.index(name) + 1]
+
+    assert flag("--fork.url") == "https://eth-mainnet.alchemyapi.io/v2/key"
+    assert flag("--fork.blockNumber") == "17536127"
+    assert flag("--chain.chainId") == "1"
+    assert flag("--hardfork") == "istanbul"
+    assert flag("--database.dbPath") == "/tmp/db"
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+from scripts.deployers import manifest as manifestModule
+from scripts.deployers.manifest import DeploymentManifest
+
+
+@pytest.fixture
+def configPath(tmp_path):
+    path = tmp_path / "v3.test.json"
+    path.write_text(json.dumps({"libs": {"SettleAssetsExternal": "0x01"}}))
+    return str(path)
+
+
+def _read(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def test_updates_are_journaled_until_flush(configPath):
+    manifest = DeploymentManifest(configPath)
+    manifest.set(["libs", "TradingAction"], "0x02")
+    manifest.set(["actions", "Views"], "0x03")
+    manifest.delete(["libs", "SettleAssetsExternal"])
+
+    assert manifest.section("libs") == {"TradingAction": "0x02"}
+    assert _read(configPath) == {"libs": {"SettleAssetsExternal": "0x01"}}
+    with open(manifest.journalPath, "r") as f:
+        assert len(f.readlines()) == 3
+
+    manifest.flush()
+    assert _read(configPath) == {"actions": {"Views": "0x03"}, "libs": {"TradingAction": "0x02"}}
+    assert not os.path.exists(manifest.journalPath)
+
+
+def test_journal_replayed_on_load(configPath):
+    manifest = DeploymentManifest(configPath)
+    manifest.set(["libs", "TradingAction"], "0x02")
+    manifest.delete(["libs", "SettleAssetsExternal"])
+
+    # A crash before the checkpoint leaves only the journal behind
+    reloaded = DeploymentManifest(configPath)
+    assert reloaded.data == {"libs": {"TradingAction": "0x02"}}
+    assert reloaded.dirty
+
+    reloaded.flush()
+    assert _read(configPath) == {"libs": {"TradingAction": "0x02"}}
+    assert not os.path.exists(reloaded.journalPath)
+
+
+def test_truncated_last_journal_line(configPath):
+    manifest = DeploymentManifest(configPath)
+    manifest.set(["libs", "TradingAction"], "0x02")
+    with open(manifest.journalPath, "a") as f:
+        f.write('{"op": "set", "path": ["libs", "nTokenMintAc')
+
+    reloaded = DeploymentManifest(configPath)
+    assert reloaded.data == {"libs": {"SettleAssetsExternal": "0x01", "TradingAction": "0x02"}}
+
+
+def test_flush_is_atomic(configPath, monkeypatch):
+    manifest = DeploymentManifest(configPath)
+    manifest.set(["libs", "TradingAction"], "0x02")
+
+    def failingReplace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manifestModule.os, "replace", failingReplace)
+    with pytest.raises(OSError):
+        manifest.flush()
+
+    # The config is untouched, no temporary file is left and the journal still holds the update
+    assert _read(configPath) == {"libs": {"SettleAssetsExternal": "0x01"}}
+    assert sorted(os.listdir(os.path.dirname(configPath))) == sorted(
+        [os.path.basename(configPath), os.path.basename(manifest.journalPath)]
+    )
+    monkeypatch.undo()
+
+    reloaded = DeploymentManifest(configPath)
+    assert reloaded.get(["libs", "TradingAction"]) == "0x02"
+
+
+def test_no_persist_writes_nothing(tmp_path):
+    path = str(tmp_path / "v3.fork.json")
+    manifest = DeploymentManifest(path, {"libs": {}}, persist=False)
+    manifest.set(["libs", "TradingAction"], "0x02")
+    manifest.flush()
+
+    assert manifest.get(["libs", "TradingAction"]) == "0x02"
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,64 @@
+from scripts import stats
+
+SOURCE = """// SPDX-License-Identifier: GPL-3.0-only
+pragma solidity =0.7.6;
+
+/* Block comment
+   if (ignored) */
+library Math {
+    function max(uint256 a, uint256 b) internal pure returns (uint256) {
+        if (a > b && a != 0) return a; // if (ignored)
+        string memory s = "if (ignored) // ";
+        return b;
+    }
+
+    function min(uint256 a, uint256 b) internal pure returns (uint256) {
+        return a < b ? a : b;
+    }
+}
+
+contract Action {
+    struct Callback {
+        function (uint256) external fn;
+    }
+
+    function run() external {}
+}
+"""
+
+
+def test_scan_source():
+    result = stats.scan_source(SOURCE)
+    assert result["Lines"] == 24
+    assert result["Comment"] == 3
+    assert result["Blank"] == 4
+    assert result["Code"] == 17
+    assert result["Complexity"] == 3
+    assert result["Functions"] == 3
+    assert result["Declarations"] == [
+        {"Kind": "library", "Name": "Math", "Functions": 2},
+        {"Kind": "contract", "Name": "Action", "Functions": 1},
+    ]
+
+
+def test_file_stats_cached_by_content(tmp_path, monkeypatch):
+    sourceDir = tmp_path / "contracts" / "actions"
+    sourceDir.mkdir(parents=True)
+    (sourceDir / "Action.sol").write_text(SOURCE)
+    (sourceDir / "Copy.sol").write_text(SOURCE)
+    cacheFile = str(tmp_path / "build" / "stats-cache.json")
+
+    scanned = []
+    scan = stats.scan_source
+    monkeypatch.setattr(stats, "scan_source", lambda s: scanned.append(s) or scan(s))
+
+    first = stats.get_file_stats(str(tmp_path / "contracts"), cacheFile, maxWorkers=1)
+    assert len(first) == 2 and len(scanned) == 1
+
+    stats.get_file_stats(str(tmp_path / "contracts"), cacheFile, maxWorkers=1)
+    assert len(scanned) == 1
+
+    (sourceDir / "Copy.sol").write_text(SOURCE + "\n// changed\n")
+    second = stats.get_file_stats(str(tmp_path / "contracts"), cacheFile, maxWorkers=1)
+    assert len(scanned) == 2
+    assert second[str(sourceDir / "Copy.sol")]["Comment"] == 4